@@ -1,13 +1,27 @@
+import json
 import os
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+from chunk_files import chunk_name
+from deck_io import decode_records
+
 # Default configuration
 OUT_DIR = "data/decks_chunks"       # Directory where generated binary deck files are stored
 CHUNK_SIZE = 10_000                 # Number of decks per full chunk file
 DECK_SIZE_BITS = 52                 # Number of bits per deck
 BYTES_PER_DECK = (DECK_SIZE_BITS + 7) // 8  # Convert bits to required bytes per deck
 
+# RNG stream versions (the version is part of the dataset)
+RNG_V1_SHUFFLE = 1                  # random.Random(seed) + per-deck list shuffle
+RNG_V2_NUMPY = 2                    # numpy PCG64(seed), argsort of 52 uniform keys per deck
+RNG_VERSION = RNG_V2_NUMPY          # Stream used for new chunks
+CHECKPOINT_EVERY = None             # Decks written between checkpoints (None = write each chunk in one go)
+
 
 def generate_balanced_deck(rng: random.Random) -> bytes:
     """
@@ -23,25 +37,160 @@ def generate_balanced_deck(rng: random.Random) -> bytes:
     return deck_int.to_bytes(BYTES_PER_DECK, byteorder="big")
 
 
-def generate_chunk(chunk_index: int, num_decks: int = CHUNK_SIZE, out_dir: str = OUT_DIR):
+def generate_balanced_decks(num_decks: int, seed) -> np.ndarray:
+    """
+    Create num_decks balanced decks in one shot (RNG stream v2).
+    seed is an int or an existing np.random.Generator (to continue its stream).
+    Returns a uint64 array holding one 52-bit deck per entry.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.Generator(np.random.PCG64(seed))
+    # the 26 positions with the smallest random keys become red cards
+    order = np.argsort(rng.random((num_decks, DECK_SIZE_BITS)), axis=1)
+    bits = np.zeros((num_decks, 64), dtype=np.uint8)
+    np.put_along_axis(bits, order[:, :26] + (64 - DECK_SIZE_BITS), 1, axis=1)
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def decks_to_bytes(decks: np.ndarray) -> bytes:
+    """
+    Serialize a uint64 deck array with the same per-deck layout as generate_balanced_deck.
+    """
+    records = decks.astype(">u8").view(np.uint8).reshape(-1, 8)
+    return records[:, 8 - BYTES_PER_DECK:].tobytes()
+
+
+def chunk_decks(seed: int, num_decks: int, rng_version: int = RNG_VERSION) -> np.ndarray:
+    """
+    The decks of one chunk as a uint64 array, exactly as generate_chunk writes them.
+    """
+    if rng_version == RNG_V1_SHUFFLE:
+        rng = random.Random(seed)
+        data = b"".join(generate_balanced_deck(rng) for _ in range(num_decks))
+        return decode_records(np.frombuffer(data, dtype=np.uint8).reshape(-1, BYTES_PER_DECK))
+    if rng_version == RNG_V2_NUMPY:
+        return generate_balanced_decks(num_decks, seed)
+    raise ValueError(f"Unknown RNG version: {rng_version}")
+
+
+def _new_rng(seed: int, rng_version: int):
+    if rng_version == RNG_V1_SHUFFLE:
+        return random.Random(seed)
+    if rng_version == RNG_V2_NUMPY:
+        return np.random.Generator(np.random.PCG64(seed))
+    raise ValueError(f"Unknown RNG version: {rng_version}")
+
+
+def _get_rng_state(rng):
+    # JSON-friendly RNG state
+    if isinstance(rng, random.Random):
+        version, internal, gauss_next = rng.getstate()
+        return [version, list(internal), gauss_next]
+    return rng.bit_generator.state
+
+
+def _set_rng_state(rng, state):
+    if isinstance(rng, random.Random):
+        rng.setstate((state[0], tuple(state[1]), state[2]))
+    else:
+        rng.bit_generator.state = state
+
+
+def _write_json_atomic(path: str, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def generate_chunk_checkpointed(path: str, seed: int, num_decks: int, rng_version: int, checkpoint_every: int):
+    """
+    Write a chunk in blocks of checkpoint_every decks to path + ".part". After each block
+    the data is synced and path + ".ckpt" records the decks written and the RNG state,
+    so an interrupted chunk resumes at its last checkpoint with the same output.
+    Returns (gen_time, write_time) for this run.
+    """
+    part_path = path + ".part"
+    ckpt_path = path + ".ckpt"
+    rng = _new_rng(seed, rng_version)
+    written = 0
+    gen_time = write_time = 0.0
+
+    if os.path.exists(part_path) and os.path.exists(ckpt_path):
+        with open(ckpt_path, "r") as f:
+            ckpt = json.load(f)
+        # only trust a checkpoint for this exact chunk whose data actually reached the disk
+        same_chunk = (ckpt["seed"], ckpt["rng_version"], ckpt["num_decks"]) == (seed, rng_version, num_decks)
+        if same_chunk and os.path.getsize(part_path) >= ckpt["decks_written"] * BYTES_PER_DECK:
+            _set_rng_state(rng, ckpt["rng_state"])
+            written = ckpt["decks_written"]
+            print(f"Resuming {os.path.basename(path)} at deck {written}")
+
+    with open(part_path, "r+b" if written else "wb") as f:
+        # drop anything written after the last checkpoint
+        f.seek(written * BYTES_PER_DECK)
+        f.truncate()
+        while written < num_decks:
+            n = min(checkpoint_every, num_decks - written)
+            gen_start = time.perf_counter()
+            if rng_version == RNG_V1_SHUFFLE:
+                block = b"".join(generate_balanced_deck(rng) for _ in range(n))
+            else:
+                block = decks_to_bytes(generate_balanced_decks(n, rng))
+            gen_time += time.perf_counter() - gen_start
+
+            write_start = time.perf_counter()
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+            written += n
+            _write_json_atomic(ckpt_path, {
+                "seed": seed,
+                "rng_version": rng_version,
+                "num_decks": num_decks,
+                "decks_written": written,
+                "rng_state": _get_rng_state(rng),
+            })
+            write_time += time.perf_counter() - write_start
+
+    os.replace(part_path, path)
+    os.remove(ckpt_path)
+    return gen_time, write_time
+
+
+def generate_chunk(chunk_index: int, num_decks: int = CHUNK_SIZE, out_dir: str = OUT_DIR,
+                   rng_version: int = RNG_VERSION, checkpoint_every: int = CHECKPOINT_EVERY):
     """
     Create a deck chunk file containing num_decks decks.
-    If the file already exists, skip creation.
+    If a complete file already exists, skip creation; a file of the wrong size is rebuilt.
+    With checkpoint_every set the chunk is written in checkpointed blocks (see
+    generate_chunk_checkpointed); the file contents are the same either way.
     """
     seed = chunk_index + 1
-    rng = random.Random(seed)
     os.makedirs(out_dir, exist_ok=True)
 
-    filename = f"decks_seed{seed:03d}.bin"
+    filename = chunk_name(seed, rng_version)
     path = os.path.join(out_dir, filename)
 
     if os.path.exists(path):
-        print(f"Skipping existing file: {filename}")
-        return None
+        if os.path.getsize(path) == num_decks * BYTES_PER_DECK:
+            print(f"Skipping existing file: {filename}")
+            return None
+        print(f"Rebuilding incomplete file: {filename}")
+
+    if checkpoint_every:
+        generate_chunk_checkpointed(path, seed, num_decks, rng_version, checkpoint_every)
+        print(f"Created file ({num_decks} decks): {filename}")
+        return path
 
-    with open(path, "wb") as f:
-        for _ in range(num_decks):
-            f.write(generate_balanced_deck(rng))
+    data = decks_to_bytes(chunk_decks(seed, num_decks, rng_version))
+
+    # write to a temp file and rename, so a crash never leaves a truncated chunk behind
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
 
     print(f"Created file ({num_decks} decks): {filename}")
     return path
@@ -56,29 +205,38 @@ def get_existing_chunks(out_dir: str = OUT_DIR) -> int:
     return len([f for f in os.listdir(out_dir) if f.startswith("decks_seed") and f.endswith(".bin")])
 
 
-def generate_decks(n_new: int, out_dir: str = OUT_DIR):
+def generate_decks(n_new: int, out_dir: str = OUT_DIR, rng_version: int = RNG_VERSION, workers: int = 1,
+                   checkpoint_every: int = CHECKPOINT_EVERY, pool=None):
     """
     Generate the requested number of new decks.
     Creates full 10k chunks and a final smaller chunk if needed.
+    With workers > 1 the chunks are built in a process pool; each chunk has its
+    own seed, so the files are identical to a serial run. An existing executor
+    can be passed as pool to reuse its workers.
     """
     os.makedirs(out_dir, exist_ok=True)
     existing = get_existing_chunks(out_dir)
 
     num_full_chunks = n_new // CHUNK_SIZE
     remainder = n_new % CHUNK_SIZE
-    generated_files = []
-
-    # Create full chunks
-    for i in range(num_full_chunks):
-        path = generate_chunk(existing + i, CHUNK_SIZE, out_dir)
-        if path:
-            generated_files.append(path)
 
-    # Create final chunk if needed
+    # (chunk_index, num_decks) for every file to create
+    jobs = [(existing + i, CHUNK_SIZE) for i in range(num_full_chunks)]
     if remainder > 0:
-        path = generate_chunk(existing + num_full_chunks, remainder, out_dir)
-        if path:
-            generated_files.append(path)
+        jobs.append((existing + num_full_chunks, remainder))
+
+    indices = [index for index, _ in jobs]
+    sizes = [size for _, size in jobs]
+    args = (indices, sizes, [out_dir] * len(jobs), [rng_version] * len(jobs), [checkpoint_every] * len(jobs))
+    if pool is not None:
+        paths = list(pool.map(generate_chunk, *args))
+    elif workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = list(pool.map(generate_chunk, *args))
+    else:
+        paths = [generate_chunk(index, size, out_dir, rng_version, checkpoint_every) for index, size in jobs]
+
+    generated_files = [path for path in paths if path]
 
     print(f"Generated {n_new} decks across {len(generated_files)} file(s).")
     return generated_files
@@ -89,6 +247,12 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Generate binary deck chunk files.")
     parser.add_argument("num_decks", type=int, help="Number of decks to generate")
+    parser.add_argument("--rng-version", type=int, default=RNG_VERSION, choices=(RNG_V1_SHUFFLE, RNG_V2_NUMPY),
+                        help="RNG stream used to shuffle the decks")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes building chunks in parallel")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                        help="Decks written between checkpoints inside a chunk")
     args = parser.parse_args()
 
-    generate_decks(args.num_decks)
+    generate_decks(args.num_decks, rng_version=args.rng_version, workers=args.workers,
+                   checkpoint_every=args.checkpoint_every)
@@ -1,28 +1,37 @@
-from data_gen import generate_decks
-import scoring  # import whole module, not specific function
+from CODE_data_gen import generate_decks
+import CODE_scoring as scoring  # import whole module, not specific function
 
 
-def augment_data():
+def augment_data(n=None):
     """
-    Generate new decks and then run scoring once on all new data.
+    Generate new decks and then score every deck file that has not been scored yet.
+    Asks how many decks to generate only when n is not given.
     """
-    try:
-        n = int(input("How many new decks would you like to generate? "))
-        if n <= 0:
-            print("Please enter a positive number.")
+    if n is None:
+        try:
+            n = int(input("How many new decks would you like to generate? "))
+        except ValueError:
+            print("Invalid input. Please enter a number.")
             return
-    except ValueError:
-        print("Invalid input. Please enter a number.")
+    if n <= 0:
+        print("Please enter a positive number.")
         return
 
-    # Generate decks
-    generate_decks(n)
+    # Generate decks next to the files CODE_scoring reads
+    generate_decks(n, out_dir=scoring.DECKS_DIR)
     print("Deck generation completed.")
 
-    # Run scoring once overall
-    scoring.main()
+    # Score one file per call until none are left
+    while scoring.main():
+        pass
     print("Scoring completed.")
 
 
 if __name__ == "__main__":
-    augment_data()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate new decks, then score all unscored deck files.")
+    parser.add_argument("num_decks", type=int, nargs="?", help="Number of decks to generate (asks if omitted)")
+    args = parser.parse_args()
+
+    augment_data(args.num_decks)
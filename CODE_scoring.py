@@ -2,9 +2,11 @@ import csv
 import json
 import os
 import time
-import tracemalloc
 from pathlib import Path
 
+from deck_io import decode_records, list_deck_files, map_deck_records
+from memory import MEMORY_MODE, BatchSizer, MemoryMonitor, add_memory_arguments, budget_bytes
+
 # base project directory - was having directory issues
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -20,31 +22,102 @@ PROGRESS_FILE = os.path.join(BASE_DIR, "data", "progress.json")
 DECK_SIZE_BITS = 52
 BYTES_PER_DECK = (DECK_SIZE_BITS + 7) // 8
 
-# sequences and matchups
-SEQUENCES = [
-    "000", "001", "010", "011",
-    "100", "101", "110", "111",
-]
-MATCHUPS = [(p1, p2) for i, p1 in enumerate(SEQUENCES) for j, p2 in enumerate(SEQUENCES) if i != j]
+# decks decoded at a time (a --max-memory budget can lower it)
+BATCH_SIZE = 10_000
+
+# sequences and matchups: every k-card color sequence (k = SEQ_LEN unless a
+# function is given longer or shorter sequence strings)
+SEQ_LEN = 3
+
+def make_sequences(k=SEQ_LEN):
+    return [format(i, f"0{k}b") for i in range(1 << k)]
+
+def make_matchups(k=SEQ_LEN):
+    # all ordered pairs of different k-card sequences (2^k * (2^k - 1) of them)
+    sequences = make_sequences(k)
+    return [(p1, p2) for i, p1 in enumerate(sequences) for j, p2 in enumerate(sequences) if i != j]
+
+SEQUENCES = make_sequences()
+MATCHUPS = make_matchups()
+# matchups as integers for bitwise comparison
+MATCHUP_BITS = [(int(p1, 2), int(p2, 2)) for p1, p2 in MATCHUPS]
+_MATCHUPS = {SEQ_LEN: MATCHUPS}
+_MATCHUP_BITS = {SEQ_LEN: MATCHUP_BITS}
+
+def get_matchups(k=SEQ_LEN):
+    # MATCHUPS for k-card sequences, built once per k
+    if k not in _MATCHUPS:
+        if k < 1:
+            raise ValueError(f"sequence length must be at least 1, got {k}")
+        _MATCHUPS[k] = make_matchups(k)
+    return _MATCHUPS[k]
+
+def matchup_bits(k=SEQ_LEN):
+    # MATCHUP_BITS for k-card sequences, built once per k
+    if k not in _MATCHUP_BITS:
+        _MATCHUP_BITS[k] = [(int(p1, 2), int(p2, 2)) for p1, p2 in get_matchups(k)]
+    return _MATCHUP_BITS[k]
+
+# results and progress of k-card runs - k = SEQ_LEN keeps the original files
+def state_files(k=SEQ_LEN):
+    if k == SEQ_LEN:
+        return PROGRESS_FILE, RESULTS_FILE
+    data_dir = os.path.dirname(RESULTS_FILE)
+    return os.path.join(data_dir, f"progress_k{k}.json"), os.path.join(data_dir, f"results_k{k}.csv")
+
+# writes go to a temp file that is synced, then renamed over the old one
+def write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# new results for the progress at file_index, waiting to be renamed into place
+def pending_results_path(results_path, file_index):
+    return f"{results_path}.{file_index}.pending"
 
 # progress tracking
-def load_progress():
-    if Path(PROGRESS_FILE).exists():
-        with open(PROGRESS_FILE, "r") as f:
-            return json.load(f)
-    return {"matchup_index": 0, "file_index": 0}
+def load_progress(path=PROGRESS_FILE, all_matchups=False, results_path=RESULTS_FILE):
+    progress = {"matchup_index": 0, "file_index": 0}
+    if Path(path).exists():
+        with open(path, "r") as f:
+            progress = json.load(f)
+    # a commit that stopped after saving the progress: finish moving its results in
+    pending = pending_results_path(results_path, progress["file_index"])
+    if Path(pending).exists():
+        os.replace(pending, results_path)
+    # keep all-matchups and round-robin totals apart (older progress has no mode)
+    saved_mode = progress.get("all_matchups", all_matchups)
+    if progress["file_index"] and saved_mode != all_matchups:
+        raise ValueError(f"{path} holds {'all-matchups' if saved_mode else 'round-robin'} results; "
+                         f"can't add {'all-matchups' if all_matchups else 'round-robin'} ones")
+    progress["all_matchups"] = all_matchups
+    return progress
 
-def save_progress(progress):
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump(progress, f)
+def save_progress(progress, path=PROGRESS_FILE):
+    write_json_atomic(path, progress)
+
+def commit_results(results, progress, path=PROGRESS_FILE, results_path=RESULTS_FILE):
+    """
+    Save results and the progress that goes with them as one step: the results are
+    written next to the results file, the progress file is replaced (the commit
+    point), then the results are renamed into place. A crash before the progress is
+    saved leaves the old state; one after it is finished by load_progress.
+    """
+    pending = pending_results_path(results_path, progress["file_index"])
+    save_results(results, pending)
+    save_progress(progress, path)
+    os.replace(pending, results_path)
 
 # results
-def load_results():
+def load_results(path=RESULTS_FILE):
     # load results into dictionary
     results = {}
-    if Path(RESULTS_FILE).exists():
+    if Path(path).exists():
         # if file exists, load existing results
-        with open(RESULTS_FILE, newline="") as f:
+        with open(path, newline="") as f:
             reader = csv.DictReader(f)
             # match sequences to results
             for row in reader: 
@@ -61,7 +134,7 @@ def load_results():
     return results
 
 # save results to csv
-def save_results(results):
+def save_results(results, path=RESULTS_FILE):
     # column names
     fieldnames = [
         "p1_seq", "p2_seq",
@@ -69,8 +142,9 @@ def save_results(results):
         "p1_cards", "p2_cards", "draws_cards",
         "runs",
     ]
-    # write results back to CSV
-    with open(RESULTS_FILE, "w", newline="") as f:
+    # write results back to CSV (through a temp file, so a crash never leaves half a file)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         # write each row
@@ -80,16 +154,9 @@ def save_results(results):
                 "p2_seq": p2_seq,
                 **vals
             })
-
-# read decks
-def read_decks_from_file(filename):
-    decks = []
-    # read decks from binary file
-    with open(filename, "rb") as f:
-        while (chunk := f.read(BYTES_PER_DECK)):
-            deck_int = int.from_bytes(chunk, "big")
-            decks.append(deck_int)
-    return decks
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 # play one deck
 def play_deck(deck_int, p1_seq, p2_seq):
@@ -101,23 +168,25 @@ def play_deck(deck_int, p1_seq, p2_seq):
     # convert sequences to integers for bitwise comparison
     p1_bits = int(p1_seq, 2)
     p2_bits = int(p2_seq, 2)
+    k = len(p1_seq)
+    mask = (1 << k) - 1
 
     # scan through deck
-    while i <= n - 3:
-        window = (deck_int >> (n - 3 - i)) & 0b111
+    while i <= n - k:
+        window = (deck_int >> (n - k - i)) & mask
         # if match found for player 1 or player 2
         if window == p1_bits:
             p1_tricks += 1
-            p1_cards += (i + 3)
-            n -= (i + 3)
+            p1_cards += (i + k)
+            n -= (i + k)
             deck_int &= (1 << n) - 1
             i = 0
             continue
         # else if match found for player 2
         elif window == p2_bits:
             p2_tricks += 1
-            p2_cards += (i + 3)
-            n -= (i + 3)
+            p2_cards += (i + k)
+            n -= (i + k)
             deck_int &= (1 << n) - 1
             i = 0
             continue
@@ -129,74 +198,150 @@ def play_deck(deck_int, p1_seq, p2_seq):
 
     return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
 
+# find where every k-bit sequence starts in a deck
+def find_occurrences(deck_int, n=DECK_SIZE_BITS, k=SEQ_LEN):
+    # one list of start positions per window value (0 to 2^k - 1)
+    occurrences = [[] for _ in range(1 << k)]
+    for i in range(n - k + 1):
+        occurrences[(deck_int >> (n - k - i)) & ((1 << k) - 1)].append(i)
+    return occurrences
+
+# play one matchup using precomputed occurrences
+def resolve_matchup(occurrences, p1_bits, p2_bits, n=DECK_SIZE_BITS, k=SEQ_LEN):
+    p1_pos = occurrences[p1_bits]
+    p2_pos = occurrences[p2_bits]
+    a = b = cut = 0
+    p1_tricks = p2_tricks = 0
+    p1_cards = p2_cards = 0
+
+    # next trick is the earliest occurrence starting after the last trick
+    while True:
+        # skip occurrences that overlap cards already taken
+        while a < len(p1_pos) and p1_pos[a] < cut:
+            a += 1
+        while b < len(p2_pos) and p2_pos[b] < cut:
+            b += 1
+        next1 = p1_pos[a] if a < len(p1_pos) else n
+        next2 = p2_pos[b] if b < len(p2_pos) else n
+        # no more tricks left in deck
+        if next1 == next2 == n:
+            break
+        if next1 < next2:
+            p1_tricks += 1
+            p1_cards += next1 + k - cut
+            cut = next1 + k
+        else:
+            p2_tricks += 1
+            p2_cards += next2 + k - cut
+            cut = next2 + k
+
+    # count remaining cards as draws
+    draws_tricks = 1 if p1_tricks == p2_tricks else 0
+    draws_cards = 1 if p1_cards == p2_cards else 0
+
+    return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
+
+# play one deck against every matchup
+def play_deck_all_matchups(deck_int, k=SEQ_LEN):
+    # scan deck once, then resolve each game from the occurrences
+    occurrences = find_occurrences(deck_int, k=k)
+    return [resolve_matchup(occurrences, p1_bits, p2_bits, k=k) for p1_bits, p2_bits in matchup_bits(k)]
+
+# add one game to the results dictionary
+def update_results(results, key, stats):
+    p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = stats
+    # initialize if new matchup
+    if key not in results:
+        results[key] = {
+            "p1_tricks": 0,
+            "p2_tricks": 0,
+            "draws_tricks": 0,
+            "p1_cards": 0,
+            "p2_cards": 0,
+            "draws_cards": 0,
+            "runs": 0,
+        }
+    # update results
+    results[key]["p1_tricks"] += p1_tricks
+    results[key]["p2_tricks"] += p2_tricks
+    results[key]["draws_tricks"] += draws_tricks
+    results[key]["p1_cards"] += p1_cards
+    results[key]["p2_cards"] += p2_cards
+    results[key]["draws_cards"] += draws_cards
+    results[key]["runs"] += 1
+
 # main loop
-def main():
+def main(all_matchups=False, memory_mode=MEMORY_MODE, max_memory=None, batch_size=BATCH_SIZE, k=SEQ_LEN):
+    # k-card sequences keep their own progress and results
+    matchups = get_matchups(k)
+    progress_file, results_file = state_files(k)
+
     # keep track of progress
-    progress = load_progress()
+    progress = load_progress(progress_file, all_matchups, results_file)
     matchup_index = progress["matchup_index"]
     file_index = progress["file_index"]
 
-    # locate deck file
-    decks_file = os.path.join(DECKS_DIR, f"decks_seed{file_index+1:03d}.bin")
-    if not Path(decks_file).exists():
+    # locate deck file (v1 and versioned chunk names, ordered by seed)
+    deck_files = list_deck_files(DECKS_DIR)
+    if file_index >= len(deck_files):
         print(f"No more deck files to process at index {file_index}. Done!")
-        return
+        return False
+    decks_file = deck_files[file_index]
 
     # start runtime + memory
     start_time = time.perf_counter()
-    tracemalloc.start()
+    monitor = MemoryMonitor(memory_mode).start()
 
-    # read all decks in file
-    decks = read_decks_from_file(decks_file)
-    print(f"Processing file: {decks_file} with {len(decks)} decks...")
+    # memory-map the file and decode it a batch at a time
+    records = map_deck_records(decks_file)
+    print(f"Processing file: {decks_file} with {len(records)} decks...")
 
     # load past results
-    results = load_results()
-
-    # loop through all decks
-    for deck_int in decks:
-        # find matchup
-        p1_seq, p2_seq = MATCHUPS[matchup_index]
-        p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = play_deck(deck_int, p1_seq, p2_seq)
-
-        # store results in dictionary
-        key = (p1_seq, p2_seq)
-        if key not in results:
-            results[key] = {
-                "p1_tricks": 0,
-                "p2_tricks": 0,
-                "draws_tricks": 0,
-                "p1_cards": 0,
-                "p2_cards": 0,
-                "draws_cards": 0,
-                "runs": 0,
-            }
-        # update results
-        results[key]["p1_tricks"] += p1_tricks
-        results[key]["p2_tricks"] += p2_tricks
-        results[key]["draws_tricks"] += draws_tricks
-        results[key]["p1_cards"] += p1_cards
-        results[key]["p2_cards"] += p2_cards
-        results[key]["draws_cards"] += draws_cards
-        results[key]["runs"] += 1
-
-        matchup_index = (matchup_index + 1) % len(MATCHUPS)
-
-    save_results(results)
-
-    # update progress
+    results = load_results(results_file)
+
+    # batches shrink if the process goes over max_memory; results is one small dict per
+    # matchup whatever the number of decks, so the batch is the only part that grows
+    sizer = BatchSizer(batch_size, budget_bytes(max_memory))
+    start = 0
+    while start < len(records):
+        decks = decode_records(records[start:start + sizer.next_size()]).tolist()
+        start += len(decks)
+        if all_matchups:
+            # every deck plays all matchups, matchup_index stays the same
+            for deck_int in decks:
+                for key, stats in zip(matchups, play_deck_all_matchups(deck_int, k)):
+                    update_results(results, key, stats)
+        else:
+            # loop through all decks
+            for deck_int in decks:
+                # find matchup
+                p1_seq, p2_seq = matchups[matchup_index]
+                update_results(results, (p1_seq, p2_seq), play_deck(deck_int, p1_seq, p2_seq))
+                matchup_index = (matchup_index + 1) % len(matchups)
+
+    # update progress, saved together with the results
     progress["matchup_index"] = matchup_index
     progress["file_index"] = file_index + 1
-    save_progress(progress)
+    commit_results(results, progress, progress_file, results_file)
 
     # end runtime + memory
     elapsed = time.perf_counter() - start_time
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
+    monitor.stop()
 
     # print stats
     print(f"Finished file {file_index+1}. Next run will use file index {file_index+1}.")
-    print(f"Runtime: {elapsed:.2f} seconds | Peak memory: {peak / (1024*1024):.2f} MB")
+    print(f"Runtime: {elapsed:.2f} seconds | {monitor.describe()}")
+    return True
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score the next deck file.")
+    parser.add_argument("--all-matchups", action="store_true", help="Play every deck against all matchups")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Decks decoded per batch")
+    parser.add_argument("--k", type=int, default=SEQ_LEN,
+                        help=f"Sequence length (default {SEQ_LEN}; other lengths get their own progress and results files)")
+    add_memory_arguments(parser)
+    args = parser.parse_args()
+
+    main(args.all_matchups, args.memory_mode, args.max_memory, args.batch_size, args.k)
\ No newline at end of file
@@ -0,0 +1,303 @@
+import math
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from aggregate import Aggregate
+from scoring_bit import MATCHUPS, write_json_atomic
+from scoring_numpy import MATCHUP_P1, MATCHUP_P2, accumulate, play_decks
+
+# config
+ADAPTIVE_RESULTS_FILE = "results_adaptive.csv"
+ADAPTIVE_REPORT_FILE = "adaptive_report.json"
+Z = 1.96                    # two-sided 95% intervals, over all the looks at a matchup
+LOOK_GROWTH = 1.5           # a matchup's intervals are checked at min_games * LOOK_GROWTH^j games
+WIN_PRECISION = 0.01        # target half-width of every win-rate interval
+CARDS_PRECISION = 0.5       # target half-width of the mean card-margin interval, in cards
+MIN_GAMES = 1_000           # games a matchup plays before it may count as converged
+MAX_DECKS = 10_000_000      # give up after this many decks even if some matchups haven't converged
+MIN_STEP = 100              # fewest games an active matchup is handed at a time
+BATCH_SIZE = 50_000
+
+
+def look_schedule(min_games=MIN_GAMES, max_games=MAX_DECKS, growth=LOOK_GROWTH):
+    # game counts at which a matchup's intervals are checked, planned before any game is played
+    looks = [min_games]
+    while looks[-1] < max_games:
+        looks.append(max(looks[-1] + 1, math.ceil(looks[-1] * growth)))
+    return looks
+
+
+def look_z(z, num_looks):
+    """
+    Per-look z-score for a run that may stop at any of num_looks looks. Checking an
+    interval again after every batch and stopping once it is narrow enough would
+    make its real coverage fall below nominal; splitting the error rate alpha of z
+    evenly over the planned looks (Bonferroni) keeps every stopped interval at
+    nominal coverage or better, at the price of wider intervals and more games.
+    """
+    alpha = 2 * (1 - NormalDist().cdf(z))
+    return NormalDist().inv_cdf(1 - alpha / (2 * num_looks))
+
+
+def wilson_interval(successes, n, z=Z):
+    # Wilson score interval (low, high) for a binomial proportion; (0, 1) with no data
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class RunningStats:
+    """
+    Streaming mean and variance (Welford). Whole batches are folded in with the
+    pairwise update of Chan et al., so it stays exact without a per-value loop.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0   # sum of squared deviations from the mean
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else math.inf
+
+    def interval(self, z=Z):
+        # normal-approximation interval for the mean
+        if self.n < 2:
+            return -math.inf, math.inf
+        half = z * math.sqrt(self.variance() / self.n)
+        return self.mean - half, self.mean + half
+
+
+class MatchupEstimate:
+    """
+    Running estimates for one matchup: p1's win rate by tricks and by cards
+    (Wilson intervals; draws count as not winning) and the mean card margin
+    p1_cards - p2_cards (Welford).
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.wins_tricks = 0
+        self.wins_cards = 0
+        self.margin = RunningStats()
+
+    def add(self, p1_tricks, p2_tricks, p1_cards, p2_cards):
+        # per-game arrays for a batch of this matchup's games
+        self.games += len(p1_tricks)
+        self.wins_tricks += int((p1_tricks > p2_tricks).sum())
+        self.wins_cards += int((p1_cards > p2_cards).sum())
+        self.margin.add(p1_cards - p2_cards)
+
+    def intervals(self, z=Z):
+        return {
+            "win_rate_tricks": wilson_interval(self.wins_tricks, self.games, z),
+            "win_rate_cards": wilson_interval(self.wins_cards, self.games, z),
+            "card_margin": self.margin.interval(z),
+        }
+
+    def converged(self, win_precision=WIN_PRECISION, cards_precision=CARDS_PRECISION,
+                  min_games=MIN_GAMES, z=Z):
+        if self.games < min_games:
+            return False
+        ci = self.intervals(z)
+        return ((ci["win_rate_tricks"][1] - ci["win_rate_tricks"][0]) / 2 <= win_precision
+                and (ci["win_rate_cards"][1] - ci["win_rate_cards"][0]) / 2 <= win_precision
+                and (ci["card_margin"][1] - ci["card_margin"][0]) / 2 <= cards_precision)
+
+    def games_needed(self, win_precision=WIN_PRECISION, cards_precision=CARDS_PRECISION,
+                     min_games=MIN_GAMES, z=Z):
+        # more games this matchup probably needs: half-widths shrink as 1/sqrt(games)
+        if self.games < min_games:
+            return min_games - self.games
+        ci = self.intervals(z)
+        ratio = max((ci["win_rate_tricks"][1] - ci["win_rate_tricks"][0]) / 2 / win_precision,
+                    (ci["win_rate_cards"][1] - ci["win_rate_cards"][0]) / 2 / win_precision,
+                    (ci["card_margin"][1] - ci["card_margin"][0]) / 2 / cards_precision)
+        return max(0, math.ceil(self.games * (ratio * ratio - 1)))
+
+    def summary(self, z=Z):
+        ci = self.intervals(z)
+        return {
+            "games": self.games,
+            "win_rate_tricks": self.wins_tricks / self.games if self.games else None,
+            "win_rate_cards": self.wins_cards / self.games if self.games else None,
+            "card_margin": self.margin.mean if self.margin.n else None,
+            "intervals": {name: [b if math.isfinite(b) else None for b in bounds] for name, bounds in ci.items()},
+        }
+
+
+class AdaptiveScheduler:
+    """
+    Hands out decks only to matchups whose intervals are still too wide (a fixed
+    schedule gives every matchup the same share). Each active matchup gets about
+    the games its current interval says it still needs, at least MIN_STEP, rounded
+    up to the next planned look (see look_schedule); it is only checked at those
+    looks, with the Bonferroni z of look_z, drops out once it has converged, and the
+    run is done when none are left.
+    """
+
+    def __init__(self, win_precision=WIN_PRECISION, cards_precision=CARDS_PRECISION,
+                 min_games=MIN_GAMES, z=Z, max_games=MAX_DECKS, look_growth=LOOK_GROWTH):
+        self.win_precision = win_precision
+        self.cards_precision = cards_precision
+        self.min_games = min_games
+        self.looks = look_schedule(min_games, max_games, look_growth)
+        self.z = z                                      # nominal, for the whole run
+        self.look_z = look_z(z, len(self.looks))        # used at each look
+        self.estimates = [MatchupEstimate() for _ in MATCHUPS]
+        self.active = list(range(len(MATCHUPS)))
+        self.results = Aggregate()  # totals for every game played
+        self.decks = 0
+
+    @property
+    def done(self):
+        return not self.active
+
+    def next_look(self, games):
+        # first planned look at or after `games` games (past the last look: games itself)
+        i = np.searchsorted(self.looks, games)
+        return int(self.looks[i]) if i < len(self.looks) else games
+
+    def assign(self, num_decks):
+        # matchup id for each of up to num_decks decks (fewer if the active matchups need fewer)
+        needs = []
+        for m in self.active:
+            games = self.estimates[m].games
+            need = max(MIN_STEP, self.estimates[m].games_needed(
+                self.win_precision, self.cards_precision, self.min_games, self.look_z))
+            needs.append(self.next_look(games + need) - games)
+        return np.repeat(self.active, needs)[:num_decks]
+
+    def update(self, matchup_ids, stats):
+        # fold one batch into the estimates and results, then drop converged matchups
+        p1_tricks, p2_tricks, _, p1_cards, p2_cards, _ = stats
+        accumulate(self.results, matchup_ids, stats)
+        order = np.argsort(matchup_ids, kind="stable")
+        ids = matchup_ids[order]
+        bounds = np.flatnonzero(np.diff(ids)) + 1
+        for group in np.split(np.arange(len(ids)), bounds):
+            games = order[group]
+            self.estimates[ids[group[0]]].add(p1_tricks[games], p2_tricks[games], p1_cards[games], p2_cards[games])
+        self.decks += len(matchup_ids)
+        # only a matchup sitting exactly on a planned look is checked; one cut short by
+        # the batch gets the rest of its games next round
+        looks = set(self.looks)
+        self.active = [m for m in self.active if not (self.estimates[m].games in looks and self.estimates[m].converged(
+            self.win_precision, self.cards_precision, self.min_games, self.look_z))]
+
+    def score(self, decks):
+        # play decks against the active matchups; returns how many were used
+        if self.done or len(decks) == 0:
+            return 0
+        matchup_ids = self.assign(len(decks))
+        decks = decks[:len(matchup_ids)]
+        stats = play_decks(decks, MATCHUP_P1[matchup_ids], MATCHUP_P2[matchup_ids])
+        self.update(matchup_ids, stats)
+        return len(decks)
+
+    def fixed_decks_needed(self):
+        # decks a fixed equal-share schedule would need: every matchup gets as many
+        # games as the slowest one did
+        return max(e.games for e in self.estimates) * len(MATCHUPS)
+
+    def report(self):
+        return {
+            "target": {"win_precision": self.win_precision, "cards_precision": self.cards_precision,
+                       "min_games": self.min_games, "z": self.z, "looks": len(self.looks),
+                       "look_z": self.look_z},
+            "decks": self.decks,
+            "converged": len(MATCHUPS) - len(self.active),
+            "unconverged": [list(MATCHUPS[m]) for m in self.active],
+            "fixed_schedule_decks": self.fixed_decks_needed(),
+            "matchups": [dict(p1_seq=p1, p2_seq=p2, **e.summary(self.look_z))
+                         for (p1, p2), e in zip(MATCHUPS, self.estimates)],
+        }
+
+
+def run_adaptive(batches, scheduler=None, max_decks=MAX_DECKS, out=ADAPTIVE_RESULTS_FILE,
+                 report_path=ADAPTIVE_REPORT_FILE):
+    """
+    Score uint64 deck batches (any iterable, e.g. pipeline.stream_decks or files
+    read with deck_io) until every matchup has converged or max_decks were used.
+    Saves the results CSV and a JSON report with every matchup's intervals.
+    """
+    scheduler = scheduler or AdaptiveScheduler()
+    start_time = time.perf_counter()
+    for decks in batches:
+        # a batch may take several rounds once only a few matchups are left
+        while len(decks) and not scheduler.done and scheduler.decks < max_decks:
+            used = scheduler.score(decks[:max_decks - scheduler.decks])
+            decks = decks[used:]
+            print(f"{scheduler.decks:,} decks | "
+                  f"{len(MATCHUPS) - len(scheduler.active)}/{len(MATCHUPS)} matchups converged")
+        if scheduler.done or scheduler.decks >= max_decks:
+            break
+    elapsed = time.perf_counter() - start_time
+
+    scheduler.results.export_csv(out)
+    report = scheduler.report()
+    report["seconds"] = elapsed
+    write_json_atomic(report_path, report)
+
+    if scheduler.done:
+        fixed = report["fixed_schedule_decks"]
+        print(f"All matchups converged after {scheduler.decks:,} decks in {elapsed:.2f} seconds "
+              f"(a fixed schedule would need {fixed:,}; this used {scheduler.decks / fixed:.0%} of that)")
+    else:
+        print(f"Stopped at {scheduler.decks:,} decks with {len(scheduler.active)} matchups not converged")
+    print(f"Results saved to {out}, report to {report_path}")
+    return scheduler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from deck_io import list_deck_files, prefetch_deck_arrays
+    from pipeline import stream_decks
+    from scoring_bit import DECKS_DIR
+
+    parser = argparse.ArgumentParser(description="Score matchups until their confidence intervals reach a target width.")
+    parser.add_argument("--win-precision", type=float, default=WIN_PRECISION, help="Target win-rate half-width")
+    parser.add_argument("--cards-precision", type=float, default=CARDS_PRECISION, help="Target card-margin half-width")
+    parser.add_argument("--min-games", type=int, default=MIN_GAMES, help="Games per matchup before it can converge")
+    parser.add_argument("--z", type=float, default=Z,
+                        help="Interval z-score over all looks (1.96 = 95%%); each look uses a Bonferroni-adjusted one")
+    parser.add_argument("--look-growth", type=float, default=LOOK_GROWTH,
+                        help="Factor between the game counts at which a matchup is checked")
+    parser.add_argument("--max-decks", type=int, default=MAX_DECKS, help="Stop after this many decks")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Decks per batch (files are split to this size)")
+    parser.add_argument("--from-files", action="store_true", help=f"Read decks from {DECKS_DIR} instead of generating them")
+    parser.add_argument("--out", default=ADAPTIVE_RESULTS_FILE, help="Results CSV")
+    parser.add_argument("--report", default=ADAPTIVE_REPORT_FILE, help="JSON report")
+    args = parser.parse_args()
+    if args.look_growth <= 1:
+        parser.error("--look-growth must be greater than 1")
+
+    if args.from_files:
+        source = (decks[start:start + args.batch_size]
+                  for _, decks in prefetch_deck_arrays(list_deck_files(DECKS_DIR))
+                  for start in range(0, len(decks), args.batch_size))
+    else:
+        source = stream_decks(args.max_decks, args.batch_size)
+    scheduler = AdaptiveScheduler(args.win_precision, args.cards_precision, args.min_games, args.z,
+                                  args.max_decks, args.look_growth)
+    run_adaptive(source, scheduler, args.max_decks, args.out, args.report)
@@ -0,0 +1,239 @@
+import csv
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:  # Tally needs no NumPy (the mask engine runs on workers without it)
+    np = None
+
+# standard-library config (scoring_bit imports this module, so it can't import scoring_bit)
+from scoring import MATCHUPS
+
+# config
+RESULTS_FILE = "results_2.csv"   # the totals shared by scoring_bit, scoring_numpy and the pipeline
+
+# results columns, in results.csv order; one row of an Aggregate per matchup
+STAT_NAMES = [
+    "p1_tricks", "p2_tricks", "draws_tricks",
+    "p1_cards", "p2_cards", "draws_cards",
+    "runs",
+]
+RUNS = STAT_NAMES.index("runs")
+
+
+class Tally:
+    """
+    Game counts as plain lists, rows[matchup_id][stat], for adding one game at a
+    time: add() is seven list updates where a results dict hashes a (p1_seq, p2_seq)
+    tuple and a stat name for each one. Needs no NumPy; as_aggregate() turns it
+    into an Aggregate.
+    """
+
+    def __init__(self, matchups=MATCHUPS):
+        self.matchups = [tuple(key) for key in matchups]
+        self.rows = [[0] * len(STAT_NAMES) for _ in self.matchups]
+
+    def add(self, matchup_id, stats):
+        # one game (a play_deck result tuple)
+        p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = stats
+        row = self.rows[matchup_id]
+        row[0] += p1_tricks
+        row[1] += p2_tricks
+        row[2] += draws_tricks
+        row[3] += p1_cards
+        row[4] += p2_cards
+        row[5] += draws_cards
+        row[6] += 1
+
+
+class Aggregate:
+    """
+    Results as an int64 array counts[matchup_id, stat] instead of a dict of dicts.
+    Batches are added with one bincount per stat, merging two aggregates is one
+    array add, and save()/load() keep it as a binary .npz file; to_results() and
+    export_csv() give the usual results dict / results.csv.
+
+        agg = Aggregate()
+        agg.add(matchup_id, stats)          # one game, from the scalar engines
+        agg.add_batch(matchup_ids, stats)   # stats as returned by scoring_numpy.play_decks
+        agg.merge(partial)                  # another Aggregate, a Tally or a results dict
+        agg.export_csv("results_2.csv")
+
+    Single games go into a Tally first (updating a NumPy row per game costs twice
+    a dict update) and are folded into counts the next time it is read.
+    """
+
+    def __init__(self, matchups=MATCHUPS, counts=None):
+        self.matchups = [tuple(key) for key in matchups]
+        self.index = {key: m for m, key in enumerate(self.matchups)}
+        if counts is None:
+            counts = np.zeros((len(self.matchups), len(STAT_NAMES)), dtype=np.int64)
+        self._counts = counts
+        self._staged = None  # Tally of games added one at a time
+        self.progress = None  # progress saved with these totals (see save_aggregate)
+
+    @property
+    def counts(self):
+        if self._staged is not None:
+            self._counts += np.array(self._staged.rows, dtype=np.int64)
+            self._staged = None
+        return self._counts
+
+    def add(self, matchup_id, stats):
+        # one game (a play_deck result tuple)
+        if self._staged is None:
+            self._staged = Tally(self.matchups)
+        self._staged.add(matchup_id, stats)
+
+    def add_batch(self, matchup_ids, stats):
+        """
+        Many games at once: matchup_ids[i] played game i and stats are six per-game
+        arrays in play_deck order. bincount sums in float64, which is exact for any
+        batch below 2^53 / 52 games.
+        """
+        matchup_ids = np.asarray(matchup_ids, dtype=np.intp)
+        size = len(self.matchups)
+        counts = self.counts
+        for column, values in enumerate(stats):
+            counts[:, column] += np.bincount(matchup_ids, weights=values, minlength=size).astype(np.int64)
+        counts[:, RUNS] += np.bincount(matchup_ids, minlength=size)
+
+    def merge(self, other):
+        # add another Aggregate (or a Tally or results dict) into this one
+        other = as_aggregate(other, self.matchups)
+        counts = self.counts
+        if other.matchups == self.matchups:
+            counts += other.counts
+        else:
+            for key, row in zip(other.matchups, other.counts):
+                if key not in self.index:
+                    raise ValueError(f"Matchup {key} is not in this aggregate")
+                counts[self.index[key]] += row
+        return self
+
+    def total(self, name):
+        return int(self.counts[:, STAT_NAMES.index(name)].sum())
+
+    def total_tricks(self):
+        # tricks won by either player across every matchup
+        return self.total("p1_tricks") + self.total("p2_tricks")
+
+    # dict / CSV
+    def to_results(self, results=None):
+        # matchups that played at least once, as a results dict (added into results if given)
+        results = {} if results is None else results
+        for key, row in zip(self.matchups, self.counts.tolist()):
+            if not row[RUNS]:
+                continue
+            if key not in results:
+                results[key] = dict.fromkeys(STAT_NAMES, 0)
+            for name, value in zip(STAT_NAMES, row):
+                results[key][name] += value
+        return results
+
+    @classmethod
+    def from_results(cls, results, matchups=MATCHUPS):
+        agg = cls(matchups)
+        for key, vals in results.items():
+            if key not in agg.index:
+                raise ValueError(f"Matchup {key} is not in this aggregate")
+            agg.counts[agg.index[key]] = [vals[name] for name in STAT_NAMES]
+        return agg
+
+    def export_csv(self, path):
+        # results.csv layout, matchups that played at least once (temp file + rename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["p1_seq", "p2_seq"] + STAT_NAMES)
+            for (p1_seq, p2_seq), row in zip(self.matchups, self.counts.tolist()):
+                if row[RUNS]:
+                    writer.writerow([p1_seq, p2_seq] + row)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_csv(cls, path, matchups=MATCHUPS):
+        # empty aggregate if the file doesn't exist
+        agg = cls(matchups)
+        if os.path.exists(path):
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    key = (row["p1_seq"], row["p2_seq"])
+                    if key not in agg.index:
+                        raise ValueError(f"Matchup {key} in {path} is not in this aggregate")
+                    agg.counts[agg.index[key]] = [int(row[name]) for name in STAT_NAMES]
+        return agg
+
+    # binary
+    def save(self, path):
+        # atomic .npz write (np.savez is given a file object so it doesn't add a suffix)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, counts=self.counts, stats=np.array(STAT_NAMES),
+                     p1_seq=np.array([p1 for p1, _ in self.matchups]),
+                     p2_seq=np.array([p2 for _, p2 in self.matchups]),
+                     progress=np.array(json.dumps(self.progress)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if list(data["stats"]) != STAT_NAMES:
+                raise ValueError(f"{path} has stats {list(data['stats'])}, expected {STAT_NAMES}")
+            matchups = list(zip(data["p1_seq"].tolist(), data["p2_seq"].tolist()))
+            agg = cls(matchups, data["counts"].astype(np.int64))
+            if "progress" in data:
+                agg.progress = json.loads(str(data["progress"]))
+            return agg
+
+
+def totals_bytes(num_matchups):
+    # rough memory of one Aggregate with games staged: an int64 row plus a Tally row
+    # (a list and up to 7 int objects) per matchup - fixed, however many games it holds
+    return num_matchups * (len(STAT_NAMES) * (8 + 8 + 32) + 56)
+
+
+def as_aggregate(results, matchups=MATCHUPS):
+    # an Aggregate for any kind of partial results (the mask engine returns a Tally)
+    if isinstance(results, Aggregate):
+        return results
+    if isinstance(results, Tally):
+        return Aggregate(results.matchups, np.array(results.rows, dtype=np.int64))
+    return Aggregate.from_results(results, matchups)
+
+
+# the shared results files: the binary file holds the totals, the CSV is an export
+def aggregate_path(csv_path=None):
+    # binary file kept next to a results CSV (results_2.csv -> results_2.npz)
+    return os.path.splitext(csv_path or RESULTS_FILE)[0] + ".npz"
+
+
+def load_aggregate(csv_path=None, matchups=MATCHUPS):
+    """
+    The running totals from the binary file. A CSV with no binary file next to it
+    (results written before the binary format) is read once instead; the next
+    save_aggregate writes the binary file, and from then on the CSV is only an export.
+    """
+    csv_path = csv_path or RESULTS_FILE
+    path = aggregate_path(csv_path)
+    if os.path.exists(path):
+        return Aggregate.load(path)
+    return Aggregate.from_csv(csv_path, matchups)
+
+
+def save_aggregate(agg, csv_path=None, progress=None):
+    """
+    Binary totals first, then the CSV export. progress (the progress file contents
+    after these totals) goes into the same binary file, so totals and progress are
+    replaced together by one rename; see scoring_bit.commit_results.
+    """
+    csv_path = csv_path or RESULTS_FILE
+    if progress is not None:
+        agg.progress = dict(progress)
+    agg.save(aggregate_path(csv_path))
+    agg.export_csv(csv_path)
@@ -0,0 +1,271 @@
+import os
+import time
+
+import numpy as np
+
+from CODE_data_gen import generate_balanced_decks
+from deck_io import BYTES_PER_DECK, DECK_SIZE_BITS, decode_records
+from deck_rank import RANK_BITS, pack_ranks, rank_decks, unpack_ranks, unrank_decks
+from scoring_bit import write_json_atomic
+
+# config
+BENCH_DIR = "bench_io"          # data files and the report live here, away from decks_chunks and results
+REPORT_NAME = "bench_io.json"
+SIZES = {"1m": 1_000_000, "10m": 10_000_000, "100m": 100_000_000}
+DEFAULT_SIZES = ["1m"]
+BLOCK_DECKS = 1 << 20           # decks per write/read block (a multiple of 8, see deck_rank.PACK_BLOCK)
+RANDOM_READS = 10_000
+FIXTURE_SEED = 20240101
+
+# storage formats; mmap reads the u64 file through a memory map instead of read()
+#   bin7    7-byte big-endian records (the decks_chunks layout)
+#   text    52 '0'/'1' characters + newline per deck (method2 layout)
+#   u64     aligned little-endian uint64 records (the container layout)
+#   rank49  49-bit combinatorial ranks, bit-packed (deck_rank)
+FORMATS = ["bin7", "text", "u64", "mmap", "rank49"]
+FILE_NAMES = {"bin7": "decks.bin", "text": "decks.txt", "u64": "decks.u64", "rank49": "decks.rank"}
+BITS_PER_DECK = {"bin7": BYTES_PER_DECK * 8, "text": (DECK_SIZE_BITS + 1) * 8, "u64": 64, "rank49": RANK_BITS}
+
+
+def _file_format(fmt):
+    return "u64" if fmt == "mmap" else fmt
+
+
+def _span(fmt, start, count):
+    # (byte offset, byte length) holding decks [start, start + count)
+    bits = BITS_PER_DECK[_file_format(fmt)]
+    first = start * bits // 8
+    return first, ((start + count) * bits + 7) // 8 - first
+
+
+# encoding / decoding
+def _encode(fmt, decks):
+    if fmt == "bin7":
+        return decks.astype(">u8").view(np.uint8).reshape(-1, 8)[:, 8 - BYTES_PER_DECK:].tobytes()
+    if fmt == "text":
+        bits = np.unpackbits(decks.astype(">u8").view(np.uint8).reshape(-1, 8), axis=1)[:, 64 - DECK_SIZE_BITS:]
+        lines = np.full((len(decks), DECK_SIZE_BITS + 1), ord("\n"), dtype=np.uint8)
+        lines[:, :DECK_SIZE_BITS] = bits + ord("0")
+        return lines.tobytes()
+    if fmt == "u64":
+        return decks.astype("<u8").tobytes()
+    if fmt == "rank49":
+        return pack_ranks(rank_decks(decks))
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def _decode(fmt, raw, count):
+    # raw bytes of `count` decks -> uint64 array
+    data = np.frombuffer(raw, dtype=np.uint8)
+    if fmt == "bin7":
+        return decode_records(data.reshape(-1, BYTES_PER_DECK))
+    if fmt == "text":
+        bits = data.reshape(-1, DECK_SIZE_BITS + 1)[:, :DECK_SIZE_BITS] - ord("0")
+        padded = np.zeros((count, 64), dtype=np.uint8)
+        padded[:, 64 - DECK_SIZE_BITS:] = bits
+        return np.packbits(padded, axis=1).view(">u8").ravel().astype(np.uint64)
+    if fmt == "u64":
+        return data.view("<u8").astype(np.uint64)
+    if fmt == "rank49":
+        return unrank_decks(unpack_ranks(raw, count))
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def _decode_one(fmt, raw, start):
+    # one deck as a Python int from the bytes of _span(fmt, start, 1)
+    if fmt == "bin7":
+        return int.from_bytes(raw, "big")
+    if fmt == "text":
+        return int(raw[:DECK_SIZE_BITS], 2)
+    if fmt == "u64":
+        return int.from_bytes(raw, "little")
+    if fmt == "rank49":
+        # the span starts on the byte holding the rank's first bit (same maths as deck_rank.rank_at)
+        first_bit = start * RANK_BITS % 8
+        rank = (int.from_bytes(raw, "big") >> (len(raw) * 8 - first_bit - RANK_BITS)) & ((1 << RANK_BITS) - 1)
+        return int(unrank_decks([rank])[0])
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+# timing helpers
+def _evict(path):
+    # flush a file and drop it from the page cache so reads hit the disk (Linux only; a no-op elsewhere)
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def _rate(seconds, num_decks, num_bytes):
+    return {
+        "seconds": seconds,
+        "decks_per_sec": num_decks / seconds if seconds > 0 else None,
+        "mb_per_sec": num_bytes / (1024 * 1024) / seconds if seconds > 0 else None,
+    }
+
+
+def _blocks(num_decks):
+    return [(start, min(BLOCK_DECKS, num_decks - start)) for start in range(0, num_decks, BLOCK_DECKS)]
+
+
+def _fixture_block(start, count):
+    # deterministic decks for one block, independent of the other blocks
+    return generate_balanced_decks(count, FIXTURE_SEED + start // BLOCK_DECKS)
+
+
+# stages
+def bench_write(formats, num_decks, out_dir):
+    """
+    Write num_decks fixture decks in every file format, block by block. Each block is
+    generated once (untimed) and then encoded + written per format (timed).
+    Returns {format: seconds}.
+    """
+    file_formats = sorted({_file_format(fmt) for fmt in formats})
+    seconds = dict.fromkeys(file_formats, 0.0)
+    files = {fmt: open(os.path.join(out_dir, FILE_NAMES[fmt]), "wb") for fmt in file_formats}
+    try:
+        for start, count in _blocks(num_decks):
+            decks = _fixture_block(start, count)
+            for fmt in file_formats:
+                t0 = time.perf_counter()
+                files[fmt].write(_encode(fmt, decks))
+                seconds[fmt] += time.perf_counter() - t0
+        for fmt in file_formats:
+            t0 = time.perf_counter()
+            files[fmt].flush()
+            os.fsync(files[fmt].fileno())
+            seconds[fmt] += time.perf_counter() - t0
+    finally:
+        for f in files.values():
+            f.close()
+    return seconds
+
+
+def bench_sequential(fmt, num_decks, path):
+    """
+    Read the whole file block by block. Returns (read seconds, decode seconds):
+    read() for the file formats, page faults + copy for mmap (whose decode is free).
+    The first block is checked against the fixture.
+    """
+    read_time = decode_time = 0.0
+    if fmt == "mmap":
+        mapped = np.memmap(path, dtype="<u8", mode="r")
+        for start, count in _blocks(num_decks):
+            t0 = time.perf_counter()
+            decks = np.array(mapped[start:start + count], dtype=np.uint64)
+            read_time += time.perf_counter() - t0
+            if start == 0 and not np.array_equal(decks, _fixture_block(0, count)):
+                raise ValueError(f"{fmt} round trip failed")
+        return read_time, decode_time
+
+    with open(path, "rb") as f:
+        for start, count in _blocks(num_decks):
+            offset, length = _span(fmt, start, count)
+            t0 = time.perf_counter()
+            f.seek(offset)
+            raw = f.read(length)
+            t1 = time.perf_counter()
+            decks = _decode(fmt, raw, count)
+            t2 = time.perf_counter()
+            read_time += t1 - t0
+            decode_time += t2 - t1
+            if start == 0 and not np.array_equal(decks, _fixture_block(0, count)):
+                raise ValueError(f"{fmt} round trip failed")
+    return read_time, decode_time
+
+
+def bench_random(fmt, num_decks, path, reads=RANDOM_READS):
+    # seconds to fetch `reads` random decks one at a time, each as a Python int
+    indices = np.random.Generator(np.random.PCG64(FIXTURE_SEED)).integers(0, num_decks, reads).tolist()
+    if fmt == "mmap":
+        mapped = np.memmap(path, dtype="<u8", mode="r")
+        t0 = time.perf_counter()
+        for i in indices:
+            int(mapped[i])
+        return time.perf_counter() - t0
+
+    with open(path, "rb", buffering=0) as f:
+        t0 = time.perf_counter()
+        for i in indices:
+            offset, length = _span(fmt, i, 1)
+            f.seek(offset)
+            _decode_one(fmt, f.read(length), i)
+        return time.perf_counter() - t0
+
+
+def run_io_benchmarks(sizes=DEFAULT_SIZES, formats=FORMATS, out_dir=BENCH_DIR, reads=RANDOM_READS, keep=False):
+    """
+    Write, sequential read, decode and random read for every format and size.
+    Data files go to out_dir/<size>/ (removed afterwards unless keep) and the report
+    to out_dir/bench_io.json.
+    """
+    report = {"meta": {"block_decks": BLOCK_DECKS, "random_reads": reads, "fixture_seed": FIXTURE_SEED,
+                       "page_cache_evicted": hasattr(os, "posix_fadvise")},
+              "results": []}
+    for size in sizes:
+        num_decks = SIZES[size]
+        size_dir = os.path.join(out_dir, size)
+        os.makedirs(size_dir, exist_ok=True)
+
+        print(f"Writing {num_decks:,} decks in {len(formats)} formats...")
+        write_seconds = bench_write(formats, num_decks, size_dir)
+
+        for fmt in formats:
+            path = os.path.join(size_dir, FILE_NAMES[_file_format(fmt)])
+            file_bytes = os.path.getsize(path)
+
+            _evict(path)
+            read_time, decode_time = bench_sequential(fmt, num_decks, path)
+            _evict(path)
+            random_time = bench_random(fmt, num_decks, path, reads)
+
+            result = {
+                "format": fmt,
+                "size": size,
+                "decks": num_decks,
+                "file_bytes": file_bytes,
+                "bytes_per_deck": file_bytes / num_decks,
+                # mmap shares the u64 file, so it also shares its write time
+                "write": _rate(write_seconds[_file_format(fmt)], num_decks, file_bytes),
+                "read": _rate(read_time, num_decks, file_bytes),
+                "decode": _rate(decode_time, num_decks, file_bytes),
+                "read_and_decode": _rate(read_time + decode_time, num_decks, file_bytes),
+                "random_read": {"reads": reads, "seconds": random_time,
+                                "reads_per_sec": reads / random_time if random_time > 0 else None},
+            }
+            report["results"].append(result)
+            print(f"{fmt:>7} | {size:>4} | {file_bytes / (1024 * 1024):>9.1f} MB | "
+                  f"write {result['write']['mb_per_sec'] or 0:>8.1f} MB/s | "
+                  f"read+decode {result['read_and_decode']['decks_per_sec'] or 0:>14,.0f} decks/s | "
+                  f"random {result['random_read']['reads_per_sec'] or 0:>10,.0f} reads/s")
+
+        if not keep:
+            for name in set(FILE_NAMES.values()):
+                path = os.path.join(size_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            os.rmdir(size_dir)
+
+    report_path = os.path.join(out_dir, REPORT_NAME)
+    write_json_atomic(report_path, report)
+    print(f"Report saved to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark deck storage formats (write, read, decode, random access).")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=DEFAULT_SIZES,
+                        help="Deck counts (100m needs ~6 GB of free disk for the text format)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS, help="Formats to test")
+    parser.add_argument("--out-dir", default=BENCH_DIR, help="Directory for the data files and the report")
+    parser.add_argument("--random-reads", type=int, default=RANDOM_READS, help="Single-deck random reads per format")
+    parser.add_argument("--keep", action="store_true", help="Keep the data files")
+    args = parser.parse_args()
+
+    run_io_benchmarks(args.sizes, args.formats, args.out_dir, args.random_reads, args.keep)
@@ -0,0 +1,204 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import scoring
+import scoring_bit
+import scoring_dfa
+import scoring_mask
+import scoring_memo
+import scoring_numpy
+from CODE_data_gen import generate_balanced_decks
+from scoring_bit import MATCHUPS, write_json_atomic
+
+# config
+BENCH_FILE = "bench_scoring.json"
+FIXTURE_SEED = 20240101         # fixtures never change, so runs are comparable across commits
+FIXTURES = {"1k": 1_000, "100k": 100_000, "2m": 2_000_000}
+DEFAULT_FIXTURES = ["1k", "100k"]
+WARMUP = 1
+REPEATS = 5
+TOLERANCE = 0.10                # slowdown that counts as a regression in --compare
+
+
+# engines: (prepare, play) - prepare turns the uint64 fixture into the engine's own
+# deck type (untimed); play(decks, p1_seq, p2_seq) plays every deck with one matchup
+def _play_each(play_deck):
+    def play(decks, p1_seq, p2_seq):
+        for deck in decks:
+            play_deck(deck, p1_seq, p2_seq)
+    return play
+
+
+ENGINES = {
+    "string": (lambda decks: [format(d, "052b") for d in decks.tolist()], _play_each(scoring.play_deck)),
+    "bit": (lambda decks: decks.tolist(), _play_each(scoring_bit.play_deck)),
+    "dfa": (lambda decks: decks.tolist(), _play_each(scoring_dfa.play_deck)),
+    "mask": (lambda decks: decks.tolist(), _play_each(scoring_mask.play_deck)),
+    "memo": (lambda decks: decks.tolist(), _play_each(scoring_memo.play_deck)),
+    "numpy": (lambda decks: decks, scoring_numpy.play_decks),
+}
+
+# state an engine keeps between calls, cleared before every pass so no pass
+# reuses what an earlier one cached (the memo engine's suffix tables)
+RESETS = {
+    "memo": lambda: scoring_memo.get_cache().clear(),
+}
+
+_FIXTURE_CACHE = {}
+
+
+def load_fixture(name):
+    # deterministic uint64 decks for a fixture name (RNG v2, fixed seed)
+    if name not in _FIXTURE_CACHE:
+        _FIXTURE_CACHE[name] = generate_balanced_decks(FIXTURES[name], FIXTURE_SEED)
+    return _FIXTURE_CACHE[name]
+
+
+def _split_by_matchup(decks):
+    # the decks each matchup plays under the usual round-robin assignment
+    return [decks[m::len(MATCHUPS)] for m in range(len(MATCHUPS))]
+
+
+def _run_once(play, groups, trace=False, reset=None):
+    # seconds (and peak traced bytes if trace) per matchup for one pass over the fixture
+    if reset:
+        reset()
+    seconds, peaks = [], []
+    for (p1_seq, p2_seq), decks in zip(MATCHUPS, groups):
+        if trace:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        play(decks, p1_seq, p2_seq)
+        seconds.append(time.perf_counter() - start)
+        if trace:
+            peaks.append(tracemalloc.get_traced_memory()[1])
+    return seconds, peaks
+
+
+def bench_engine(engine, fixture, warmup=WARMUP, repeats=REPEATS):
+    """
+    Time one engine on one fixture. Warmup passes run under tracemalloc to get peak
+    memory (tracing slows Python code, so timed passes run without it). Every pass
+    starts with the engine's caches cleared (see RESETS).
+    """
+    prepare, play = ENGINES[engine]
+    reset = RESETS.get(engine)
+    groups = [prepare(g) for g in _split_by_matchup(load_fixture(fixture))]
+
+    peaks = [0] * len(MATCHUPS)
+    tracemalloc.start()
+    for _ in range(max(warmup, 1)):
+        _, pass_peaks = _run_once(play, groups, trace=True, reset=reset)
+        peaks = [max(a, b) for a, b in zip(peaks, pass_peaks)]
+    tracemalloc.stop()
+
+    runs = [_run_once(play, groups, reset=reset)[0] for _ in range(repeats)]
+    totals = [sum(r) for r in runs]
+    median = statistics.median(totals)
+    num_decks = FIXTURES[fixture]
+
+    matchups = []
+    for m, (p1_seq, p2_seq) in enumerate(MATCHUPS):
+        m_median = statistics.median(r[m] for r in runs)
+        matchups.append({
+            "p1_seq": p1_seq,
+            "p2_seq": p2_seq,
+            "decks": len(groups[m]),
+            "median_seconds": m_median,
+            "decks_per_sec": len(groups[m]) / m_median if m_median > 0 else None,
+            "peak_mb": peaks[m] / (1024 * 1024),
+        })
+
+    return {
+        "engine": engine,
+        "fixture": fixture,
+        "decks": num_decks,
+        "repeats": repeats,
+        "seconds": totals,
+        "best_seconds": min(totals),
+        "median_seconds": median,
+        "stdev_seconds": statistics.stdev(totals) if len(totals) > 1 else 0.0,
+        "decks_per_sec": num_decks / median if median > 0 else None,
+        "peak_mb": max(peaks) / (1024 * 1024),
+        "matchups": matchups,
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(engines=tuple(ENGINES), fixtures=DEFAULT_FIXTURES, warmup=WARMUP, repeats=REPEATS):
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "fixture_seed": FIXTURE_SEED,
+            "warmup": warmup,
+            "repeats": repeats,
+        },
+        "results": [],
+    }
+    for fixture in fixtures:
+        for engine in engines:
+            result = bench_engine(engine, fixture, warmup, repeats)
+            report["results"].append(result)
+            print(f"{engine:>8} | {fixture:>5} | {result['decks_per_sec']:>12,.0f} decks/sec | "
+                  f"median {result['median_seconds']:.3f}s | peak {result['peak_mb']:.2f} MB")
+    return report
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    # (engine, fixture, ratio) for every result more than `tolerance` slower than the baseline
+    old = {(r["engine"], r["fixture"]): r for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        base = old.get((r["engine"], r["fixture"]))
+        if base and base["decks_per_sec"] and r["decks_per_sec"]:
+            ratio = r["decks_per_sec"] / base["decks_per_sec"]
+            print(f"{r['engine']:>8} | {r['fixture']:>5} | {ratio:.2f}x baseline")
+            if ratio < 1 - tolerance:
+                regressions.append((r["engine"], r["fixture"], ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the scoring engines on fixed deck fixtures.")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=list(ENGINES), help="Engines to run")
+    parser.add_argument("--fixtures", nargs="+", choices=list(FIXTURES), default=DEFAULT_FIXTURES,
+                        help="Fixture sizes (2m takes minutes for the scalar engines)")
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="Untimed passes (these also measure memory)")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Timed passes")
+    parser.add_argument("--out", default=BENCH_FILE, help="JSON report to write")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier report to compare against; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown for --compare")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.engines, args.fixtures, args.warmup, args.repeats)
+    write_json_atomic(args.out, report)
+    print(f"Report saved to {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for engine, fixture, ratio in regressions:
+            print(f"REGRESSION: {engine} on {fixture} runs at {ratio:.2f}x the baseline speed")
+        sys.exit(1 if regressions else 0)
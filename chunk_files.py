@@ -0,0 +1,62 @@
+import json
+import os
+import re
+
+# chunk file names and listing, standard library only: the string and mask engines
+# (scoring.py, scoring_mask.py) have to run on workers without NumPy, so this can't
+# live in deck_io, which re-exports it
+
+# config
+DECKS_DIR = "decks_chunks"
+
+# decks_seed001.bin (RNG v1) and decks_seed001_v2.bin (RNG v2 and later)
+CHUNK_NAME = re.compile(r"^decks_seed(\d+)(?:_v(\d+))?\.bin$")
+
+DECK_SIZE_BITS = 52
+BYTES_PER_DECK = (DECK_SIZE_BITS + 7) // 8
+
+
+def parse_chunk_name(filename):
+    # (seed, rng_version) for a chunk file name, or None if it is not one
+    match = CHUNK_NAME.match(os.path.basename(filename))
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2) or 1)
+
+
+def chunk_name(seed, rng_version=1):
+    # inverse of parse_chunk_name
+    if rng_version == 1:
+        return f"decks_seed{seed:03d}.bin"
+    return f"decks_seed{seed:03d}_v{rng_version}.bin"
+
+
+def deck_count(filename, expected=None):
+    """
+    Number of decks in a chunk file, checking that the file is whole: its size must be
+    a whole number of records and match `expected` (if given) or the deck count in a
+    generator checkpoint left next to it (filename + ".ckpt"). A cut-short file raises
+    ValueError instead of being scored as a smaller one.
+    """
+    size = os.path.getsize(filename)
+    if size % BYTES_PER_DECK:
+        raise ValueError(f"{filename} is {size} bytes, not a whole number of {BYTES_PER_DECK}-byte decks")
+    num_decks = size // BYTES_PER_DECK
+    if expected is None and os.path.exists(filename + ".ckpt"):
+        with open(filename + ".ckpt") as f:
+            expected = json.load(f)["num_decks"]
+    if expected is not None and num_decks != expected:
+        raise ValueError(f"{filename} holds {num_decks} decks, expected {expected}")
+    return num_decks
+
+
+def list_deck_files(decks_dir=DECKS_DIR):
+    """
+    Every chunk file in decks_dir, ordered by (seed, rng_version).
+    For the original corpus index i is decks_seed{i+1:03d}.bin. progress
+    file_index values count files in this order.
+    """
+    if not os.path.isdir(decks_dir):
+        return []
+    named = [(parse_chunk_name(f), f) for f in os.listdir(decks_dir)]
+    return [os.path.join(decks_dir, f) for key, f in sorted((k, f) for k, f in named if k)]
@@ -0,0 +1,252 @@
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# chunk file names (decks_seed001.bin, decks_seed001_v2.bin) and listing
+from chunk_files import CHUNK_NAME, chunk_name, deck_count, list_deck_files, parse_chunk_name
+
+# config
+DECKS_DIR = "decks_chunks"
+
+DECK_SIZE_BITS = 52
+BYTES_PER_DECK = (DECK_SIZE_BITS + 7) // 8
+
+# chunk files read ahead of the one being scored
+PREFETCH_DEPTH = 2
+
+
+# reading
+def map_deck_records(filename):
+    """
+    Memory-map a chunk file as a read-only (num_decks, BYTES_PER_DECK) uint8 array.
+    Nothing is copied; pages are loaded by the OS as they are touched.
+    """
+    num_decks = deck_count(filename)
+    if num_decks == 0:
+        return np.zeros((0, BYTES_PER_DECK), dtype=np.uint8)
+    return np.memmap(filename, dtype=np.uint8, mode="r", shape=(num_decks, BYTES_PER_DECK))
+
+
+def decode_records(records):
+    # big-endian 7-byte records -> uint64 decks, one vectorized copy for the whole batch
+    padded = np.zeros((len(records), 8), dtype=np.uint8)
+    padded[:, 8 - BYTES_PER_DECK:] = records
+    return padded.view(">u8").ravel().astype(np.uint64)
+
+
+def read_decks_array(filename):
+    # whole chunk file as a uint64 array (one deck per entry)
+    return decode_records(map_deck_records(filename))
+
+
+def iter_deck_arrays(decks_dir=DECKS_DIR, batch_size=None, files=None):
+    """
+    Stream every deck in decks_dir as (filename, start, decks) tuples where decks is
+    a uint64 array starting at deck `start` of that file. batch_size caps how many
+    decks are decoded at once (default: whole files).
+    """
+    for filename in files if files is not None else list_deck_files(decks_dir):
+        records = map_deck_records(filename)
+        step = batch_size or max(len(records), 1)
+        for start in range(0, len(records), step):
+            yield filename, start, decode_records(records[start:start + step])
+
+
+def read_decks_file(filename):
+    # whole chunk file with one plain read (no memory map), so a background thread
+    # waiting on a slow disk doesn't hold the GIL
+    deck_count(filename)
+    with open(filename, "rb") as f:
+        data = f.read()
+    return decode_records(np.frombuffer(data, dtype=np.uint8).reshape(-1, BYTES_PER_DECK))
+
+
+def prefetch_deck_arrays(files, depth=PREFETCH_DEPTH, max_bytes=None):
+    """
+    Yield (filename, decks) for every file, in order, while background threads
+    read up to `depth` of the following files. max_bytes caps the file bytes being
+    read ahead (the next file is always read, however big); decoded decks take 8/7
+    of that. depth=0 reads each file only when it is needed.
+    """
+    files = list(files)
+    if depth < 1:
+        for filename in files:
+            yield filename, read_decks_file(filename)
+        return
+
+    with ThreadPoolExecutor(max_workers=depth) as pool:
+        pending = deque()  # (size, future) in file order
+        in_flight = 0
+        remaining = iter(files)
+        next_file = next(remaining, None)
+
+        def read_ahead():
+            nonlocal in_flight, next_file
+            while next_file is not None and len(pending) < depth:
+                size = os.path.getsize(next_file)
+                if pending and max_bytes is not None and in_flight + size > max_bytes:
+                    return
+                pending.append((size, pool.submit(read_decks_file, next_file)))
+                in_flight += size
+                next_file = next(remaining, None)
+
+        try:
+            read_ahead()
+            for filename in files:
+                size, future = pending.popleft()
+                in_flight -= size
+                # queue the next reads before handing this file over, so they run
+                # while it is being scored
+                read_ahead()
+                yield filename, future.result()
+        finally:
+            # consumer stopped early: don't start reads nobody will use
+            for _, future in pending:
+                future.cancel()
+
+
+# indexed container format
+# one file holding many chunks, little-endian throughout:
+#   header   magic, format version, deck bits, rng version (0 = mixed), segment count,
+#            deck count, byte offset of the first record
+#   segments one (seed, rng_version, byte offset, deck count) entry per source chunk
+#   records  one uint64 per deck, 8-byte aligned, global deck i at data_offset + 8 * i
+CONTAINER_MAGIC = b"DECKSET\0"
+CONTAINER_VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sIIIIQQ")
+SEGMENT_DTYPE = np.dtype([("seed", "<u4"), ("rng_version", "<u4"), ("offset", "<u8"), ("count", "<u8")])
+RECORD_DTYPE = np.dtype("<u8")
+
+
+def _container_layout(segments):
+    # segment table (with byte offsets filled in) and data offset for (seed, rng_version, count) rows
+    table = np.zeros(len(segments), dtype=SEGMENT_DTYPE)
+    data_offset = HEADER_STRUCT.size + table.nbytes
+    data_offset += -data_offset % RECORD_DTYPE.itemsize
+    offset = data_offset
+    for row, (seed, rng_version, count) in zip(table, segments):
+        row["seed"], row["rng_version"], row["offset"], row["count"] = seed, rng_version, offset, count
+        offset += count * RECORD_DTYPE.itemsize
+    return table, data_offset
+
+
+def _write_container(path, segments, arrays):
+    # segments: (seed, rng_version, count) rows; arrays: iterable of matching uint64 deck arrays
+    table, data_offset = _container_layout(segments)
+    versions = {int(v) for v in table["rng_version"]}
+    header = HEADER_STRUCT.pack(
+        CONTAINER_MAGIC, CONTAINER_VERSION, DECK_SIZE_BITS,
+        versions.pop() if len(versions) == 1 else 0,
+        len(table), int(table["count"].sum()), data_offset,
+    )
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(table.tobytes())
+        f.write(b"\0" * (data_offset - f.tell()))
+        for (_, _, count), decks in zip(segments, arrays):
+            if len(decks) != count:
+                raise ValueError(f"segment has {len(decks)} decks, expected {count}")
+            f.write(np.asarray(decks, dtype=RECORD_DTYPE).tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_container(path, segments):
+    """
+    Write a container from (seed, rng_version, decks) tuples, decks being uint64 arrays.
+    """
+    segments = list(segments)
+    rows = [(seed, rng_version, len(decks)) for seed, rng_version, decks in segments]
+    return _write_container(path, rows, (decks for _, _, decks in segments))
+
+
+def convert_chunks(decks_dir=DECKS_DIR, path="decks.dks"):
+    """
+    Pack every decks_seedNNN*.bin chunk in decks_dir into one container, one segment
+    per file in list_deck_files order. Decks are streamed file by file.
+    """
+    files = list_deck_files(decks_dir)
+    rows = [parse_chunk_name(f) + (deck_count(f),) for f in files]
+    return _write_container(path, rows, (read_decks_array(f) for f in files))
+
+
+class DeckContainer:
+    """
+    Read-only view of a container file. Decks are memory-mapped, so
+    container[i] / container.decks[a:b] only touch the pages they need.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            fields = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+            magic, self.format_version, self.deck_bits, self.rng_version, num_segments, num_decks, self.data_offset = fields
+            if magic != CONTAINER_MAGIC:
+                raise ValueError(f"{path} is not a deck container")
+            if self.format_version != CONTAINER_VERSION:
+                raise ValueError(f"Unsupported container version {self.format_version} in {path}")
+            self.segments = np.frombuffer(f.read(num_segments * SEGMENT_DTYPE.itemsize), dtype=SEGMENT_DTYPE)
+
+        # global index of the first deck in each segment
+        self.starts = (self.segments["offset"] - self.data_offset) // RECORD_DTYPE.itemsize
+        if num_decks:
+            self.decks = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=self.data_offset, shape=(num_decks,))
+        else:
+            self.decks = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.decks)
+
+    def __getitem__(self, index):
+        # deck as a Python int, O(1): one record at data_offset + 8 * index
+        return int(self.decks[index])
+
+    def locate(self, index):
+        # (seed, rng_version, index within that chunk) for a global deck index
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        # last segment starting at or before index (never an empty one, since
+        # the next segment shares its start)
+        seg = int(np.searchsorted(self.starts, index, side="right")) - 1
+        row = self.segments[seg]
+        return int(row["seed"]), int(row["rng_version"]), index - int(self.starts[seg])
+
+    def segment_decks(self, seg):
+        # uint64 view of every deck in one segment
+        start = int(self.starts[seg])
+        return self.decks[start:start + int(self.segments["count"][seg])]
+
+
+def export_chunks(path, out_dir):
+    """
+    Write a container back out as the original 7-byte chunk files (inverse of convert_chunks).
+    """
+    container = DeckContainer(path)
+    os.makedirs(out_dir, exist_ok=True)
+    created = []
+    for seg, row in enumerate(container.segments):
+        name = chunk_name(int(row["seed"]), int(row["rng_version"]))
+        records = container.segment_decks(seg).astype(">u8").view(np.uint8).reshape(-1, 8)
+        out_path = os.path.join(out_dir, name)
+        with open(out_path, "wb") as f:
+            f.write(records[:, 8 - BYTES_PER_DECK:].tobytes())
+        created.append(out_path)
+    return created
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack deck chunk files into a single indexed container.")
+    parser.add_argument("out", help="Container file to write")
+    parser.add_argument("--decks-dir", default=DECKS_DIR, help="Directory with decks_seedNNN.bin chunks")
+    args = parser.parse_args()
+
+    convert_chunks(args.decks_dir, args.out)
+    container = DeckContainer(args.out)
+    print(f"Wrote {len(container)} decks in {len(container.segments)} segments to {args.out}")
@@ -0,0 +1,156 @@
+import os
+import struct
+
+import numpy as np
+
+from deck_io import DECKS_DIR, DECK_SIZE_BITS, list_deck_files, read_decks_array
+
+# a balanced deck has exactly 26 red cards, so it is one of C(52, 26) < 2^49 decks
+# and its index in that list (its rank) fits in RANK_BITS bits
+RED_CARDS = DECK_SIZE_BITS // 2
+
+# binomial coefficients C(n, k) for n <= 52, k <= 26 (C(52, 26) ~ 4.96e14 fits in uint64)
+BINOM = np.zeros((DECK_SIZE_BITS + 1, RED_CARDS + 1), dtype=np.uint64)
+BINOM[:, 0] = 1
+for _n in range(1, DECK_SIZE_BITS + 1):
+    BINOM[_n, 1:] = BINOM[_n - 1, 1:] + BINOM[_n - 1, :-1]
+
+NUM_BALANCED_DECKS = int(BINOM[DECK_SIZE_BITS, RED_CARDS])
+RANK_BITS = (NUM_BALANCED_DECKS - 1).bit_length()  # 49
+
+# decks packed per numpy pass (bounds the temporary bit arrays); a multiple of 8,
+# so every block ends on a byte boundary and blocks can simply be concatenated
+PACK_BLOCK = 1 << 20
+
+
+# rank / unrank
+def rank_decks(decks):
+    """
+    Lexicographic rank of every balanced deck among all C(52, 26) balanced decks.
+    decks: uint64 array, each with exactly 26 set bits. Returns a uint64 array.
+    """
+    decks = np.asarray(decks, dtype=np.uint64)
+    ranks = np.zeros(len(decks), dtype=np.uint64)
+    reds_left = np.full(len(decks), RED_CARDS, dtype=np.int64)
+    for pos in range(DECK_SIZE_BITS):
+        remaining = DECK_SIZE_BITS - 1 - pos
+        red = ((decks >> np.uint64(remaining)) & np.uint64(1)).astype(bool)
+        # a red card here skips every deck that has a black card here instead
+        ranks += np.where(red, BINOM[remaining, reds_left], np.uint64(0))
+        reds_left -= red
+    if (reds_left != 0).any() or (decks >> np.uint64(DECK_SIZE_BITS)).any():
+        raise ValueError("rank_decks only accepts 52-card decks with exactly 26 red cards")
+    return ranks
+
+
+def unrank_decks(ranks):
+    # inverse of rank_decks
+    ranks = np.array(ranks, dtype=np.uint64)
+    decks = np.zeros(len(ranks), dtype=np.uint64)
+    reds_left = np.full(len(ranks), RED_CARDS, dtype=np.int64)
+    for pos in range(DECK_SIZE_BITS):
+        remaining = DECK_SIZE_BITS - 1 - pos
+        skip = BINOM[remaining, reds_left]
+        red = ranks >= skip
+        ranks -= np.where(red, skip, np.uint64(0))
+        reds_left -= red
+        decks = (decks << np.uint64(1)) | red.astype(np.uint64)
+    return decks
+
+
+# bit packing
+def pack_ranks(ranks):
+    """
+    Pack ranks into a big-endian bit stream of RANK_BITS bits per deck
+    (49 bits instead of the 56 used by 7-byte records).
+    """
+    ranks = np.asarray(ranks, dtype=np.uint64)
+    pieces = []
+    for start in range(0, len(ranks), PACK_BLOCK):
+        block = ranks[start:start + PACK_BLOCK]
+        bits = np.unpackbits(block.astype(">u8").view(np.uint8).reshape(-1, 8), axis=1)
+        pieces.append(np.packbits(bits[:, 64 - RANK_BITS:].ravel()).tobytes())
+    return b"".join(pieces)
+
+
+def unpack_ranks(data, count):
+    # inverse of pack_ranks for the first `count` ranks of data
+    data = np.frombuffer(data, dtype=np.uint8)
+    block_bytes = PACK_BLOCK * RANK_BITS // 8
+    pieces = []
+    for start in range(0, count, PACK_BLOCK):
+        num = min(PACK_BLOCK, count - start)
+        offset = start // PACK_BLOCK * block_bytes
+        chunk = data[offset:offset + (num * RANK_BITS + 7) // 8]
+        bits = np.unpackbits(chunk)[:num * RANK_BITS].reshape(num, RANK_BITS)
+        padded = np.zeros((num, 64), dtype=np.uint8)
+        padded[:, 64 - RANK_BITS:] = bits
+        pieces.append(np.packbits(padded, axis=1).view(">u8").ravel().astype(np.uint64))
+    return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.uint64)
+
+
+def rank_at(data, index):
+    # rank of deck `index` straight from packed bytes, without unpacking anything else
+    first_bit = index * RANK_BITS
+    first_byte = first_bit // 8
+    last_byte = (first_bit + RANK_BITS + 7) // 8
+    value = int.from_bytes(bytes(data[first_byte:last_byte]), "big")
+    return (value >> (last_byte * 8 - first_bit - RANK_BITS)) & ((1 << RANK_BITS) - 1)
+
+
+def count_duplicates(decks):
+    # number of decks that repeat an earlier deck (ranks are canonical, one per deck)
+    return len(decks) - len(np.unique(rank_decks(decks)))
+
+
+# ranked files
+# header: magic, format version, bits per rank, deck count - then the packed ranks
+RANKED_MAGIC = b"DECKRNK\0"
+RANKED_VERSION = 1
+RANKED_HEADER = struct.Struct("<8sIIQ")
+
+
+def write_ranked_file(path, decks):
+    # write decks (uint64 array) as a ranked, bit-packed file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(RANKED_HEADER.pack(RANKED_MAGIC, RANKED_VERSION, RANK_BITS, len(decks)))
+        f.write(pack_ranks(rank_decks(decks)))
+    os.replace(tmp_path, path)
+    return path
+
+
+def _open_ranked(path):
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, rank_bits, count = RANKED_HEADER.unpack(bytes(data[:RANKED_HEADER.size]))
+    if magic != RANKED_MAGIC or version != RANKED_VERSION or rank_bits != RANK_BITS:
+        raise ValueError(f"{path} is not a version {RANKED_VERSION} ranked deck file")
+    return data[RANKED_HEADER.size:], count
+
+
+def read_ranked_file(path):
+    # every deck in a ranked file as a uint64 array
+    data, count = _open_ranked(path)
+    return unrank_decks(unpack_ranks(data, count))
+
+
+def read_ranked_deck(path, index):
+    # one deck from a ranked file, O(1)
+    data, count = _open_ranked(path)
+    if not 0 <= index < count:
+        raise IndexError(index)
+    return int(unrank_decks([rank_at(data, index)])[0])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Store deck chunk files as 49-bit ranks.")
+    parser.add_argument("out", help="Ranked file to write")
+    parser.add_argument("--decks-dir", default=DECKS_DIR, help="Directory with decks_seedNNN.bin chunks")
+    args = parser.parse_args()
+
+    decks = np.concatenate([read_decks_array(f) for f in list_deck_files(args.decks_dir)])
+    write_ranked_file(args.out, decks)
+    print(f"Wrote {len(decks)} decks to {args.out} ({os.path.getsize(args.out) / (1024*1024):.2f} MB), "
+          f"{count_duplicates(decks)} duplicates")
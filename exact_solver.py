@@ -0,0 +1,184 @@
+import csv
+import time
+
+import numpy as np
+
+from scoring_bit import DECK_SIZE_BITS, MATCHUPS
+from scoring_dfa import NUM_STATES, _step
+
+# config
+EXACT_RESULTS_FILE = "results_exact.csv"
+
+RED_CARDS = DECK_SIZE_BITS // 2
+MAX_TRICKS = DECK_SIZE_BITS // 3
+
+# exact distributions, memoized per matchup
+_DISTRIBUTIONS = {}
+
+
+def _transitions(p1_seq, p2_seq):
+    # (state, card, next_state, winner) for every state/card pair
+    p1_bits = int(p1_seq, 2)
+    p2_bits = int(p2_seq, 2)
+    return [(s, bit) + _step(s, bit, p1_bits, p2_bits) for s in range(NUM_STATES) for bit in (0, 1)]
+
+
+def _advance(table, new, pos, transitions, move):
+    """
+    One card of the DP. table[reds, state, ...] counts decks of `pos` cards;
+    fills new (already zeroed) with the counts for pos + 1 cards. move(src, dst, winner)
+    adds src into dst, applying the trick update for winner.
+    """
+    blacks_ok = slice(max(pos - RED_CARDS + 1, 0), RED_CARDS + 1)  # a black card must still be left
+    for state, bit, next_state, winner in transitions:
+        if bit:
+            src = table[:RED_CARDS, state]
+            dst = new[1:, next_state]
+        else:
+            src = table[blacks_ok, state]
+            dst = new[blacks_ok, next_state]
+        move(src, dst, winner)
+
+
+def exact_distributions(p1_seq, p2_seq):
+    """
+    Exact joint distributions over every 26/26 deck for one matchup:
+      "tricks": counts[p1_tricks, p2_tricks]
+      "cards":  counts[p1_cards, p2_cards]
+      "decks":  number of decks, C(52, 26)
+    Counts are numbers of decks (int64), so they are exact.
+    """
+    key = (p1_seq, p2_seq)
+    if key in _DISTRIBUTIONS:
+        return _DISTRIBUTIONS[key]
+
+    # flipping every card's color maps each 26/26 deck to another one and (a, b)
+    # to (~a, ~b), and swapping the players transposes both tables, so the four
+    # matchups related this way share one DP run
+    flipped = tuple("".join("1" if c == "0" else "0" for c in seq) for seq in key)
+    for other_key, swap in ((flipped, False), (key[::-1], True), (flipped[::-1], True)):
+        if other_key in _DISTRIBUTIONS:
+            other_dist = _DISTRIBUTIONS[other_key]
+            result = dict(other_dist)
+            if swap:
+                result["tricks"] = other_dist["tricks"].T
+                result["cards"] = other_dist["cards"].T
+            _DISTRIBUTIONS[key] = result
+            return result
+
+    transitions = _transitions(p1_seq, p2_seq)
+
+    # tricks: table[reds, state, p1_tricks, p2_tricks]
+    tricks = np.zeros((RED_CARDS + 1, NUM_STATES, MAX_TRICKS + 1, MAX_TRICKS + 1), dtype=np.int64)
+    tricks[0, 0, 0, 0] = 1
+    tricks_next = np.zeros_like(tricks)
+
+    def move_tricks(src, dst, winner):
+        if winner == 1:
+            dst[:, 1:, :] += src[:, :-1, :]
+        elif winner == 2:
+            dst[:, :, 1:] += src[:, :, :-1]
+        else:
+            dst += src
+
+    # cards: table[reds, state, p1_cards, p2_cards]; the cards since the last trick
+    # are pos - p1_cards - p2_cards, so a trick won by p1 at card pos + 1 always
+    # leaves p1_cards = pos + 1 - p2_cards (and the same for p2)
+    size = DECK_SIZE_BITS + 1
+    cards = np.zeros((RED_CARDS + 1, NUM_STATES, size, size), dtype=np.int64)
+    cards[0, 0, 0, 0] = 1
+    cards_next = np.zeros_like(cards)
+    other = np.arange(size)
+
+    for pos in range(DECK_SIZE_BITS):
+        # after pos cards neither player can hold more than pos of them
+        live = slice(0, pos + 1)
+        valid = other[:pos + 1]
+        landing = pos + 1 - valid
+
+        def move_cards(src, dst, winner):
+            if winner == 1:
+                dst[:, landing, valid] += src[:, live, live].sum(axis=1)
+            elif winner == 2:
+                dst[:, valid, landing] += src[:, live, live].sum(axis=2)
+            else:
+                dst[:, live, live] += src[:, live, live]
+
+        # swap buffers rather than allocating new tables every card
+        tricks_next[...] = 0
+        _advance(tricks, tricks_next, pos, transitions, move_tricks)
+        tricks, tricks_next = tricks_next, tricks
+
+        cards_next[:, :, :pos + 2, :pos + 2] = 0
+        _advance(cards, cards_next, pos, transitions, move_cards)
+        cards, cards_next = cards_next, cards
+
+    result = {
+        "tricks": tricks[RED_CARDS].sum(axis=0),
+        "cards": cards[RED_CARDS].sum(axis=0),
+        "decks": int(tricks[RED_CARDS].sum()),
+    }
+    _DISTRIBUTIONS[key] = result
+    return result
+
+
+def exact_row(p1_seq, p2_seq):
+    """
+    Exact totals over all C(52, 26) decks in the results.csv schema
+    (every deck counted once, so runs = C(52, 26)).
+    """
+    dist = exact_distributions(p1_seq, p2_seq)
+    tricks, cards = dist["tricks"], dist["cards"]
+    values = np.arange(DECK_SIZE_BITS + 1)
+    t = values[:tricks.shape[0]]
+    return {
+        "p1_tricks": int((tricks.sum(axis=1) * t).sum()),
+        "p2_tricks": int((tricks.sum(axis=0) * t).sum()),
+        "draws_tricks": int(np.trace(tricks)),
+        "p1_cards": int((cards.sum(axis=1) * values).sum()),
+        "p2_cards": int((cards.sum(axis=0) * values).sum()),
+        "draws_cards": int(np.trace(cards)),
+        "runs": dist["decks"],
+    }
+
+
+def exact_results(matchups=MATCHUPS):
+    # results dict (same layout as load_results) for every matchup
+    return {(p1_seq, p2_seq): exact_row(p1_seq, p2_seq) for p1_seq, p2_seq in matchups}
+
+
+def save_exact_results(results, path=EXACT_RESULTS_FILE):
+    fieldnames = [
+        "p1_seq", "p2_seq",
+        "p1_tricks", "p2_tricks", "draws_tricks",
+        "p1_cards", "p2_cards", "draws_cards",
+        "runs",
+    ]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for (p1_seq, p2_seq), vals in results.items():
+            writer.writerow({
+                "p1_seq": p1_seq,
+                "p2_seq": p2_seq,
+                **vals
+            })
+
+
+def main(path=EXACT_RESULTS_FILE):
+    start_time = time.perf_counter()
+    results = exact_results()
+    save_exact_results(results, path)
+    elapsed = time.perf_counter() - start_time
+    print(f"Exact results for {len(results)} matchups saved to {path}.")
+    print(f"Runtime: {elapsed:.2f} seconds")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compute exact matchup totals over every 26/26 deck.")
+    parser.add_argument("--out", default=EXACT_RESULTS_FILE, help="CSV file to write")
+    args = parser.parse_args()
+
+    main(args.out)
@@ -0,0 +1,143 @@
+import sys
+import tracemalloc
+
+# config
+MEMORY_MODES = ("rss", "trace", "off")   # rss: cheap sampling; trace: tracemalloc (slow, per allocation)
+MEMORY_MODE = "rss"
+MIN_BATCH = 256                          # smallest batch a memory budget can shrink to
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _proc_status(field):
+    # a "VmRSS:   1234 kB" style field from /proc/self/status in bytes, or None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss():
+    # resident set size right now in bytes (0 if the platform doesn't say)
+    rss = _proc_status("VmRSS")
+    return rss if rss is not None else 0
+
+
+def peak_rss():
+    # high-water mark of the resident set size in bytes
+    hwm = _proc_status("VmHWM")
+    if hwm is not None:
+        return hwm
+    if resource is not None:
+        # ru_maxrss is in kB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return 0
+
+
+def reset_peak_rss():
+    # restart the high-water mark at the current RSS (Linux); returns False if unsupported
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class MemoryMonitor:
+    """
+    Peak memory of one run.
+      rss   - RSS high-water mark (reset at start where the OS allows it); costs
+              nothing while running, but includes the interpreter and libraries
+      trace - tracemalloc peak of Python allocations; exact but slows
+              allocation-heavy loops 2-3x
+      off   - nothing
+    """
+
+    def __init__(self, mode=MEMORY_MODE):
+        if mode not in MEMORY_MODES:
+            raise ValueError(f"memory mode must be one of {MEMORY_MODES}, got {mode}")
+        self.mode = mode
+        self.peak = 0
+        self.lifetime_peak = False  # True if the RSS peak could not be reset
+
+    def start(self):
+        if self.mode == "trace":
+            tracemalloc.start()
+        elif self.mode == "rss":
+            self.lifetime_peak = not reset_peak_rss()
+        return self
+
+    def sample(self):
+        # (current, peak) bytes so far
+        if self.mode == "trace":
+            return tracemalloc.get_traced_memory()
+        if self.mode == "rss":
+            return current_rss(), peak_rss()
+        return 0, 0
+
+    def stop(self):
+        _, self.peak = self.sample()
+        if self.mode == "trace":
+            tracemalloc.stop()
+        return self.peak
+
+    def describe(self):
+        # "Peak memory: ..." text for the end-of-run line
+        if self.mode == "off":
+            return "Peak memory: not measured"
+        label = "traced" if self.mode == "trace" else "RSS, process lifetime" if self.lifetime_peak else "RSS"
+        return f"Peak memory: {self.peak / (1024*1024):.2f} MB ({label})"
+
+
+class BatchSizer:
+    """
+    Batch sizes that keep the process RSS under max_bytes: halve the batch while
+    RSS is over the budget, grow it back (up to batch_size) once RSS is below half.
+    Without a budget every batch is batch_size. Only the batch is resized; anything
+    else the caller keeps (e.g. the per-matchup totals) must be bounded on its own.
+    """
+
+    def __init__(self, batch_size, max_bytes=None, min_size=MIN_BATCH):
+        self.max_size = max(batch_size, 1)
+        self.min_size = min(min_size, self.max_size)
+        self.size = self.max_size
+        self.max_bytes = max_bytes
+        self.over_budget = False  # set once the smallest batch was still over budget
+
+    def next_size(self):
+        if self.max_bytes is None:
+            return self.size
+        rss = current_rss()
+        if rss > self.max_bytes:
+            if self.size == self.min_size and not self.over_budget:
+                self.over_budget = True
+                print(f"Warning: RSS {rss / (1024*1024):.0f} MB is over the "
+                      f"{self.max_bytes / (1024*1024):.0f} MB budget even at {self.size} decks per batch")
+            self.size = max(self.min_size, self.size // 2)
+        elif rss < self.max_bytes // 2:
+            self.size = min(self.max_size, self.size * 2)
+        return self.size
+
+
+def add_memory_arguments(parser, max_memory=True):
+    # --memory-mode (and --max-memory, for scripts that size their batches) for a script's argparse parser
+    parser.add_argument("--memory-mode", choices=MEMORY_MODES, default=MEMORY_MODE,
+                        help="How to measure peak memory (trace = tracemalloc, slow)")
+    if not max_memory:
+        return
+    parser.add_argument("--max-memory", type=float, metavar="MB",
+                        help="Shrink deck batches to keep the process RSS under this many MB "
+                             "(the per-matchup totals are a fixed size and are not shrunk)")
+
+
+def budget_bytes(max_memory_mb):
+    return int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
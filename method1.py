@@ -2,6 +2,18 @@
 import os
 import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+from chunk_files import chunk_name
+from CODE_data_gen import (  # RNG streams and the checkpointed chunk writer are shared with the main generator
+    RNG_V1_SHUFFLE,
+    RNG_V2_NUMPY,
+    RNG_VERSION,
+    decks_to_bytes,
+    generate_balanced_decks,
+    generate_chunk_checkpointed,
+)
+from deck_io import read_decks_array
 
 #Params 
 NUM_DECKS = 2_000_000   # total number of decks
@@ -9,6 +21,7 @@ DECK_SIZE_BITS = 52     # bits per deck
 CHUNK_SIZE = 10_000     # number of decks per file picked 10k to match other method and because it is a smaller chunk that could be replicated
 OUT_DIR = "decks_chunks"  # folder to save decks
 BYTEORDER = "big"        # The most significant byte comes first
+CHECKPOINT_EVERY = None  # decks written between checkpoints (None = write each chunk in one go)
 
 # do a check NUM_DECKS must be divisible by CHUNK_SIZE and figure out how many chunks we need
 assert NUM_DECKS % CHUNK_SIZE == 0
@@ -35,61 +48,95 @@ def generate_balanced_deck(rng: random.Random) -> bytes:
     return deck_int.to_bytes(BYTES_PER_DECK, byteorder=BYTEORDER)
 
 
-def generate_chunk(chunk_index: int, out_dir: str = OUT_DIR):
+def generate_chunk(chunk_index: int, out_dir: str = OUT_DIR, rng_version: int = RNG_VERSION,
+                   checkpoint_every: int = CHECKPOINT_EVERY, resume: bool = False):
     """
     Generate one chunk of decks, write to disk
     return (path, gen_time, write_time).
+    checkpoint_every writes the chunk in checkpointed blocks (same bytes either way);
+    resume keeps a chunk that is already complete on disk (zero times).
     """
     seed = chunk_index + 1  # increase seed by one (for replicability)
-    rng = random.Random(seed)
     os.makedirs(out_dir, exist_ok=True)  # make directory if not exists
 
-    filename = f"decks_seed{seed:03d}.bin"  # filename includes seed 
+    filename = chunk_name(seed, rng_version)  # filename includes seed (and RNG version)
     path = os.path.join(out_dir, filename)  # full file path 
 
+    if resume and os.path.exists(path) and os.path.getsize(path) == CHUNK_SIZE * BYTES_PER_DECK:
+        return path, 0.0, 0.0
+
+    if checkpoint_every:
+        gen_time, write_time = generate_chunk_checkpointed(path, seed, CHUNK_SIZE, rng_version, checkpoint_every)
+        return path, gen_time, write_time
+
     # Generate decks 
     gen_start = time.perf_counter()  # start generation time 
-    # creates all decks - 52 bits per deck, converted to bytes 
-    decks = [generate_balanced_deck(rng) for _ in range(CHUNK_SIZE)]
+    if rng_version == RNG_V1_SHUFFLE:
+        # creates all decks one at a time - 52 bits per deck, converted to bytes 
+        rng = random.Random(seed)
+        decks = [generate_balanced_deck(rng) for _ in range(CHUNK_SIZE)]
+    elif rng_version == RNG_V2_NUMPY:
+        # creates the whole chunk in one shot
+        decks = [decks_to_bytes(generate_balanced_decks(CHUNK_SIZE, seed))]
+    else:
+        raise ValueError(f"Unknown RNG version: {rng_version}")
     gen_time = time.perf_counter() - gen_start  # final gen time 
 
     # Write decks
     write_start = time.perf_counter()  # start write time 
-    with open(path, "wb") as f:  # wb means: w = overwrite if already exists, b = binary mode 
+    tmp_path = path + ".tmp"  # write next to the final file, then rename so readers never see half a chunk
+    with open(tmp_path, "wb") as f:  # wb means: w = overwrite if already exists, b = binary mode 
         f.writelines(decks)  # writes all decks into file 
+    os.replace(tmp_path, path)  # atomic rename 
     write_time = time.perf_counter() - write_start  # final write time 
 
     return path, gen_time, write_time
 
 
-def generate_chunks(start_chunk: int = 0, num_chunks: int = NUM_CHUNKS, out_dir: str = OUT_DIR):
+def generate_chunks(start_chunk: int = 0, num_chunks: int = NUM_CHUNKS, out_dir: str = OUT_DIR,
+                    rng_version: int = RNG_VERSION, workers: int = 1,
+                    checkpoint_every: int = CHECKPOINT_EVERY, resume: bool = False):
     """
     Generate all chunks starting from start_chunk
+    workers > 1 builds chunks in a process pool - every chunk has its own seed,
+    so the files are byte-identical to the serial run
+    checkpoint_every / resume are passed to generate_chunk
     """
     created = []  # file paths of everything created 
     # times start at zero 
     total_gen_time = 0.0
     total_write_time = 0.0
 
-    for i in range(start_chunk, start_chunk + num_chunks):
-        path, gen_time, write_time = generate_chunk(i, out_dir=out_dir)  # generate chunk (file)!
+    indices = range(start_chunk, start_chunk + num_chunks)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk_results = list(pool.map(generate_chunk, indices, [out_dir] * num_chunks, [rng_version] * num_chunks,
+                                          [checkpoint_every] * num_chunks, [resume] * num_chunks))
+    else:
+        chunk_results = (generate_chunk(i, out_dir, rng_version, checkpoint_every, resume) for i in indices)
+
+    for path, gen_time, write_time in chunk_results:  # generate chunk (file)! (results come back in chunk order)
         created.append(path)
         # add times for total time 
         total_gen_time += gen_time
         total_write_time += write_time
 
+    # with workers > 1 the gen/write totals add up time spent in every worker
     return created, total_gen_time, total_write_time
 
 
 # do generation 
-def run_generation():
+def run_generation(rng_version: int = RNG_VERSION, workers: int = 1,
+                   checkpoint_every: int = CHECKPOINT_EVERY, resume: bool = False):
     """
     Generate all decks and return stats
+    resume=True picks an interrupted run back up (complete chunks are kept)
     """
     start_time = time.perf_counter()
 
     created_files, total_gen_time, total_write_time = generate_chunks(
-        start_chunk=0, num_chunks=NUM_CHUNKS, out_dir=OUT_DIR
+        start_chunk=0, num_chunks=NUM_CHUNKS, out_dir=OUT_DIR, rng_version=rng_version, workers=workers,
+        checkpoint_every=checkpoint_every, resume=resume
     )
 
     end_time = time.perf_counter()
@@ -123,10 +170,33 @@ def read_decks(created_files):
     return runtime  # runtime is the only metric to return 
 
 
+def read_decks_mmap(created_files):
+    """
+    Read all decks back through a memory map into uint64 arrays and return runtime
+    (no per-deck Python objects)
+    """
+    start_time = time.perf_counter()
+
+    for filename in created_files:
+        _ = read_decks_array(filename)  # whole file → uint64 array in one go 
+
+    runtime = time.perf_counter() - start_time
+    return runtime
+
+
 # run it all once!
 if __name__ == "__main__":
-    stats = run_generation()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate every deck chunk, then time reading them back.")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                        help="Decks written between checkpoints inside a chunk (default: whole chunks)")
+    parser.add_argument("--resume", action="store_true", help="Keep chunks an interrupted run already finished")
+    args = parser.parse_args()
+
+    stats = run_generation(checkpoint_every=args.checkpoint_every, resume=args.resume)
     read_time = read_decks(stats["files"])
+    mmap_read_time = read_decks_mmap(stats["files"])
 
     # print metrics 
     print(f"\nDone. Created {len(stats['files'])} files in '{OUT_DIR}'.")
@@ -135,3 +205,4 @@ if __name__ == "__main__":
     print(f"  Write time: {stats['write_time']:.2f} seconds")
     print(f"Total file size: {stats['total_memory'] / (1024*1024):.2f} MB")
     print(f"Read time: {read_time:.2f} seconds")
+    print(f"Read time (mmap): {mmap_read_time:.2f} seconds")
@@ -0,0 +1,195 @@
+import json
+import os
+import time
+
+# config
+METRIC_PREFIX = "cardgame"
+REPORT_EVERY = 10.0     # seconds between periodic reports
+
+
+class _Stage:
+    # context manager adding the time spent inside it to one stage
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds, calls = self.metrics.stages.get(self.name, (0.0, 0))
+        self.metrics.stages[self.name] = (seconds + time.perf_counter() - self.start, calls + 1)
+        return False
+
+
+class Metrics:
+    """
+    Named stage timers and counters with periodic throughput/ETA reports.
+    Reports are appended to a JSON-lines file and/or written as a Prometheus text
+    file (replaced atomically, as the node exporter's textfile collector expects).
+
+        with metrics.stage("read"):
+            decks = read_decks_array(path)
+        metrics.count("decks", len(decks))
+        metrics.tick()      # reports if REPORT_EVERY seconds have passed
+    """
+
+    enabled = True
+
+    def __init__(self, jsonl_path=None, prom_path=None, report_every=REPORT_EVERY, echo=True):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.report_every = report_every
+        self.echo = echo
+        self.stages = {}     # name -> (seconds, calls)
+        self.counters = {}   # name -> value
+        self.totals = {}     # counter name -> expected final value, for ETAs
+        self.start_time = time.perf_counter()
+        self.last_report = (self.start_time, 0)  # (time, decks) at the last report
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def expect(self, name, total):
+        # expected final value of a counter (enables the ETA for "decks")
+        self.totals[name] = total
+
+    def tick(self):
+        if time.perf_counter() - self.last_report[0] >= self.report_every:
+            self.report()
+
+    def snapshot(self):
+        now = time.perf_counter()
+        elapsed = now - self.start_time
+        decks = self.counters.get("decks", 0)
+        last_time, last_decks = self.last_report
+        interval = now - last_time
+        rate = decks / elapsed if elapsed > 0 else 0.0
+        remaining = self.totals.get("decks", 0) - decks
+        return {
+            "time": time.time(),
+            "elapsed_seconds": elapsed,
+            "stages": {name: {"seconds": s, "calls": c} for name, (s, c) in self.stages.items()},
+            "counters": dict(self.counters),
+            "decks_per_sec": rate,
+            "recent_decks_per_sec": (decks - last_decks) / interval if interval > 0 else 0.0,
+            "eta_seconds": remaining / rate if remaining > 0 and rate > 0 else None,
+        }
+
+    def report(self):
+        snap = self.snapshot()
+        self.last_report = (time.perf_counter(), self.counters.get("decks", 0))
+        if self.jsonl_path:
+            with open(self.jsonl_path, "a") as f:
+                f.write(json.dumps(snap) + "\n")
+        if self.prom_path:
+            write_prometheus(self.prom_path, snap)
+        if self.echo:
+            eta = f" | ETA {snap['eta_seconds']:.0f}s" if snap["eta_seconds"] is not None else ""
+            print(f"[metrics] {snap['counters'].get('decks', 0):,} decks | "
+                  f"{snap['recent_decks_per_sec']:,.0f} decks/sec{eta}")
+        return snap
+
+    def close(self):
+        # final report (also the only one for runs shorter than report_every)
+        return self.report()
+
+
+class NullMetrics:
+    # same interface as Metrics; every call is a no-op
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def count(self, name, value=1):
+        pass
+
+    def expect(self, name, total):
+        pass
+
+    def tick(self):
+        pass
+
+    def report(self):
+        return None
+
+    def close(self):
+        return None
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+_METRICS = NullMetrics()
+
+
+def get_metrics():
+    # the active metrics (a NullMetrics until enable_metrics is called)
+    return _METRICS
+
+
+def enable_metrics(jsonl_path=None, prom_path=None, report_every=REPORT_EVERY, echo=True):
+    global _METRICS
+    _METRICS = Metrics(jsonl_path, prom_path, report_every, echo)
+    return _METRICS
+
+
+def disable_metrics():
+    global _METRICS
+    _METRICS.close()
+    _METRICS = NullMetrics()
+
+
+def write_prometheus(path, snap, prefix=METRIC_PREFIX):
+    # Prometheus text exposition format, written to a temp file and renamed
+    lines = [
+        f"# HELP {prefix}_stage_seconds_total Time spent in each pipeline stage.",
+        f"# TYPE {prefix}_stage_seconds_total counter",
+    ]
+    lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {s["seconds"]:.6f}' for name, s in snap["stages"].items()]
+    lines += [f"# TYPE {prefix}_stage_calls_total counter"]
+    lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {s["calls"]}' for name, s in snap["stages"].items()]
+    for name, value in snap["counters"].items():
+        lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+    lines += [
+        f"# TYPE {prefix}_decks_per_second gauge",
+        f"{prefix}_decks_per_second {snap['recent_decks_per_sec']:.3f}",
+        f"# TYPE {prefix}_elapsed_seconds gauge",
+        f"{prefix}_elapsed_seconds {snap['elapsed_seconds']:.3f}",
+    ]
+    if snap["eta_seconds"] is not None:
+        lines += [f"# TYPE {prefix}_eta_seconds gauge", f"{prefix}_eta_seconds {snap['eta_seconds']:.3f}"]
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def add_metrics_arguments(parser):
+    # --metrics-jsonl / --metrics-prom / --metrics-every for a script's argparse parser
+    group = parser.add_argument_group("metrics")
+    group.add_argument("--metrics-jsonl", metavar="PATH", help="Append stage timings and throughput as JSON lines")
+    group.add_argument("--metrics-prom", metavar="PATH", help="Write a Prometheus text file for the node exporter")
+    group.add_argument("--metrics-every", type=float, default=REPORT_EVERY, help="Seconds between metric reports")
+
+
+def enable_from_args(args):
+    # turn metrics on if either output was requested
+    if args.metrics_jsonl or args.metrics_prom:
+        enable_metrics(args.metrics_jsonl, args.metrics_prom, args.metrics_every)
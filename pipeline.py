@@ -0,0 +1,331 @@
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import scoring_bit
+import scoring_dfa
+import scoring_mask
+import scoring_memo
+import scoring_numpy
+import scoring_symmetric
+from aggregate import Aggregate, as_aggregate, load_aggregate
+from CODE_data_gen import (
+    CHUNK_SIZE,
+    RNG_VERSION,
+    RNG_V1_SHUFFLE,
+    RNG_V2_NUMPY,
+    chunk_decks,
+    decks_to_bytes,
+    generate_decks,
+    get_existing_chunks,
+)
+from chunk_files import chunk_name
+from deck_io import PREFETCH_DEPTH, deck_count, prefetch_deck_arrays
+from metrics import add_metrics_arguments, enable_from_args, get_metrics
+from scoring_bit import (
+    BYTES_PER_DECK,
+    DECKS_DIR,
+    PROGRESS_FILE,
+    SEQ_LEN,
+    commit_results,
+    get_matchups,
+    load_progress,
+    pending_deck_files,
+    state_files,
+    write_json_atomic,
+)
+
+# config
+REPORT_FILE = "pipeline_report.json"
+STREAM_RESULTS_FILE = "results_stream.csv"
+
+# generated batches allowed to wait for the scorer in streaming mode
+QUEUE_DEPTH = 4
+
+# scoring engines: modules with score_decks(decks, results, matchup_index, all_matchups, k)
+# and score_file(deck_file, matchup_index, all_matchups, k) -> partial results. matchup_index
+# cycles over the module's ROUND_ROBIN list if it has one, else over get_matchups(k); a module
+# with its own RESULTS_FILE / PROGRESS_FILE keeps its totals apart from results_2.csv
+ENGINES = {
+    "bit": scoring_bit,
+    "dfa": scoring_dfa,
+    "mask": scoring_mask,
+    "memo": scoring_memo,
+    "numpy": scoring_numpy,
+    "symmetric": scoring_symmetric,
+}
+# engines that take uint64 arrays (the scalar ones are fastest on plain Python ints)
+ARRAY_ENGINES = {"numpy", "symmetric"}
+
+# every job setting with its default; a job spec file is a JSON object with any of these keys
+JOB_DEFAULTS = {
+    "generate": 0,
+    "rng_version": RNG_VERSION,
+    "engine": "numpy",
+    "all_matchups": False,
+    "k": SEQ_LEN,
+    "workers": 1,
+    "decks_dir": DECKS_DIR,
+    "report": REPORT_FILE,
+    "prefetch": PREFETCH_DEPTH,
+    "prefetch_mb": None,
+}
+
+
+def load_job(path):
+    # job settings from a JSON spec file
+    with open(path, "r") as f:
+        job = json.load(f)
+    unknown = set(job) - set(JOB_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown job settings in {path}: {', '.join(sorted(unknown))}")
+    return job
+
+
+def _score_prefetched(engine, deck_files, starts, all_matchups, k, prefetch, max_bytes):
+    # partial results per file, in order, reading the next files while scoring the current one
+    score_decks = ENGINES[engine].score_decks
+    matchups = get_matchups(k)
+    metrics = get_metrics()
+    for (_, decks), start in zip(prefetch_deck_arrays(deck_files, prefetch, max_bytes), starts):
+        partial = Aggregate(matchups)
+        with metrics.stage("score"):
+            score_decks(decks if engine in ARRAY_ENGINES else decks.tolist(), partial, start, all_matchups, k)
+        yield partial
+
+
+def _score_pending(pool, engine, decks_dir, all_matchups, k, prefetch, max_bytes, report):
+    """
+    Score every deck file past the saved progress, loading the totals once and saving
+    them (binary + CSV export) and progress after each file, in the engine's own files
+    if it has them. Adds one entry per file to report["files"].
+    Without a pool, files are read ahead on background threads (see prefetch_deck_arrays).
+    """
+    module = ENGINES[engine]
+    matchups = get_matchups(k)
+    cycle = len(getattr(module, "ROUND_ROBIN", matchups))
+    progress_path, results_path, _ = state_files(k)
+    if getattr(module, "PROGRESS_FILE", PROGRESS_FILE) != PROGRESS_FILE:
+        # an engine with its own files (symmetric) keeps its totals there
+        progress_path, results_path = module.PROGRESS_FILE, module.RESULTS_FILE
+    progress = load_progress(cycle, progress_path, results_path, all_matchups)
+    matchup_index = progress["matchup_index"]
+    file_index = progress["file_index"]
+    deck_files = pending_deck_files(progress, decks_dir)
+    if not deck_files:
+        print(f"No more deck files to process at index {file_index}.")
+        return 0
+
+    # same round-robin starts as running the single-file scorers one file at a time
+    starts, sizes = [], []
+    for deck_file in deck_files:
+        starts.append(matchup_index)
+        sizes.append(deck_count(deck_file))
+        if not all_matchups:
+            matchup_index = (matchup_index + sizes[-1]) % cycle
+
+    metrics = get_metrics()
+    metrics.expect("decks", sum(sizes))
+    with metrics.stage("load"):
+        results = load_aggregate(results_path, matchups)
+    if pool:
+        partials = pool.map(ENGINES[engine].score_file, deck_files, starts,
+                            [all_matchups] * len(deck_files), [k] * len(deck_files))
+    else:
+        partials = _score_prefetched(engine, deck_files, starts, all_matchups, k, prefetch, max_bytes)
+
+    last = time.perf_counter()
+    for i, (deck_file, partial) in enumerate(zip(deck_files, partials)):
+        # the scalar engines return results dicts, the numpy ones Aggregates
+        partial = as_aggregate(partial, matchups)
+        with metrics.stage("save"):
+            results.merge(partial)
+            progress["file_index"] = file_index + i + 1
+            progress["last_file"] = os.path.basename(deck_file)
+            progress["matchup_index"] = starts[i + 1] if i + 1 < len(starts) else matchup_index
+            commit_results(results, progress, progress_path, results_path)
+        metrics.count("files")
+        metrics.count("decks", sizes[i])
+        metrics.count("bytes", sizes[i] * BYTES_PER_DECK)
+        metrics.count("tricks", partial.total_tricks())
+        metrics.tick()
+
+        # with a pool this is the time until the file's result was merged
+        now = time.perf_counter()
+        report["files"].append({"file": os.path.basename(deck_file), "decks": sizes[i],
+                                "games": partial.total("runs"), "seconds": now - last})
+        print(f"Scored {deck_file} ({sizes[i]} decks) in {now - last:.2f} seconds")
+        last = now
+    return len(deck_files)
+
+
+def run_pipeline(generate=0, rng_version=RNG_VERSION, engine="numpy", all_matchups=False, k=SEQ_LEN, workers=1,
+                 decks_dir=DECKS_DIR, report=REPORT_FILE, prefetch=PREFETCH_DEPTH, prefetch_mb=None):
+    """
+    Generate `generate` new decks into decks_dir, then score every unscored chunk
+    with the chosen engine, all in one process. With workers > 1 one process pool is
+    shared by both stages, so workers (and their compiled tables) stay warm across files.
+    With one worker, `prefetch` files (at most prefetch_mb MB) are read ahead while
+    the current one is scored.
+    Writes a JSON timing report and returns it as a dict.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {sorted(ENGINES)}, got {engine}")
+
+    summary = {
+        "job": {"generate": generate, "rng_version": rng_version, "engine": engine,
+                "all_matchups": all_matchups, "k": k, "workers": workers, "decks_dir": decks_dir,
+                "prefetch": prefetch, "prefetch_mb": prefetch_mb},
+        "files": [],
+    }
+    start_time = time.perf_counter()
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        gen_start = time.perf_counter()
+        created = generate_decks(generate, decks_dir, rng_version, pool=pool) if generate > 0 else []
+        summary["generation"] = {"decks": generate, "files": len(created),
+                                 "seconds": time.perf_counter() - gen_start}
+
+        score_start = time.perf_counter()
+        max_bytes = int(prefetch_mb * 1024 * 1024) if prefetch_mb else None
+        num_files = _score_pending(pool, engine, decks_dir, all_matchups, k, prefetch, max_bytes, summary)
+        score_time = time.perf_counter() - score_start
+    finally:
+        if pool:
+            pool.shutdown()
+
+    # games played (the symmetric engine gets several per deck and matchup)
+    games = sum(f["games"] for f in summary["files"])
+    summary["scoring"] = {"files": num_files, "games": games, "seconds": score_time,
+                          "games_per_sec": games / score_time if score_time > 0 else 0.0}
+    summary["total_seconds"] = time.perf_counter() - start_time
+
+    write_json_atomic(report, summary)
+    get_metrics().close()
+    print(f"Generated {generate} decks, scored {num_files} file(s) ({games} games) "
+          f"in {summary['total_seconds']:.2f} seconds. Report: {report}")
+    return summary
+
+
+# streaming mode: generate and score in memory, no disk round-trip
+def _produce(batches, stop, num_decks, batch_size, first_chunk, rng_version, tee_dir):
+    # producer thread: one chunk's worth of decks per batch, same seeds as generate_decks
+    try:
+        for i, start in enumerate(range(0, num_decks, batch_size)):
+            seed = first_chunk + i + 1
+            decks = chunk_decks(seed, min(batch_size, num_decks - start), rng_version)
+            if tee_dir:
+                path = os.path.join(tee_dir, chunk_name(seed, rng_version))
+                with open(path + ".tmp", "wb") as f:
+                    f.write(decks_to_bytes(decks))
+                os.replace(path + ".tmp", path)
+            batches.put(decks)
+            if stop.is_set():
+                return
+    except BaseException as exc:
+        batches.put(exc)
+        return
+    batches.put(None)
+
+
+def stream_decks(num_decks, batch_size=CHUNK_SIZE, rng_version=RNG_VERSION, tee_dir=None, depth=QUEUE_DEPTH):
+    """
+    Yield num_decks freshly generated decks as uint64 batches of up to batch_size.
+    A background thread generates ahead of the consumer but never more than `depth`
+    batches, so memory stays bounded by depth * batch_size, not num_decks.
+    With the default batch_size, batch i holds the decks of chunk i of a generate_decks
+    run; with tee_dir set each batch is also written there as a chunk file, numbered
+    after the chunks already in it.
+    """
+    first_chunk = 0
+    if tee_dir:
+        os.makedirs(tee_dir, exist_ok=True)
+        first_chunk = get_existing_chunks(tee_dir)
+
+    batches = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, daemon=True,
+                                args=(batches, stop, num_decks, batch_size, first_chunk, rng_version, tee_dir))
+    producer.start()
+    try:
+        while (item := batches.get()) is not None:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # consumer stopped early: unblock the producer so it can exit
+        stop.set()
+        while producer.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def run_streaming(num_decks, all_matchups=False, batch_size=CHUNK_SIZE, rng_version=RNG_VERSION, tee_dir=None,
+                  depth=QUEUE_DEPTH, out=STREAM_RESULTS_FILE, k=SEQ_LEN):
+    """
+    Generate and score num_decks decks without storing them (unless tee_dir is set),
+    using the numpy engine. Results start from zero and are saved to `out`.
+    """
+    start_time = time.perf_counter()
+    metrics = get_metrics()
+    metrics.expect("decks", num_decks)
+    results = Aggregate(get_matchups(k))
+    matchup_index = 0
+    scored = 0
+    for decks in stream_decks(num_decks, batch_size, rng_version, tee_dir, depth):
+        matchup_index = scoring_numpy.score_decks(decks, results, matchup_index, all_matchups, k)
+        scored += len(decks)
+        metrics.count("decks", len(decks))
+        metrics.tick()
+    with metrics.stage("save"):
+        results.export_csv(out)
+    metrics.count("tricks", results.total_tricks())
+    metrics.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Streamed {scored} decks in {elapsed:.2f} seconds ({scored / elapsed:,.0f} decks/sec). Results: {out}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate decks and score every unscored chunk in one run.")
+    parser.add_argument("--job", metavar="SPEC", help="JSON job spec; command-line flags override its settings")
+    parser.add_argument("--generate", type=int, help="Number of new decks to generate first")
+    parser.add_argument("--rng-version", type=int, choices=(RNG_V1_SHUFFLE, RNG_V2_NUMPY), help="RNG stream for new decks")
+    parser.add_argument("--engine", choices=sorted(ENGINES), help="Scoring engine")
+    parser.add_argument("--all-matchups", action="store_true", default=None, help="Play every deck against all matchups")
+    parser.add_argument("--k", type=int, help=f"Sequence length (default {SEQ_LEN})")
+    parser.add_argument("--workers", type=int, help="Worker processes shared by generation and scoring")
+    parser.add_argument("--decks-dir", help="Directory with the deck chunk files")
+    parser.add_argument("--report", help="Where to write the JSON timing report")
+    parser.add_argument("--prefetch", type=int, help=f"Files read ahead while scoring (default {PREFETCH_DEPTH}, 0 = off)")
+    parser.add_argument("--prefetch-mb", type=float, help="Cap on the file data being read ahead, in MB")
+    stream = parser.add_argument_group("streaming mode")
+    stream.add_argument("--stream", type=int, metavar="N", help="Generate and score N decks in memory instead")
+    stream.add_argument("--tee", metavar="DIR", help="Also write the streamed decks to DIR as chunk files")
+    stream.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH, help="Batches generated ahead of scoring")
+    stream.add_argument("--batch-size", type=int, default=CHUNK_SIZE, help="Decks per streamed batch")
+    stream.add_argument("--out", default=STREAM_RESULTS_FILE, help="Results file for streaming mode")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+
+    if args.stream:
+        run_streaming(args.stream, bool(args.all_matchups), args.batch_size, args.rng_version or RNG_VERSION,
+                      args.tee, args.queue_depth, args.out, args.k or SEQ_LEN)
+    else:
+        # defaults < job spec < command line
+        job = dict(JOB_DEFAULTS)
+        if args.job:
+            job.update(load_job(args.job))
+        job.update({name: value for name, value in vars(args).items() if name in JOB_DEFAULTS and value is not None})
+
+        run_pipeline(**job)
@@ -0,0 +1,173 @@
+import csv
+import os
+import sqlite3
+import time
+
+# config
+STORE_FILE = "results.sqlite"
+
+STAT_FIELDS = [
+    "p1_tricks", "p2_tricks", "draws_tricks",
+    "p1_cards", "p2_cards", "draws_cards",
+    "runs",
+]
+CSV_FIELDS = ["p1_seq", "p2_seq"] + STAT_FIELDS
+
+_STATS_SQL = ", ".join(f"{name} INTEGER NOT NULL" for name in STAT_FIELDS)
+
+# ledger: every ingested file with its per-matchup contribution, plus running totals;
+# all three tables change in one transaction, so a crash never half-applies a file
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY,
+    decks INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contributions (
+    file TEXT NOT NULL REFERENCES files(file),
+    p1_seq TEXT NOT NULL,
+    p2_seq TEXT NOT NULL,
+    {_STATS_SQL},
+    PRIMARY KEY (file, p1_seq, p2_seq)
+);
+CREATE TABLE IF NOT EXISTS totals (
+    p1_seq TEXT NOT NULL,
+    p2_seq TEXT NOT NULL,
+    {_STATS_SQL},
+    PRIMARY KEY (p1_seq, p2_seq)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def open_store(path=STORE_FILE):
+    # open (and create if needed) a results store
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _file_key(deck_file):
+    # files are identified by name, so moving the deck folder doesn't re-ingest them
+    return os.path.basename(deck_file)
+
+
+def is_ingested(conn, deck_file):
+    row = conn.execute("SELECT 1 FROM files WHERE file = ?", (_file_key(deck_file),)).fetchone()
+    return row is not None
+
+
+def ingested_files(conn):
+    return [row[0] for row in conn.execute("SELECT file FROM files ORDER BY file")]
+
+
+def _apply(conn, rows, sign):
+    # add (sign=1) or subtract (sign=-1) contribution rows from the totals
+    columns = ", ".join(STAT_FIELDS)
+    placeholders = ", ".join("?" * (len(STAT_FIELDS) + 2))
+    updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in STAT_FIELDS)
+    conn.executemany(
+        f"INSERT INTO totals (p1_seq, p2_seq, {columns}) VALUES ({placeholders}) "
+        f"ON CONFLICT (p1_seq, p2_seq) DO UPDATE SET {updates}",
+        [(p1_seq, p2_seq, *(sign * v for v in vals)) for p1_seq, p2_seq, *vals in rows],
+    )
+
+
+def ingest_file(conn, deck_file, partial, decks, meta=None):
+    """
+    Record one file's partial aggregate ({(p1_seq, p2_seq): stats}) and add it to the
+    totals in a single transaction. meta (e.g. the next matchup_index) is saved in the
+    same transaction. Returns False, changing nothing, if the file is already ingested.
+    """
+    key = _file_key(deck_file)
+    rows = [(p1_seq, p2_seq, *(vals[name] for name in STAT_FIELDS)) for (p1_seq, p2_seq), vals in partial.items()]
+    with conn:
+        if conn.execute("SELECT 1 FROM files WHERE file = ?", (key,)).fetchone():
+            return False
+        conn.execute("INSERT INTO files (file, decks, ingested_at) VALUES (?, ?, ?)", (key, decks, time.time()))
+        conn.executemany(
+            f"INSERT INTO contributions (file, p1_seq, p2_seq, {', '.join(STAT_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' * (len(STAT_FIELDS) + 2))})",
+            [(key, *row) for row in rows],
+        )
+        _apply(conn, rows, 1)
+        for name, value in (meta or {}).items():
+            _set_meta(conn, name, value)
+    return True
+
+
+def remove_file(conn, deck_file):
+    """
+    Subtract one file's contribution from the totals and forget it, so it can be
+    re-ingested. Returns False if the file was never ingested.
+    """
+    key = _file_key(deck_file)
+    with conn:
+        rows = conn.execute(
+            f"SELECT p1_seq, p2_seq, {', '.join(STAT_FIELDS)} FROM contributions WHERE file = ?", (key,)
+        ).fetchall()
+        if not conn.execute("DELETE FROM files WHERE file = ?", (key,)).rowcount:
+            return False
+        _apply(conn, rows, -1)
+        conn.execute("DELETE FROM contributions WHERE file = ?", (key,))
+        conn.execute("DELETE FROM totals WHERE runs = 0")
+    return True
+
+
+def _set_meta(conn, name, value):
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (name, str(value)),
+    )
+
+
+def get_meta(conn, name, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+
+def load_totals(conn):
+    # totals in the same dict layout as load_results()
+    results = {}
+    for p1_seq, p2_seq, *vals in conn.execute(
+        f"SELECT p1_seq, p2_seq, {', '.join(STAT_FIELDS)} FROM totals ORDER BY p1_seq, p2_seq"
+    ):
+        results[(p1_seq, p2_seq)] = dict(zip(STAT_FIELDS, vals))
+    return results
+
+
+def export_csv(conn, path):
+    # write the totals as a results.csv-style file (temp file + rename)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for (p1_seq, p2_seq), vals in load_totals(conn).items():
+            writer.writerow({"p1_seq": p1_seq, "p2_seq": p2_seq, **vals})
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or edit a results store.")
+    parser.add_argument("--store", default=STORE_FILE, help="SQLite results store")
+    parser.add_argument("--export", metavar="CSV", help="Write the totals to a CSV file")
+    parser.add_argument("--remove", metavar="FILE", action="append", default=[], help="Subtract an ingested deck file")
+    args = parser.parse_args()
+
+    conn = open_store(args.store)
+    for deck_file in args.remove:
+        if remove_file(conn, deck_file):
+            print(f"Removed {deck_file}")
+        else:
+            print(f"{deck_file} was not in the store")
+    if args.export:
+        export_csv(conn, args.export)
+        print(f"Exported totals to {args.export}")
+    print(f"{len(ingested_files(conn))} files ingested")
@@ -103,7 +103,10 @@ def main():
     parser.add_argument("--quick", action="store_true", help="Quick test (50k decks)")
     # allows user to run multiple tests for stats
     parser.add_argument("--runs", type=int, default=1, help="Repeat test this many times")  # NEW
+    # per-file timings go next to the deck files by default, never over the scoring results.csv
+    parser.add_argument("--csv", default=None, help="Per-file timings CSV (default: <outdir>/timings.csv)")
     args = parser.parse_args()
+    timings_csv = args.csv or str(Path(args.outdir) / "timings.csv")
 
     # determine number of decks depenting on if user wants a quick test or not
     N = 50_000 if args.quick else args.n
@@ -136,11 +139,11 @@ def main():
         print(f"Total runtime:         {formatted_time(total_runtime)}")
 
         # save CSV for this run (overwrite each run)
-        with open("results.csv", "w", newline="") as f:
+        with open(timings_csv, "w", newline="") as f:
             writer = csv.writer(f)
             writer.writerow(headers)
             writer.writerows(rows)
-        print(f"\nPer-file results saved to 'results.csv'")
+        print(f"\nPer-file results saved to '{timings_csv}'")
 
         # sample decks
         print("\nSample decks from first file:")
@@ -1,8 +1,9 @@
 import csv
 import json
-import os
 from pathlib import Path
 
+from chunk_files import deck_count, list_deck_files
+
 # ==============================
 # CONFIG
 # ==============================
@@ -16,37 +17,73 @@ BYTES_PER_DECK = (DECK_SIZE_BITS + 7) // 8
 # ==============================
 # MATCHUPS
 # ==============================
-SEQUENCES = [
-    "000", "001", "010", "011",
-    "100", "101", "110", "111",
-]
+# every k-card color sequence; k = SEQ_LEN unless the functions below are
+# given longer or shorter sequence strings
+SEQ_LEN = 3
+
+
+def make_sequences(k=SEQ_LEN):
+    return [format(i, f"0{k}b") for i in range(1 << k)]
+
+
+def make_matchups(k=SEQ_LEN):
+    """All pairings of k-card sequences without duplicates (no "000 vs 000")."""
+    sequences = make_sequences(k)
+    return [(p1, p2) for i, p1 in enumerate(sequences) for j, p2 in enumerate(sequences) if i != j]
+
+
+SEQUENCES = make_sequences()
+MATCHUPS = make_matchups()
+_MATCHUPS = {SEQ_LEN: MATCHUPS}
+
 
-# all pairings without duplicates (no "000 vs 000")
-MATCHUPS = [(p1, p2) for i, p1 in enumerate(SEQUENCES) for j, p2 in enumerate(SEQUENCES) if i != j]
+def get_matchups(k=SEQ_LEN):
+    """MATCHUPS for k-card sequences, built once per k."""
+    if k not in _MATCHUPS:
+        if k < 1:
+            raise ValueError(f"sequence length must be at least 1, got {k}")
+        _MATCHUPS[k] = make_matchups(k)
+    return _MATCHUPS[k]
+
+
+def state_files(k=SEQ_LEN):
+    """(progress, results) files for k-card runs; k = SEQ_LEN keeps the original names."""
+    if k == SEQ_LEN:
+        return PROGRESS_FILE, RESULTS_FILE
+    return f"progress_k{k}.json", f"results_k{k}.csv"
 
 
 # ==============================
 # PROGRESS
 # ==============================
-def load_progress():
-    if Path(PROGRESS_FILE).exists():
-        with open(PROGRESS_FILE, "r") as f:
-            return json.load(f)
-    return {"matchup_index": 0, "file_index": 0}
-
-
-def save_progress(progress):
-    with open(PROGRESS_FILE, "w") as f:
+def load_progress(path=None, all_matchups=False):
+    path = path or PROGRESS_FILE
+    progress = {"matchup_index": 0, "file_index": 0}
+    if Path(path).exists():
+        with open(path, "r") as f:
+            progress = json.load(f)
+    # all-matchups and round-robin totals can't be mixed in one results file
+    saved_mode = progress.get("all_matchups", all_matchups)
+    if progress["file_index"] and saved_mode != all_matchups:
+        raise ValueError(f"{path} holds {'all-matchups' if saved_mode else 'round-robin'} results; "
+                         f"can't add {'all-matchups' if all_matchups else 'round-robin'} ones")
+    progress["all_matchups"] = all_matchups
+    return progress
+
+
+def save_progress(progress, path=None):
+    with open(path or PROGRESS_FILE, "w") as f:
         json.dump(progress, f)
 
 
 # ==============================
 # RESULTS
 # ==============================
-def load_results():
+def load_results(path=None):
+    path = path or RESULTS_FILE
     results = {}
-    if Path(RESULTS_FILE).exists():
-        with open(RESULTS_FILE, newline="") as f:
+    if Path(path).exists():
+        with open(path, newline="") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 key = (row["p1_seq"], row["p2_seq"])
@@ -62,14 +99,14 @@ def load_results():
     return results
 
 
-def save_results(results):
+def save_results(results, path=None):
     fieldnames = [
         "p1_seq", "p2_seq",
         "p1_tricks", "p2_tricks", "draws_tricks",
         "p1_cards", "p2_cards", "draws_cards",
         "runs",
     ]
-    with open(RESULTS_FILE, "w", newline="") as f:
+    with open(path or RESULTS_FILE, "w", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         for (p1_seq, p2_seq), vals in results.items():
@@ -85,6 +122,7 @@ def save_results(results):
 # ==============================
 def read_decks_from_file(filename):
     """Read one deck file (binary) and return list of 52-bit strings."""
+    deck_count(filename)  # refuse a cut-short file
     decks = []
     with open(filename, "rb") as f:
         while (chunk := f.read(BYTES_PER_DECK)):
@@ -101,22 +139,23 @@ def play_deck(deck_bits, p1_seq, p2_seq):
     """Play through a single deck and return winner stats."""
     i = 0
     n = len(deck_bits)
+    k = len(p1_seq)
     p1_tricks = p2_tricks = 0
     p1_cards = p2_cards = 0
 
-    while i <= n - 3:
-        window = deck_bits[i:i+3]
+    while i <= n - k:
+        window = deck_bits[i:i+k]
         if window == p1_seq:
             p1_tricks += 1
-            p1_cards += (i + 3)  # cards up to and including sequence
-            deck_bits = deck_bits[i+3:]  # remove used cards
+            p1_cards += (i + k)  # cards up to and including sequence
+            deck_bits = deck_bits[i+k:]  # remove used cards
             n = len(deck_bits)
             i = 0
             continue
         elif window == p2_seq:
             p2_tricks += 1
-            p2_cards += (i + 3)
-            deck_bits = deck_bits[i+3:]
+            p2_cards += (i + k)
+            deck_bits = deck_bits[i+k:]
             n = len(deck_bits)
             i = 0
             continue
@@ -132,65 +171,132 @@ def play_deck(deck_bits, p1_seq, p2_seq):
     return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
 
 
+def find_occurrences(deck_bits, k=SEQ_LEN):
+    """Map every k-card sequence in the deck to the positions where it starts."""
+    occurrences = {}
+    for i in range(len(deck_bits) - k + 1):
+        occurrences.setdefault(deck_bits[i:i+k], []).append(i)
+    return occurrences
+
+
+def resolve_matchup(occurrences, p1_seq, p2_seq, n=DECK_SIZE_BITS):
+    """Play one game from precomputed occurrences (same result as play_deck)."""
+    k = len(p1_seq)
+    p1_pos = occurrences.get(p1_seq, [])
+    p2_pos = occurrences.get(p2_seq, [])
+    a = b = cut = 0
+    p1_tricks = p2_tricks = 0
+    p1_cards = p2_cards = 0
+
+    while True:
+        # only occurrences starting after the last trick count
+        while a < len(p1_pos) and p1_pos[a] < cut:
+            a += 1
+        while b < len(p2_pos) and p2_pos[b] < cut:
+            b += 1
+        next1 = p1_pos[a] if a < len(p1_pos) else n
+        next2 = p2_pos[b] if b < len(p2_pos) else n
+        if next1 == next2 == n:
+            break
+        if next1 < next2:
+            p1_tricks += 1
+            p1_cards += next1 + k - cut
+            cut = next1 + k
+        else:
+            p2_tricks += 1
+            p2_cards += next2 + k - cut
+            cut = next2 + k
+
+    draws_tricks = 1 if p1_tricks == p2_tricks else 0
+    draws_cards = 1 if p1_cards == p2_cards else 0
+
+    return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
+
+
+def play_deck_all_matchups(deck_bits, matchups=MATCHUPS):
+    """Play a deck against every matchup (all of one sequence length), scanning it only once."""
+    occurrences = find_occurrences(deck_bits, len(matchups[0][0]))
+    return [resolve_matchup(occurrences, p1_seq, p2_seq) for p1_seq, p2_seq in matchups]
+
+
+def update_results(results, key, stats):
+    p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = stats
+    if key not in results:
+        results[key] = {
+            "p1_tricks": 0,
+            "p2_tricks": 0,
+            "draws_tricks": 0,
+            "p1_cards": 0,
+            "p2_cards": 0,
+            "draws_cards": 0,
+            "runs": 0,
+        }
+
+    results[key]["p1_tricks"] += p1_tricks
+    results[key]["p2_tricks"] += p2_tricks
+    results[key]["draws_tricks"] += draws_tricks
+    results[key]["p1_cards"] += p1_cards
+    results[key]["p2_cards"] += p2_cards
+    results[key]["draws_cards"] += draws_cards
+    results[key]["runs"] += 1
+
+
 # ==============================
 # MAIN
 # ==============================
-def main():
-    progress = load_progress()
+def main(all_matchups=False, k=SEQ_LEN):
+    # k-card sequences keep their own progress and results
+    matchups = get_matchups(k)
+    progress_file, results_file = state_files(k)
+    progress = load_progress(progress_file, all_matchups)
     matchup_index = progress["matchup_index"]
     file_index = progress["file_index"]
 
-    # Get deck file
-    deck_file = os.path.join(DECKS_DIR, f"decks_seed{file_index+1:03d}.bin")
-    if not Path(deck_file).exists():
+    # Get deck file (v1 and versioned chunk names, ordered by seed)
+    deck_files = list_deck_files(DECKS_DIR)
+    if file_index >= len(deck_files):
         print(f"No more deck files to process at index {file_index}. Done!")
         return
+    deck_file = deck_files[file_index]
 
     decks = read_decks_from_file(deck_file)
     print(f"Processing file: {deck_file} with {len(decks)} decks...")
 
     # Load results
-    results = load_results()
+    results = load_results(results_file)
 
     # Run scoring
-    for deck_bits in decks:
-        p1_seq, p2_seq = MATCHUPS[matchup_index]
-
-        p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = play_deck(deck_bits, p1_seq, p2_seq)
-
-        key = (p1_seq, p2_seq)
-        if key not in results:
-            results[key] = {
-                "p1_tricks": 0,
-                "p2_tricks": 0,
-                "draws_tricks": 0,
-                "p1_cards": 0,
-                "p2_cards": 0,
-                "draws_cards": 0,
-                "runs": 0,
-            }
-
-        results[key]["p1_tricks"] += p1_tricks
-        results[key]["p2_tricks"] += p2_tricks
-        results[key]["draws_tricks"] += draws_tricks
-        results[key]["p1_cards"] += p1_cards
-        results[key]["p2_cards"] += p2_cards
-        results[key]["draws_cards"] += draws_cards
-        results[key]["runs"] += 1
-
-        # advance matchup
-        matchup_index = (matchup_index + 1) % len(MATCHUPS)
+    if all_matchups:
+        # every deck plays every matchup; matchup_index is left untouched
+        for deck_bits in decks:
+            for key, stats in zip(matchups, play_deck_all_matchups(deck_bits, matchups)):
+                update_results(results, key, stats)
+    else:
+        for deck_bits in decks:
+            p1_seq, p2_seq = matchups[matchup_index]
+            update_results(results, (p1_seq, p2_seq), play_deck(deck_bits, p1_seq, p2_seq))
+
+            # advance matchup
+            matchup_index = (matchup_index + 1) % len(matchups)
 
     # Save updated results
-    save_results(results)
+    save_results(results, results_file)
 
     # Update progress
     progress["matchup_index"] = matchup_index
     progress["file_index"] = file_index + 1
-    save_progress(progress)
+    save_progress(progress, progress_file)
 
     print(f"Finished file {file_index+1}. Next run will use file index {file_index+1}.")
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score the next deck file.")
+    parser.add_argument("--all-matchups", action="store_true", help="Play every deck against all matchups")
+    parser.add_argument("--k", type=int, default=SEQ_LEN,
+                        help=f"Sequence length (default {SEQ_LEN}; other lengths get their own progress and results files)")
+    args = parser.parse_args()
+
+    main(args.all_matchups, args.k)
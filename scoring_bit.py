@@ -2,40 +2,160 @@ import csv
 import json
 import os
 import time
-import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
 from pathlib import Path
 
+from aggregate import Aggregate, aggregate_path, load_aggregate, save_aggregate, totals_bytes
+from deck_io import decode_records, deck_count, list_deck_files, map_deck_records
+from memory import MEMORY_MODE, BatchSizer, MemoryMonitor, add_memory_arguments, budget_bytes
+from metrics import add_metrics_arguments, enable_from_args, get_metrics
+from results_store import open_store, get_meta, is_ingested, ingest_file, export_csv
+
 # config
 DECKS_DIR = "decks_chunks"
 RESULTS_FILE = "results_2.csv"
 PROGRESS_FILE = "progress_2.json"
+CHECKPOINT_FILE = "checkpoint_2.json"
+STORE_RESULTS_FILE = "results_store.csv"   # --store mode's export; the SQLite store holds its totals
+
+# decks scored between checkpoints inside a file
+CHECKPOINT_EVERY = 1000
 
 DECK_SIZE_BITS = 52
 BYTES_PER_DECK = (DECK_SIZE_BITS + 7) // 8
 
-# sequences and matchups
-SEQUENCES = [
-    "000", "001", "010", "011",
-    "100", "101", "110", "111",
-]
-MATCHUPS = [(p1, p2) for i, p1 in enumerate(SEQUENCES) for j, p2 in enumerate(SEQUENCES) if i != j]
+# sequences and matchups: every k-card color sequence (k = SEQ_LEN unless a
+# function is given longer or shorter sequence strings)
+SEQ_LEN = 3
+
+def make_sequences(k=SEQ_LEN):
+    return [format(i, f"0{k}b") for i in range(1 << k)]
+
+def make_matchups(k=SEQ_LEN):
+    # all ordered pairs of different k-card sequences (2^k * (2^k - 1) of them)
+    sequences = make_sequences(k)
+    return [(p1, p2) for i, p1 in enumerate(sequences) for j, p2 in enumerate(sequences) if i != j]
+
+SEQUENCES = make_sequences()
+MATCHUPS = make_matchups()
+MATCHUP_BITS = [(int(p1, 2), int(p2, 2)) for p1, p2 in MATCHUPS]
+_MATCHUPS = {SEQ_LEN: MATCHUPS}
+_MATCHUP_BITS = {SEQ_LEN: MATCHUP_BITS}
+
+def get_matchups(k=SEQ_LEN):
+    # MATCHUPS for k-card sequences, built once per k
+    if k not in _MATCHUPS:
+        if k < 1:
+            raise ValueError(f"sequence length must be at least 1, got {k}")
+        _MATCHUPS[k] = make_matchups(k)
+    return _MATCHUPS[k]
+
+def matchup_bits(k=SEQ_LEN):
+    # MATCHUP_BITS for k-card sequences, built once per k
+    if k not in _MATCHUP_BITS:
+        _MATCHUP_BITS[k] = [(int(p1, 2), int(p2, 2)) for p1, p2 in get_matchups(k)]
+    return _MATCHUP_BITS[k]
+
+def state_files(k=SEQ_LEN):
+    # (progress, results, checkpoint) files for k-card runs; k = SEQ_LEN keeps the original names
+    if k == SEQ_LEN:
+        return PROGRESS_FILE, RESULTS_FILE, CHECKPOINT_FILE
+    return f"progress_2_k{k}.json", f"results_2_k{k}.csv", f"checkpoint_2_k{k}.json"
+
+# atomic writes: write a temp file, flush it to disk, then rename over the old one
+def write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 # progress tracking
-def load_progress():
-    if Path(PROGRESS_FILE).exists():
-        with open(PROGRESS_FILE, "r") as f:
-            return json.load(f)
-    return {"matchup_index": 0, "file_index": 0}
+def load_progress(cycle=None, path=None, results_path=None, all_matchups=False):
+    """
+    Progress for the results in results_path (default RESULTS_FILE). matchup_index
+    counts round-robin games modulo cycle, the length of the matchup list the engine
+    cycles over (default len(MATCHUPS)); the cycle and the all_matchups mode are saved
+    with the progress, and resuming progress saved with different ones is a ValueError.
+    """
+    path = path or PROGRESS_FILE
+    cycle = cycle or len(MATCHUPS)
+    progress = {"matchup_index": 0, "file_index": 0}
+    if Path(path).exists():
+        with open(path, "r") as f:
+            progress = json.load(f)
+    # a run that stopped after saving the totals but before the progress file:
+    # the totals carry the progress they belong to, so roll forward to it
+    if Path(aggregate_path(results_path or RESULTS_FILE)).exists():
+        saved = Aggregate.load(aggregate_path(results_path or RESULTS_FILE)).progress
+        if saved and saved["file_index"] > progress["file_index"]:
+            progress = saved
+            save_progress(progress, path)
+    # progress from before the cycle was recorded counted over MATCHUPS
+    saved_cycle = progress.get("cycle", len(MATCHUPS))
+    if progress["file_index"] and saved_cycle != cycle:
+        raise ValueError(f"{path} counts matchups modulo {saved_cycle}, this engine modulo {cycle}; "
+                         f"use the engine's own progress and results files")
+    # round-robin and all-matchups games never share totals; progress saved before
+    # the mode was recorded is taken as it is
+    saved_mode = progress.get("all_matchups", all_matchups)
+    if progress["file_index"] and saved_mode != all_matchups:
+        raise ValueError(f"{path} holds {'all-matchups' if saved_mode else 'round-robin'} results; "
+                         f"can't add {'all-matchups' if all_matchups else 'round-robin'} ones")
+    progress["cycle"] = cycle
+    progress["all_matchups"] = all_matchups
+    return progress
+
+def save_progress(progress, path=None):
+    write_json_atomic(path or PROGRESS_FILE, progress)
+
+def commit_results(results, progress, path=None, results_path=None):
+    """
+    Save the totals after one or more files together with the progress that goes with
+    them. The binary results file holds both, so its rename is the one commit point:
+    a crash before it changes nothing, a crash after it is rolled forward by
+    load_progress. Then the progress file is written.
+    """
+    save_aggregate(results, results_path, progress=progress)
+    save_progress(progress, path)
+
+# checkpoints inside a file: scored decks so far plus their partial results
+def load_checkpoint(file_index, all_matchups, k=SEQ_LEN, path=None):
+    path = path or state_files(k)[2]
+    if not Path(path).exists():
+        return None
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+    # a checkpoint for another file, mode or sequence length is stale
+    if (checkpoint["file_index"], checkpoint["all_matchups"], checkpoint.get("k", SEQ_LEN)) != (file_index, all_matchups, k):
+        return None
+    checkpoint["results"] = Aggregate.from_results(
+        {(p1_seq, p2_seq): vals for p1_seq, p2_seq, vals in checkpoint["results"]}, get_matchups(k))
+    return checkpoint
 
-def save_progress(progress):
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump(progress, f)
+def save_checkpoint(file_index, all_matchups, deck_offset, matchup_index, partial, k=SEQ_LEN, path=None):
+    write_json_atomic(path or state_files(k)[2], {
+        "file_index": file_index,
+        "all_matchups": all_matchups,
+        "k": k,
+        "deck_offset": deck_offset,
+        "matchup_index": matchup_index,
+        "results": [[p1_seq, p2_seq, vals] for (p1_seq, p2_seq), vals in partial.to_results().items()],
+    })
+
+def clear_checkpoint(path=None):
+    path = path or CHECKPOINT_FILE
+    if Path(path).exists():
+        os.remove(path)
 
 # results
-def load_results():
+def load_results(path=None):
+    path = path or RESULTS_FILE
     results = {}
-    if Path(RESULTS_FILE).exists():
-        with open(RESULTS_FILE, newline="") as f:
+    if Path(path).exists():
+        with open(path, newline="") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 key = (row["p1_seq"], row["p2_seq"])
@@ -50,14 +170,16 @@ def load_results():
                 }
     return results
 
-def save_results(results):
+def save_results(results, path=None):
+    path = path or RESULTS_FILE
     fieldnames = [
         "p1_seq", "p2_seq",
         "p1_tricks", "p2_tricks", "draws_tricks",
         "p1_cards", "p2_cards", "draws_cards",
         "runs",
     ]
-    with open(RESULTS_FILE, "w", newline="") as f:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         for (p1_seq, p2_seq), vals in results.items():
@@ -66,9 +188,13 @@ def save_results(results):
                 "p2_seq": p2_seq,
                 **vals
             })
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 # read decks
 def read_decks_from_file(filename):
+    deck_count(filename)  # a cut-short file is an error, not a smaller file
     decks = []
     with open(filename, "rb") as f:
         while (chunk := f.read(BYTES_PER_DECK)):
@@ -85,20 +211,22 @@ def play_deck(deck_int, p1_seq, p2_seq):
 
     p1_bits = int(p1_seq, 2)
     p2_bits = int(p2_seq, 2)
+    k = len(p1_seq)
+    mask = (1 << k) - 1
 
-    while i <= n - 3:
-        window = (deck_int >> (n - 3 - i)) & 0b111
+    while i <= n - k:
+        window = (deck_int >> (n - k - i)) & mask
         if window == p1_bits:
             p1_tricks += 1
-            p1_cards += (i + 3)
-            n -= (i + 3)
+            p1_cards += (i + k)
+            n -= (i + k)
             deck_int &= (1 << n) - 1
             i = 0
             continue
         elif window == p2_bits:
             p2_tricks += 1
-            p2_cards += (i + 3)
-            n -= (i + 3)
+            p2_cards += (i + k)
+            n -= (i + k)
             deck_int &= (1 << n) - 1
             i = 0
             continue
@@ -109,65 +237,287 @@ def play_deck(deck_int, p1_seq, p2_seq):
 
     return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
 
-# main loop
-def main():
-    progress = load_progress()
+# all matchups at once
+def find_occurrences(deck_int, n=DECK_SIZE_BITS, k=SEQ_LEN):
+    # start positions of every k-bit window, grouped by window value
+    occurrences = [[] for _ in range(1 << k)]
+    for i in range(n - k + 1):
+        occurrences[(deck_int >> (n - k - i)) & ((1 << k) - 1)].append(i)
+    return occurrences
+
+def resolve_matchup(occurrences, p1_bits, p2_bits, n=DECK_SIZE_BITS, k=SEQ_LEN):
+    # replay one game from precomputed occurrences: the next trick is the
+    # earliest p1/p2 occurrence that starts at or after the last cut
+    p1_pos = occurrences[p1_bits]
+    p2_pos = occurrences[p2_bits]
+    a = b = cut = 0
+    p1_tricks = p2_tricks = 0
+    p1_cards = p2_cards = 0
+
+    while True:
+        while a < len(p1_pos) and p1_pos[a] < cut:
+            a += 1
+        while b < len(p2_pos) and p2_pos[b] < cut:
+            b += 1
+        next1 = p1_pos[a] if a < len(p1_pos) else n
+        next2 = p2_pos[b] if b < len(p2_pos) else n
+        if next1 == next2 == n:
+            break
+        if next1 < next2:
+            p1_tricks += 1
+            p1_cards += next1 + k - cut
+            cut = next1 + k
+        else:
+            p2_tricks += 1
+            p2_cards += next2 + k - cut
+            cut = next2 + k
+
+    draws_tricks = 1 if p1_tricks == p2_tricks else 0
+    draws_cards = 1 if p1_cards == p2_cards else 0
+
+    return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
+
+def play_deck_all_matchups(deck_int, k=SEQ_LEN):
+    # one result tuple per entry of MATCHUPS, sharing a single scan of the deck
+    occurrences = find_occurrences(deck_int, k=k)
+    return [resolve_matchup(occurrences, p1_bits, p2_bits, k=k) for p1_bits, p2_bits in matchup_bits(k)]
+
+def score_decks(decks, results, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # add every deck's games to results (an Aggregate or Tally over get_matchups(k),
+    # indexed by matchup id), return the next matchup_index
+    add = results.add
+    if all_matchups:
+        # every deck plays every matchup; matchup_index is left untouched
+        for deck_int in decks:
+            for matchup_id, stats in enumerate(play_deck_all_matchups(deck_int, k)):
+                add(matchup_id, stats)
+    else:
+        matchups = get_matchups(k)
+        for deck_int in decks:
+            p1_seq, p2_seq = matchups[matchup_index]
+            add(matchup_index, play_deck(deck_int, p1_seq, p2_seq))
+            matchup_index = (matchup_index + 1) % len(matchups)
+    return matchup_index
+
+# parallel scoring
+def pending_deck_files(progress, decks_dir=DECKS_DIR):
+    """
+    Deck files not scored yet. progress["file_index"] counts files in list_deck_files
+    order (v1 and _v2 chunks alike) for every tool sharing the progress file, and
+    progress["last_file"] names the last file scored: if the listing has changed
+    since (say a chunk with a lower seed was added), resuming would skip or re-score
+    files, so that is an error.
+    """
+    deck_files = list_deck_files(decks_dir)
+    file_index = progress["file_index"]
+    last_file = progress.get("last_file")
+    if last_file and not (0 < file_index <= len(deck_files)
+                          and os.path.basename(deck_files[file_index - 1]) == last_file):
+        raise ValueError(f"Progress says file {file_index} was {last_file}, but the deck files in "
+                         f"{decks_dir} have changed since; fix the directory or reset the progress file")
+    return deck_files[file_index:]
+
+def score_file(deck_file, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # worker task: partial Aggregate for one file
+    results = Aggregate(get_matchups(k))
+    score_decks(read_decks_from_file(deck_file), results, matchup_index, all_matchups, k)
+    return results
+
+def main_parallel(workers=None, all_matchups=False, k=SEQ_LEN):
+    matchups = get_matchups(k)
+    progress_file, results_file, _ = state_files(k)
+    progress = load_progress(len(matchups), progress_file, results_file, all_matchups)
     matchup_index = progress["matchup_index"]
     file_index = progress["file_index"]
 
-    deck_file = os.path.join(DECKS_DIR, f"decks_seed{file_index+1:03d}.bin")
-    if not Path(deck_file).exists():
+    deck_files = pending_deck_files(progress)
+    if not deck_files:
         print(f"No more deck files to process at index {file_index}. Done!")
         return
 
-    # start runtime + memory
     start_time = time.perf_counter()
-    tracemalloc.start()
 
-    decks = read_decks_from_file(deck_file)
-    print(f"Processing file: {deck_file} with {len(decks)} decks...")
+    # each file's starting matchup comes from the deck counts before it, so the
+    # round-robin assignment is the same as running main() once per file
+    starts = []
+    for deck_file in deck_files:
+        starts.append(matchup_index)
+        if not all_matchups:
+            num_decks = deck_count(deck_file)
+            matchup_index = (matchup_index + num_decks) % len(matchups)
 
-    results = load_results()
+    print(f"Processing {len(deck_files)} files with {workers or os.cpu_count()} workers...")
+    results = load_aggregate(results_file, matchups)
 
-    for deck_int in decks:
-        p1_seq, p2_seq = MATCHUPS[matchup_index]
-        p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = play_deck(deck_int, p1_seq, p2_seq)
+    # map hands files to whichever worker is free but yields in file order
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        n = len(deck_files)
+        for partial in pool.map(score_file, deck_files, starts, [all_matchups] * n, [k] * n):
+            results.merge(partial)
 
-        key = (p1_seq, p2_seq)
-        if key not in results:
-            results[key] = {
-                "p1_tricks": 0,
-                "p2_tricks": 0,
-                "draws_tricks": 0,
-                "p1_cards": 0,
-                "p2_cards": 0,
-                "draws_cards": 0,
-                "runs": 0,
-            }
+    progress["matchup_index"] = matchup_index
+    progress["file_index"] = file_index + len(deck_files)
+    progress["last_file"] = os.path.basename(deck_files[-1])
+    commit_results(results, progress, progress_file, results_file)
 
-        results[key]["p1_tricks"] += p1_tricks
-        results[key]["p2_tricks"] += p2_tricks
-        results[key]["draws_tricks"] += draws_tricks
-        results[key]["p1_cards"] += p1_cards
-        results[key]["p2_cards"] += p2_cards
-        results[key]["draws_cards"] += draws_cards
-        results[key]["runs"] += 1
+    elapsed = time.perf_counter() - start_time
+    print(f"Finished files {file_index+1}-{file_index+len(deck_files)}. Next run will use file index {progress['file_index']}.")
+    print(f"Runtime: {elapsed:.2f} seconds")
 
-        matchup_index = (matchup_index + 1) % len(MATCHUPS)
+def main_store(store_path, all_matchups=False, workers=1, k=SEQ_LEN):
+    # score every file missing from the results store, committing one file at a time
+    mode = "all_matchups" if all_matchups else "round_robin"
+    matchups = get_matchups(k)
+    with closing(open_store(store_path)) as conn:
+        # a store holds one kind of run: round-robin and all-matchups games never mix,
+        # and neither do sequence lengths
+        stored_mode = get_meta(conn, "mode")
+        if stored_mode not in (None, mode):
+            raise ValueError(f"{store_path} holds {stored_mode} results; can't add {mode} ones")
+        stored_k = get_meta(conn, "k", str(SEQ_LEN) if stored_mode else None)
+        if stored_k not in (None, str(k)):
+            raise ValueError(f"{store_path} holds k={stored_k} results; can't add k={k} ones")
 
-    save_results(results)
+        # a file's starting matchup depends only on how many decks come before it, so a
+        # removed and re-scored file contributes exactly what it did the first time
+        deck_files, starts = [], []
+        matchup_index = 0
+        for deck_file in list_deck_files(DECKS_DIR):
+            if not is_ingested(conn, deck_file):
+                deck_files.append(deck_file)
+                starts.append(matchup_index)
+            if not all_matchups:
+                num_decks = deck_count(deck_file)
+                matchup_index = (matchup_index + num_decks) % len(matchups)
 
-    progress["matchup_index"] = matchup_index
-    progress["file_index"] = file_index + 1
-    save_progress(progress)
+        if not deck_files:
+            print("No new deck files to score. Done!")
+            export_csv(conn, STORE_RESULTS_FILE)
+            return
+
+        start_time = time.perf_counter()
+
+        print(f"Processing {len(deck_files)} new files into {store_path}...")
+        args = (deck_files, starts, [all_matchups] * len(deck_files), [k] * len(deck_files))
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            partials = pool.map(score_file, *args) if pool else map(score_file, *args)
+            # each file's contribution (and the store's mode) lands in its own transaction
+            for deck_file, partial in zip(deck_files, partials):
+                ingest_file(conn, deck_file, partial.to_results(), deck_count(deck_file),
+                            meta={"mode": mode, "k": k})
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        export_csv(conn, STORE_RESULTS_FILE)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Scored {len(deck_files)} files. Results exported to {STORE_RESULTS_FILE}.")
+    print(f"Runtime: {elapsed:.2f} seconds")
+
+# main loop
+def main(all_matchups=False, checkpoint_every=CHECKPOINT_EVERY, memory_mode=MEMORY_MODE, max_memory=None,
+         k=SEQ_LEN):
+    matchups = get_matchups(k)
+    progress_file, results_file, checkpoint_file = state_files(k)
+    progress = load_progress(len(matchups), progress_file, results_file, all_matchups)
+    matchup_index = progress["matchup_index"]
+    file_index = progress["file_index"]
+
+    deck_files = pending_deck_files(progress)
+    if not deck_files:
+        print(f"No more deck files to process at index {file_index}. Done!")
+        return
+    deck_file = deck_files[0]
+
+    # start runtime + memory
+    start_time = time.perf_counter()
+    monitor = MemoryMonitor(memory_mode).start()
+    metrics = get_metrics()
+
+    # decks are decoded a batch at a time from a memory map
+    records = map_deck_records(deck_file)
+    num_decks = len(records)
+    print(f"Processing file: {deck_file} with {num_decks} decks...")
+
+    # pick up where an interrupted run on this file stopped
+    partial = Aggregate(matchups)
+    deck_offset = 0
+    checkpoint = load_checkpoint(file_index, all_matchups, k, checkpoint_file)
+    if checkpoint:
+        partial = checkpoint["results"]
+        deck_offset = checkpoint["deck_offset"]
+        matchup_index = checkpoint["matchup_index"]
+        print(f"Resuming from checkpoint at deck {deck_offset}.")
+
+    metrics.expect("decks", num_decks - deck_offset)
+    # batches never span a checkpoint; a memory budget can make them smaller. Games go
+    # straight into fixed-size totals (one row per matchup), so the batch is the only
+    # part that grows with the file; the totals (this file's, the running ones they are
+    # merged into and a checkpoint's copy) just have to fit in the budget (see __main__)
+    every = checkpoint_every or num_decks or 1
+    sizer = BatchSizer(every, budget_bytes(max_memory))
+    start = deck_offset
+    while start < num_decks:
+        end = min(start + sizer.next_size(), (start // every + 1) * every, num_decks)
+        with metrics.stage("read"):
+            decks = decode_records(records[start:end]).tolist()
+        with metrics.stage("score"):
+            matchup_index = score_decks(decks, partial, matchup_index, all_matchups, k)
+        metrics.count("decks", end - start)
+        metrics.count("bytes", (end - start) * BYTES_PER_DECK)
+        start = end
+        if start % every == 0 and start < num_decks:
+            with metrics.stage("checkpoint"):
+                save_checkpoint(file_index, all_matchups, start, matchup_index, partial, k, checkpoint_file)
+        metrics.tick()
+
+    with metrics.stage("save"):
+        progress["matchup_index"] = matchup_index
+        progress["file_index"] = file_index + 1
+        progress["last_file"] = os.path.basename(deck_file)
+        commit_results(load_aggregate(results_file, matchups).merge(partial), progress, progress_file, results_file)
+        # a checkpoint left by a crash before this point is for file_index, now stale
+        clear_checkpoint(checkpoint_file)
+    metrics.count("tricks", partial.total_tricks())
+    metrics.close()
 
     # end runtime + memory
     elapsed = time.perf_counter() - start_time
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
+    monitor.stop()
 
     print(f"Finished file {file_index+1}. Next run will use file index {file_index+1}.")
-    print(f"Runtime: {elapsed:.2f} seconds | Peak memory: {peak / (1024*1024):.2f} MB")
+    print(f"Runtime: {elapsed:.2f} seconds | {monitor.describe()}")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score the next deck file.")
+    parser.add_argument("--all-matchups", action="store_true", help="Play every deck against all matchups")
+    parser.add_argument("--parallel", action="store_true", help="Score every pending file with a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --parallel (default: all cores)")
+    parser.add_argument("--store", metavar="PATH", help="Score every new file into a SQLite results store")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY, help="Decks scored between checkpoints")
+    parser.add_argument("--k", type=int, default=SEQ_LEN,
+                        help=f"Sequence length (default {SEQ_LEN}; other lengths get their own progress and results files)")
+    add_memory_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.max_memory and (args.store or args.parallel):
+        # workers read one whole file each; only the single-file run sizes its batches
+        parser.error("--max-memory only applies to single-file runs, not --parallel or --store")
+    if args.max_memory:
+        # this file's totals, the running ones and a checkpoint's copy must fit in the budget
+        totals = 3 * totals_bytes(len(get_matchups(args.k)))
+        if totals > budget_bytes(args.max_memory):
+            parser.error(f"--max-memory {args.max_memory:g} MB can't hold the totals for k={args.k}, "
+                         f"about {totals / (1024*1024):.0f} MB")
+    enable_from_args(args)
+
+    if args.store:
+        main_store(args.store, args.all_matchups, args.workers or 1, args.k)
+    elif args.parallel:
+        main_parallel(args.workers, args.all_matchups, args.k)
+    else:
+        main(args.all_matchups, args.checkpoint_every, args.memory_mode, args.max_memory, args.k)
@@ -0,0 +1,258 @@
+import os
+import time
+
+# shares config, progress and results files with the scalar bit engine
+from scoring_bit import (
+    DECK_SIZE_BITS,
+    SEQ_LEN,
+    commit_results,
+    get_matchups,
+    load_progress,
+    pending_deck_files,
+    read_decks_from_file,
+    state_files,
+)
+from aggregate import Aggregate, load_aggregate
+from memory import MEMORY_MODE, MemoryMonitor, add_memory_arguments
+
+# bits consumed per table lookup (1, 8 or 16) - bigger strides use more table memory
+STRIDE = 8
+STRIDES = (1, 8, 16)
+
+# game states: how many cards have been seen since the last trick (0 .. k-1,
+# where k-1 means "k-1 or more") plus the last of those cards, up to k-1 of them.
+# j cards seen with value v is state 2^j - 1 + v, so for k = 3:
+#   0      -> nothing seen
+#   1, 2   -> one card seen (black, red)
+#   3..6   -> two or more seen, last two cards are 00, 01, 10, 11
+def num_states(k=SEQ_LEN):
+    return (1 << k) - 1
+
+
+NUM_STATES = num_states()
+
+# compiled tables, cached per (p1_seq, p2_seq, width)
+_TABLES = {}
+
+
+def _step(state, bit, p1_bits, p2_bits, k=SEQ_LEN):
+    # advance the game by one card, return (next_state, winner) with winner 0/1/2
+    seen = (state + 1).bit_length() - 1
+    value = (((state + 1) - (1 << seen)) << 1) | bit
+    if seen < k - 1:
+        return (1 << (seen + 1)) - 1 + value, 0
+    if value == p1_bits:
+        return 0, 1
+    if value == p2_bits:
+        return 0, 2
+    return (1 << (k - 1)) - 1 + (value & ((1 << (k - 1)) - 1)), 0
+
+
+def compile_table(p1_seq, p2_seq, width):
+    """
+    Build the transition table for one matchup and input width.
+    Entry [state << width | chunk] is a tuple:
+      (next_state, first_winner, first_end,
+       p1_tricks, p2_tricks, p1_cards, p2_cards, last_end)
+    first_winner/first_end describe the first trick completed in the chunk
+    (its card count depends on where the previous trick ended); the other
+    counts cover the tricks after it, which fit entirely inside the chunk.
+    Tables wider than 8 bits are built by joining two narrower tables.
+    """
+    states = num_states(len(p1_seq))
+    if width > 8:
+        return _join_tables(compile_table(p1_seq, p2_seq, 8), 8,
+                            compile_table(p1_seq, p2_seq, width - 8), width - 8, states)
+
+    k = len(p1_seq)
+    p1_bits = int(p1_seq, 2)
+    p2_bits = int(p2_seq, 2)
+    table = []
+
+    for state in range(states):
+        for chunk in range(1 << width):
+            s = state
+            first_winner = first_end = last_end = 0
+            p1_tricks = p2_tricks = p1_cards = p2_cards = 0
+
+            for i in range(width):
+                bit = (chunk >> (width - 1 - i)) & 1
+                s, winner = _step(s, bit, p1_bits, p2_bits, k)
+                if not winner:
+                    continue
+                end = i + 1
+                if not first_winner:
+                    first_winner, first_end = winner, end
+                elif winner == 1:
+                    p1_tricks += 1
+                    p1_cards += end - last_end
+                else:
+                    p2_tricks += 1
+                    p2_cards += end - last_end
+                last_end = end
+
+            table.append((s, first_winner, first_end,
+                          p1_tricks, p2_tricks, p1_cards, p2_cards, last_end))
+    return table
+
+
+def _join_tables(high, high_width, low, low_width, states=NUM_STATES):
+    # table for (high_width + low_width)-bit chunks: feed the high bits, then the low bits
+    table = []
+    for state in range(states):
+        for hi in range(1 << high_width):
+            e1 = high[(state << high_width) | hi]
+            s1, fw1, fe1, t1, t2, c1, c2, le1 = e1
+            row = s1 << low_width
+            for lo in range(1 << low_width):
+                s2, fw2, fe2, u1, u2, d1, d2, le2 = low[row | lo]
+                if not fw2:
+                    table.append((s2,) + e1[1:])
+                elif not fw1:
+                    table.append((s2, fw2, high_width + fe2, u1, u2, d1, d2, high_width + le2))
+                elif fw2 == 1:
+                    table.append((s2, fw1, fe1, t1 + u1 + 1, t2 + u2,
+                                  c1 + d1 + high_width + fe2 - le1, c2 + d2, high_width + le2))
+                else:
+                    table.append((s2, fw1, fe1, t1 + u1, t2 + u2 + 1,
+                                  c1 + d1, c2 + d2 + high_width + fe2 - le1, high_width + le2))
+    return table
+
+
+def get_tables(p1_seq, p2_seq, stride=STRIDE):
+    """
+    Return (full_table, tail_table) for a matchup, compiling and caching them
+    on first use. The tail table handles the DECK_SIZE_BITS % stride leftover bits.
+    """
+    if stride not in STRIDES:
+        raise ValueError(f"stride must be one of {STRIDES}, got {stride}")
+    tail = DECK_SIZE_BITS % stride
+    tables = []
+    for width in (stride, tail):
+        key = (p1_seq, p2_seq, width)
+        if key not in _TABLES:
+            _TABLES[key] = compile_table(p1_seq, p2_seq, width) if width else None
+        tables.append(_TABLES[key])
+    return tables[0], tables[1]
+
+
+def clear_tables():
+    # drop every compiled table (frees memory after large strides)
+    _TABLES.clear()
+
+
+# play one deck
+def play_deck(deck_int, p1_seq, p2_seq, stride=STRIDE):
+    full_table, tail_table = get_tables(p1_seq, p2_seq, stride)
+    tail = DECK_SIZE_BITS % stride
+    mask = (1 << stride) - 1
+
+    state = 0
+    base = 0  # cards consumed by the chunks read so far
+    cut = 0   # position where the last trick ended
+    p1_tricks = p2_tricks = 0
+    p1_cards = p2_cards = 0
+
+    shift = DECK_SIZE_BITS - stride
+    while shift >= 0 or tail:
+        if shift >= 0:
+            entry = full_table[(state << stride) | ((deck_int >> shift) & mask)]
+            width = stride
+        else:
+            entry = tail_table[(state << tail) | (deck_int & ((1 << tail) - 1))]
+            width = tail
+            tail = 0
+
+        state, first_winner, first_end, t1, t2, c1, c2, last_end = entry
+        if first_winner:
+            if first_winner == 1:
+                p1_tricks += 1
+                p1_cards += base + first_end - cut
+            else:
+                p2_tricks += 1
+                p2_cards += base + first_end - cut
+            p1_tricks += t1
+            p2_tricks += t2
+            p1_cards += c1
+            p2_cards += c2
+            cut = base + last_end
+
+        base += width
+        shift -= stride
+
+    draws_tricks = 1 if p1_tricks == p2_tricks else 0
+    draws_cards = 1 if p1_cards == p2_cards else 0
+
+    return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
+
+
+def score_decks(decks, results, matchup_index=0, all_matchups=False, k=SEQ_LEN, stride=STRIDE):
+    # same contract as scoring_bit.score_decks; compiled tables stay cached,
+    # so later batches in the same process skip compiling
+    matchups = get_matchups(k)
+    add = results.add
+    for deck_int in decks:
+        if all_matchups:
+            for matchup_id, (p1_seq, p2_seq) in enumerate(matchups):
+                add(matchup_id, play_deck(deck_int, p1_seq, p2_seq, stride))
+        else:
+            p1_seq, p2_seq = matchups[matchup_index]
+            add(matchup_index, play_deck(deck_int, p1_seq, p2_seq, stride))
+            matchup_index = (matchup_index + 1) % len(matchups)
+    return matchup_index
+
+
+def score_file(deck_file, matchup_index=0, all_matchups=False, k=SEQ_LEN, stride=STRIDE):
+    # partial Aggregate for one file, same contract as scoring_bit.score_file
+    results = Aggregate(get_matchups(k))
+    score_decks(read_decks_from_file(deck_file), results, matchup_index, all_matchups, k, stride)
+    return results
+
+
+# main loop
+def main(stride=STRIDE, k=SEQ_LEN, memory_mode=MEMORY_MODE):
+    matchups = get_matchups(k)
+    progress_file, results_file, _ = state_files(k)
+    progress = load_progress(len(matchups), progress_file, results_file)
+    matchup_index = progress["matchup_index"]
+    file_index = progress["file_index"]
+
+    deck_files = pending_deck_files(progress)
+    if not deck_files:
+        print(f"No more deck files to process at index {file_index}. Done!")
+        return
+    deck_file = deck_files[0]
+
+    # start runtime + memory
+    start_time = time.perf_counter()
+    monitor = MemoryMonitor(memory_mode).start()
+
+    decks = read_decks_from_file(deck_file)
+    print(f"Processing file: {deck_file} with {len(decks)} decks (stride {stride})...")
+
+    results = load_aggregate(results_file, matchups)
+    matchup_index = score_decks(decks, results, matchup_index, k=k, stride=stride)
+
+    progress["matchup_index"] = matchup_index
+    progress["file_index"] = file_index + 1
+    progress["last_file"] = os.path.basename(deck_file)
+    commit_results(results, progress, progress_file, results_file)
+
+    # end runtime + memory
+    elapsed = time.perf_counter() - start_time
+    monitor.stop()
+
+    print(f"Finished file {file_index+1}. Next run will use file index {file_index+1}.")
+    print(f"Runtime: {elapsed:.2f} seconds | {monitor.describe()}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score the next deck file with the table-driven engine.")
+    parser.add_argument("--stride", type=int, default=STRIDE, choices=STRIDES, help="Bits consumed per table lookup")
+    parser.add_argument("--k", type=int, default=SEQ_LEN,
+                        help=f"Sequence length (default {SEQ_LEN}; other lengths get their own progress and results files)")
+    add_memory_arguments(parser, max_memory=False)
+    args = parser.parse_args()
+
+    main(args.stride, args.k, args.memory_mode)
@@ -0,0 +1,150 @@
+from chunk_files import deck_count, list_deck_files
+
+# config and helpers come from the string engine, which (unlike scoring_bit and
+# deck_io) needs nothing outside the standard library - this engine must run on
+# workers without NumPy
+from scoring import (
+    BYTES_PER_DECK,
+    DECKS_DIR,
+    DECK_SIZE_BITS,
+    MATCHUPS,
+    SEQ_LEN,
+    get_matchups,
+)
+from aggregate import Tally
+
+FULL_MASK = (1 << DECK_SIZE_BITS) - 1
+
+MATCHUP_BITS = [(int(p1, 2), int(p2, 2)) for p1, p2 in MATCHUPS]
+_MATCHUP_BITS = {SEQ_LEN: MATCHUP_BITS}
+
+
+def matchup_bits(k=SEQ_LEN):
+    # MATCHUP_BITS for k-card sequences, built once per k
+    if k not in _MATCHUP_BITS:
+        _MATCHUP_BITS[k] = [(int(p1, 2), int(p2, 2)) for p1, p2 in get_matchups(k)]
+    return _MATCHUP_BITS[k]
+
+
+def read_decks_from_file(filename):
+    # 52-bit deck ints from a chunk file (plain reads, no NumPy)
+    deck_count(filename)
+    with open(filename, "rb") as f:
+        data = f.read()
+    return [int.from_bytes(data[i:i + BYTES_PER_DECK], "big") for i in range(0, len(data), BYTES_PER_DECK)]
+
+
+# match masks
+def window_masks(deck_int, k=SEQ_LEN):
+    """
+    Bit p of masks[w] is set when the k-card window whose last card is bit p
+    (counting from the end of the deck) reads w. The masks are grown one card
+    at a time (2, 4, ... 2^k of them), each a shift and an AND over the whole
+    deck instead of one window at a time.
+    """
+    cards = (~deck_int & FULL_MASK, deck_int)  # by card color
+    masks = [cards[0] >> (k - 1), cards[1] >> (k - 1)]
+    for j in range(k - 2, -1, -1):
+        black, red = cards[0] >> j, cards[1] >> j
+        masks = [m & c for m in masks for c in (black, red)]
+    return masks
+
+
+def match_mask(deck_int, bits, k=SEQ_LEN):
+    # window_masks(deck_int, k)[bits] without building the others
+    inverted = ~deck_int & FULL_MASK
+    mask = FULL_MASK
+    for j in range(k):
+        mask &= (deck_int if (bits >> j) & 1 else inverted) >> j
+    return mask
+
+
+def resolve_masks(p1_mask, p2_mask, n=DECK_SIZE_BITS, k=SEQ_LEN):
+    """
+    Replay one game from the two players' match masks. The remaining deck is the
+    low n bits, so the next trick is the highest set bit of either mask whose
+    window fits inside it (bit position <= n - k); that trick takes n - p cards
+    and leaves p. One step per trick instead of one per window.
+    """
+    either = p1_mask | p2_mask
+    p1_tricks = p2_tricks = 0
+    p1_cards = p2_cards = 0
+
+    while n >= k:
+        hits = either & ((1 << (n - k + 1)) - 1)
+        if not hits:
+            break
+        p = hits.bit_length() - 1
+        if (p1_mask >> p) & 1:
+            p1_tricks += 1
+            p1_cards += n - p
+        else:
+            p2_tricks += 1
+            p2_cards += n - p
+        n = p
+
+    draws_tricks = 1 if p1_tricks == p2_tricks else 0
+    draws_cards = 1 if p1_cards == p2_cards else 0
+
+    return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
+
+
+# play one deck
+def play_deck(deck_int, p1_seq, p2_seq):
+    # same result as scoring_bit.play_deck
+    k = len(p1_seq)
+    return resolve_masks(match_mask(deck_int, int(p1_seq, 2), k), match_mask(deck_int, int(p2_seq, 2), k), k=k)
+
+
+def play_deck_all_matchups(deck_int, k=SEQ_LEN):
+    # one result tuple per matchup of k-card sequences, sharing one set of window masks
+    masks = window_masks(deck_int, k)
+    return [resolve_masks(masks[p1_bits], masks[p2_bits], k=k) for p1_bits, p2_bits in matchup_bits(k)]
+
+
+def score_decks(decks, results, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # same contract as scoring_bit.score_decks (results is an Aggregate or a Tally)
+    add = results.add
+    if all_matchups:
+        for deck_int in decks:
+            for matchup_id, stats in enumerate(play_deck_all_matchups(deck_int, k)):
+                add(matchup_id, stats)
+    else:
+        bits = matchup_bits(k)
+        for deck_int in decks:
+            p1_bits, p2_bits = bits[matchup_index]
+            add(matchup_index, resolve_masks(match_mask(deck_int, p1_bits, k), match_mask(deck_int, p2_bits, k), k=k))
+            matchup_index = (matchup_index + 1) % len(bits)
+    return matchup_index
+
+
+def score_file(deck_file, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # partial results for one file as a Tally (no NumPy); the pipeline's
+    # as_aggregate turns it into an Aggregate
+    results = Tally(get_matchups(k))
+    score_decks(read_decks_from_file(deck_file), results, matchup_index, all_matchups, k)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Score deck files with the match-mask engine (no NumPy needed).")
+    parser.add_argument("--files", type=int, default=1, help="Number of deck files to score")
+    parser.add_argument("--all-matchups", action="store_true", help="Play every deck against all matchups")
+    parser.add_argument("--k", type=int, default=SEQ_LEN, help=f"Sequence length (default {SEQ_LEN})")
+    args = parser.parse_args()
+
+    deck_files = list_deck_files(DECKS_DIR)
+    start_time = time.perf_counter()
+    results = Tally(get_matchups(args.k))
+    matchup_index = num_decks = 0
+    for deck_file in deck_files[:args.files]:
+        decks = read_decks_from_file(deck_file)
+        matchup_index = score_decks(decks, results, matchup_index, args.all_matchups, args.k)
+        num_decks += len(decks)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Scored {num_decks:,} decks from {min(args.files, len(deck_files))} files | "
+          f"Runtime: {elapsed:.2f} seconds | {num_decks / elapsed if elapsed > 0 else 0:,.0f} decks/sec")
@@ -0,0 +1,195 @@
+import sys
+
+# shares config with the scalar bit engine
+from scoring_bit import (
+    DECK_SIZE_BITS,
+    SEQ_LEN,
+    get_matchups,
+    read_decks_from_file,
+)
+from aggregate import Aggregate
+
+# suffixes of up to MEMO_BITS cards are cached; a dense table for one matchup and
+# suffix length n holds 2^n slots (8 bytes each), allocated on first use
+MEMO_BITS = 12
+MEMO_MAX_BYTES = 256 * 1024 * 1024
+SLOT_BYTES = 8
+
+
+class SuffixCache:
+    """
+    Outcome (p1_tricks, p2_tricks, p1_cards, p2_cards) of playing out the last n
+    cards of a deck, per matchup, for n <= max_bits. Tables are only allocated
+    while the total stays under max_bytes; past that, new lengths just miss.
+    """
+
+    def __init__(self, max_bits=MEMO_BITS, max_bytes=MEMO_MAX_BYTES):
+        self.max_bits = max_bits
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._tables = {}    # (p1_seq, p2_seq) -> [table or None per suffix length]
+        self._outcomes = {}  # one shared tuple per distinct outcome
+
+    def tables(self, p1_seq, p2_seq):
+        # per-length table list for a matchup (entries are None until allocated)
+        key = (p1_seq, p2_seq)
+        if key not in self._tables:
+            self._tables[key] = [None] * (self.max_bits + 1)
+        return self._tables[key]
+
+    def allocate(self, tables, n):
+        # allocate the table for suffix length n if the budget allows, else None
+        size = (1 << n) * SLOT_BYTES
+        if self.bytes + size > self.max_bytes:
+            return None
+        tables[n] = [None] * (1 << n)
+        self.bytes += size
+        return tables[n]
+
+    def intern(self, outcome):
+        return self._outcomes.setdefault(outcome, outcome)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tables": sum(t is not None for tables in self._tables.values() for t in tables),
+            "bytes": self.bytes + sys.getsizeof(self._outcomes),
+        }
+
+    def clear(self):
+        self.__init__(self.max_bits, self.max_bytes)
+
+
+# shared cache used when play_deck isn't given one
+_CACHE = SuffixCache()
+
+
+def get_cache():
+    return _CACHE
+
+
+def configure_cache(max_bits=MEMO_BITS, max_bytes=MEMO_MAX_BYTES):
+    # replace the shared cache (drops everything cached so far)
+    global _CACHE
+    _CACHE = SuffixCache(max_bits, max_bytes)
+    return _CACHE
+
+
+# play one deck
+def play_deck(deck_int, p1_seq, p2_seq, cache=None):
+    """
+    Same result as scoring_bit.play_deck. The first time a trick leaves n <= max_bits
+    cards, the rest of the game is looked up in the suffix cache (on a miss it is
+    played out as usual and stored).
+    """
+    cache = cache or _CACHE
+    n = DECK_SIZE_BITS
+    p1_bits = int(p1_seq, 2)
+    p2_bits = int(p2_seq, 2)
+    k = len(p1_seq)
+    mask = (1 << k) - 1
+    p1_tricks = p2_tricks = 0
+    p1_cards = p2_cards = 0
+    miss = None  # (table, suffix, totals so far) for the suffix to store at the end
+    tail = cache.max_bits
+
+    while n >= k:
+        # one lookup per game: the first time a trick leaves a short enough suffix
+        if n <= tail:
+            tail = 0
+            tables = cache.tables(p1_seq, p2_seq)
+            table = tables[n] or cache.allocate(tables, n)
+            if table is not None:
+                outcome = table[deck_int]
+                if outcome is not None:
+                    cache.hits += 1
+                    p1_tricks += outcome[0]
+                    p2_tricks += outcome[1]
+                    p1_cards += outcome[2]
+                    p2_cards += outcome[3]
+                    break
+                miss = (table, deck_int, p1_tricks, p2_tricks, p1_cards, p2_cards)
+
+        # scan the remaining n cards for the next trick
+        for i in range(n - k + 1):
+            window = (deck_int >> (n - k - i)) & mask
+            if window == p1_bits:
+                p1_tricks += 1
+                p1_cards += i + k
+                break
+            if window == p2_bits:
+                p2_tricks += 1
+                p2_cards += i + k
+                break
+        else:
+            break
+        n -= i + k
+        deck_int &= (1 << n) - 1
+
+    draws_tricks = 1 if p1_tricks == p2_tricks else 0
+    draws_cards = 1 if p1_cards == p2_cards else 0
+
+    # the suffix that missed now knows how its game ended
+    if miss:
+        cache.misses += 1
+        table, suffix, t1, t2, c1, c2 = miss
+        table[suffix] = cache.intern((p1_tricks - t1, p2_tricks - t2, p1_cards - c1, p2_cards - c2))
+
+    return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
+
+
+def score_decks(decks, results, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # same contract as scoring_bit.score_decks
+    matchups = get_matchups(k)
+    add = results.add
+    for deck_int in decks:
+        if all_matchups:
+            for matchup_id, (p1_seq, p2_seq) in enumerate(matchups):
+                add(matchup_id, play_deck(deck_int, p1_seq, p2_seq))
+        else:
+            p1_seq, p2_seq = matchups[matchup_index]
+            add(matchup_index, play_deck(deck_int, p1_seq, p2_seq))
+            matchup_index = (matchup_index + 1) % len(matchups)
+    return matchup_index
+
+
+def score_file(deck_file, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # partial Aggregate for one file, same contract as scoring_bit.score_file
+    results = Aggregate(get_matchups(k))
+    score_decks(read_decks_from_file(deck_file), results, matchup_index, all_matchups, k)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from deck_io import list_deck_files, read_decks_array
+    from scoring_bit import DECKS_DIR
+
+    parser = argparse.ArgumentParser(description="Score deck files with the suffix-memo engine and report cache stats.")
+    parser.add_argument("--files", type=int, default=1, help="Number of deck files to score")
+    parser.add_argument("--memo-bits", type=int, default=MEMO_BITS, help="Longest suffix cached")
+    parser.add_argument("--memo-mb", type=float, default=MEMO_MAX_BYTES / (1024 * 1024), help="Cache memory limit in MB")
+    parser.add_argument("--all-matchups", action="store_true", help="Play every deck against all matchups")
+    parser.add_argument("--k", type=int, default=SEQ_LEN, help=f"Sequence length (default {SEQ_LEN})")
+    args = parser.parse_args()
+
+    cache = configure_cache(args.memo_bits, int(args.memo_mb * 1024 * 1024))
+    start_time = time.perf_counter()
+    results = Aggregate(get_matchups(args.k))
+    matchup_index = 0
+    for deck_file in list_deck_files(DECKS_DIR)[:args.files]:
+        matchup_index = score_decks(read_decks_array(deck_file).tolist(), results, matchup_index,
+                                    args.all_matchups, args.k)
+    elapsed = time.perf_counter() - start_time
+
+    stats = cache.stats()
+    print(f"Runtime: {elapsed:.2f} seconds | hit rate {stats['hit_rate']:.1%} "
+          f"({stats['hits']:,} hits, {stats['misses']:,} misses) | "
+          f"{stats['tables']} tables, {stats['bytes'] / (1024*1024):.1f} MB")
@@ -0,0 +1,203 @@
+import os
+import time
+
+import numpy as np
+
+# shares config, progress and results files with the scalar bit engine
+from scoring_bit import (
+    DECK_SIZE_BITS,
+    MATCHUPS,
+    SEQ_LEN,
+    commit_results,
+    get_matchups,
+    load_progress,
+    pending_deck_files,
+    state_files,
+)
+from aggregate import Aggregate, load_aggregate
+from deck_io import map_deck_records, decode_records, read_decks_array
+from memory import MEMORY_MODE, MemoryMonitor, add_memory_arguments
+from metrics import add_metrics_arguments, enable_from_args, get_metrics
+
+# order of the per-deck stat arrays returned by play_decks (same as play_deck)
+STAT_NAMES = [
+    "p1_tricks", "p2_tricks", "draws_tricks",
+    "p1_cards", "p2_cards", "draws_cards",
+]
+
+# all-matchups mode plays at most this many (deck, matchup) games per batch, so the
+# per-game arrays stay bounded however many matchups there are
+ALL_MATCHUPS_BLOCK = 1 << 20
+
+# matchups as integer codes so a whole chunk can be indexed at once
+MATCHUP_P1 = np.array([int(p1, 2) for p1, _ in MATCHUPS], dtype=np.uint64)
+MATCHUP_P2 = np.array([int(p2, 2) for _, p2 in MATCHUPS], dtype=np.uint64)
+_MATCHUP_CODES = {SEQ_LEN: (MATCHUP_P1, MATCHUP_P2)}
+
+
+def matchup_codes(k=SEQ_LEN):
+    # (MATCHUP_P1, MATCHUP_P2) for k-card sequences, built once per k
+    if k not in _MATCHUP_CODES:
+        matchups = get_matchups(k)
+        _MATCHUP_CODES[k] = (np.array([int(p1, 2) for p1, _ in matchups], dtype=np.uint64),
+                             np.array([int(p2, 2) for _, p2 in matchups], dtype=np.uint64))
+    return _MATCHUP_CODES[k]
+
+
+def _pattern_codes(seq):
+    # accept "011", 3 or an array of per-deck codes
+    if isinstance(seq, str):
+        seq = int(seq, 2)
+    return np.asarray(seq, dtype=np.uint64)
+
+
+# play a whole batch of decks
+def play_decks(decks, p1, p2, k=None):
+    """
+    Vectorized play_deck: score every deck in `decks` (uint64 array) at once.
+    p1/p2 may be sequence strings or per-deck arrays of integer codes; k is the
+    sequence length (taken from p1 if it is a string, else SEQ_LEN).
+    Returns six int64 arrays in the same order as scoring_bit.play_deck.
+    """
+    if k is None:
+        k = len(p1) if isinstance(p1, str) else SEQ_LEN
+    decks = np.asarray(decks, dtype=np.uint64)
+    p1_bits = _pattern_codes(p1)
+    p2_bits = _pattern_codes(p2)
+
+    num = len(decks)
+    cut = np.zeros(num, dtype=np.int64)  # cards already taken by tricks
+    p1_tricks = np.zeros(num, dtype=np.int64)
+    p2_tricks = np.zeros(num, dtype=np.int64)
+    p1_cards = np.zeros(num, dtype=np.int64)
+    p2_cards = np.zeros(num, dtype=np.int64)
+
+    # slide one window position across every deck per iteration;
+    # a window only counts if it starts at or after the last trick
+    for i in range(DECK_SIZE_BITS - k + 1):
+        window = (decks >> np.uint64(DECK_SIZE_BITS - k - i)) & np.uint64((1 << k) - 1)
+        live = cut <= i
+        hit1 = live & (window == p1_bits)
+        hit2 = live & (window == p2_bits) & ~hit1
+        cards = i + k - cut
+
+        p1_tricks += hit1
+        p2_tricks += hit2
+        p1_cards += np.where(hit1, cards, 0)
+        p2_cards += np.where(hit2, cards, 0)
+        cut = np.where(hit1 | hit2, i + k, cut)
+
+    draws_tricks = (p1_tricks == p2_tricks).astype(np.int64)
+    draws_cards = (p1_cards == p2_cards).astype(np.int64)
+
+    return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
+
+
+def accumulate(results, matchup_ids, stats, matchups=MATCHUPS):
+    # add per-deck stats into an Aggregate (or a results dict over matchups), grouped by matchup id
+    if isinstance(results, Aggregate):
+        results.add_batch(matchup_ids, stats)
+    else:
+        batch = Aggregate(matchups)
+        batch.add_batch(matchup_ids, stats)
+        batch.to_results(results)
+
+
+def score_decks(decks, results, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    """
+    Score a uint64 deck array into results (an Aggregate, or a results dict), same
+    contract as scoring_bit.score_decks: round-robin matchups from matchup_index
+    (or all matchups per deck). Returns the matchup_index for the next deck.
+    All-matchups mode plays a block of matchups at a time (about ALL_MATCHUPS_BLOCK
+    games); for large k, scoring_pairs scores every pair far faster.
+    """
+    matchups = get_matchups(k)
+    p1_codes, p2_codes = matchup_codes(k)
+    metrics = get_metrics()
+    if all_matchups:
+        # every deck against every matchup, grouped by matchup, a block of matchups per batch
+        per_block = max(1, ALL_MATCHUPS_BLOCK // max(len(decks), 1))
+        for start in range(0, len(matchups), per_block):
+            block_ids = np.arange(start, min(start + per_block, len(matchups)))
+            matchup_ids = np.repeat(block_ids, len(decks))
+            with metrics.stage("play"):
+                stats = play_decks(np.tile(decks, len(block_ids)), p1_codes[matchup_ids], p2_codes[matchup_ids], k)
+            with metrics.stage("aggregate"):
+                accumulate(results, matchup_ids, stats, matchups)
+        return matchup_index
+
+    matchup_ids = (matchup_index + np.arange(len(decks))) % len(matchups)
+    with metrics.stage("play"):
+        stats = play_decks(decks, p1_codes[matchup_ids], p2_codes[matchup_ids], k)
+    with metrics.stage("aggregate"):
+        accumulate(results, matchup_ids, stats, matchups)
+    return (matchup_index + len(decks)) % len(matchups)
+
+
+def score_file(deck_file, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # partial Aggregate for one file, same contract as scoring_bit.score_file
+    results = Aggregate(get_matchups(k))
+    score_decks(read_decks_array(deck_file), results, matchup_index, all_matchups, k)
+    return results
+
+
+# main loop
+def main(k=SEQ_LEN, memory_mode=MEMORY_MODE):
+    matchups = get_matchups(k)
+    progress_file, results_file, _ = state_files(k)
+    progress = load_progress(len(matchups), progress_file, results_file)
+    matchup_index = progress["matchup_index"]
+    file_index = progress["file_index"]
+
+    deck_files = pending_deck_files(progress)
+    if not deck_files:
+        print(f"No more deck files to process at index {file_index}. Done!")
+        return
+    deck_file = deck_files[0]
+
+    # start runtime + memory
+    start_time = time.perf_counter()
+    monitor = MemoryMonitor(memory_mode).start()
+    metrics = get_metrics()
+
+    with metrics.stage("read"):
+        records = np.array(map_deck_records(deck_file))
+    with metrics.stage("decode"):
+        decks = decode_records(records)
+    metrics.count("bytes", records.nbytes)
+    metrics.expect("decks", len(decks))
+    print(f"Processing file: {deck_file} with {len(decks)} decks...")
+
+    # same round-robin matchup assignment as the scalar engine
+    partial = Aggregate(matchups)
+    matchup_index = score_decks(decks, partial, matchup_index, k=k)
+    metrics.count("decks", len(decks))
+    metrics.count("tricks", partial.total_tricks())
+
+    # running totals live in results_2.npz; results_2.csv is exported alongside
+    with metrics.stage("save"):
+        progress["matchup_index"] = matchup_index
+        progress["file_index"] = file_index + 1
+        progress["last_file"] = os.path.basename(deck_file)
+        commit_results(load_aggregate(results_file, matchups).merge(partial), progress, progress_file, results_file)
+    metrics.close()
+
+    # end runtime + memory
+    elapsed = time.perf_counter() - start_time
+    monitor.stop()
+
+    print(f"Finished file {file_index+1}. Next run will use file index {file_index+1}.")
+    print(f"Runtime: {elapsed:.2f} seconds | {monitor.describe()}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score the next deck file with the vectorized engine.")
+    parser.add_argument("--k", type=int, default=SEQ_LEN,
+                        help=f"Sequence length (default {SEQ_LEN}; other lengths get their own progress and results files)")
+    add_memory_arguments(parser, max_memory=False)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+
+    main(args.k, args.memory_mode)
@@ -0,0 +1,206 @@
+import numpy as np
+
+from scoring_bit import DECKS_DIR, DECK_SIZE_BITS, SEQ_LEN, make_sequences, save_results
+from deck_io import list_deck_files, read_decks_array
+
+# config
+PAIRS_BATCH = 1024          # decks per batch; the occurrence table takes batch * 2^k * 53 bytes
+MAX_SEQ_LEN = 10            # the totals array holds 4^k * 7 int64s (58 MB at k = 10)
+PAIRS_RESULTS_FILE = "results_k{k}.csv"
+
+# last axis of the totals array (the results.csv columns)
+STAT_NAMES = [
+    "p1_tricks", "p2_tricks", "draws_tricks",
+    "p1_cards", "p2_cards", "draws_cards",
+    "runs",
+]
+P1_TRICKS, P2_TRICKS, DRAWS_TRICKS, P1_CARDS, P2_CARDS, DRAWS_CARDS, RUNS = range(len(STAT_NAMES))
+
+
+def _check_seq_len(k):
+    if not 1 <= k <= MAX_SEQ_LEN:
+        raise ValueError(f"sequence length must be between 1 and {MAX_SEQ_LEN}, got {k}")
+
+
+# occurrences
+def window_codes(decks, k=SEQ_LEN):
+    # (num_decks, 53 - k) array: the k-card window starting at each position, in play order
+    decks = np.asarray(decks, dtype=np.uint64)
+    shifts = np.arange(DECK_SIZE_BITS - k, -1, -1, dtype=np.uint64)
+    return ((decks[:, None] >> shifts) & np.uint64((1 << k) - 1)).astype(np.intp)
+
+
+def next_occurrence(windows, k=SEQ_LEN):
+    """
+    (num_decks, 2^k, DECK_SIZE_BITS + 1) int8 table: [d, w, cut] is where the first
+    window w at or after position cut starts in deck d, or DECK_SIZE_BITS if none.
+    A game is then a handful of lookups, one per trick.
+    """
+    num_decks, positions = windows.shape
+    table = np.full((num_decks, 1 << k, DECK_SIZE_BITS + 1), DECK_SIZE_BITS, dtype=np.int8)
+    rows = np.arange(num_decks)
+    for i in range(positions - 1, -1, -1):
+        table[:, :, i] = table[:, :, i + 1]
+        table[rows, windows[:, i], i] = i
+    return table
+
+
+def play_games(table, deck, p1, p2=None, k=SEQ_LEN):
+    """
+    Play many games at once from a next_occurrence table: game j is deck[j] with
+    sequences p1[j] vs p2[j] (p2=None plays p1 alone, for a rival that never shows up).
+    Returns int64 arrays (p1_tricks, p2_tricks, p1_cards, p2_cards).
+    """
+    n = DECK_SIZE_BITS
+    flat = table.reshape(-1)
+    # flat offsets of each game's rows in the table (cut is added per lookup)
+    row1 = (deck * table.shape[1] + p1) * (n + 1)
+    row2 = (deck * table.shape[1] + p2) * (n + 1) if p2 is not None else None
+    cut = np.zeros(len(deck), dtype=np.intp)
+    p1_tricks, p2_tricks, p1_cards, p2_cards = (np.zeros(len(deck), dtype=np.int64) for _ in range(4))
+    live = np.arange(len(deck))  # games that may still have tricks
+
+    while len(live):
+        next1 = flat[row1 + cut].astype(np.intp)
+        next2 = flat[row2 + cut].astype(np.intp) if row2 is not None else np.full_like(next1, n)
+        won1 = next1 < next2
+        won2 = next2 < next1
+        cards = np.minimum(next1, next2) + k - cut
+
+        p1_tricks[live] += won1
+        p2_tricks[live] += won2
+        p1_cards[live] += np.where(won1, cards, 0)
+        p2_cards[live] += np.where(won2, cards, 0)
+
+        # keep only the games that just took a trick
+        more = won1 | won2
+        live = live[more]
+        row1 = row1[more]
+        row2 = row2[more] if row2 is not None else None
+        cut = cut[more] + cards[more]
+
+    return p1_tricks, p2_tricks, p1_cards, p2_cards
+
+
+def _present_pairs(present):
+    # (deck, p1, p2) index arrays for every ordered pair of different sequences
+    # that both occur in the same deck
+    deck, seq = np.nonzero(present)
+    sizes = present.sum(axis=1)
+    reps = sizes[deck]
+    first = np.repeat(np.arange(len(deck)), reps)
+    group_start = np.repeat(np.cumsum(sizes) - sizes, sizes)[first]
+    offset = np.arange(len(first)) - np.repeat(np.cumsum(reps) - reps, reps)
+    second = group_start + offset
+    keep = first != second
+    return deck[first[keep]], seq[first[keep]], seq[second[keep]]
+
+
+# all pairs
+def score_all_pairs(decks, k=SEQ_LEN, totals=None):
+    """
+    Play every deck against every ordered pair of k-card sequences and add the
+    results into totals, a (2^k, 2^k, len(STAT_NAMES)) int64 array indexed by the
+    sequences' integer codes (created if None; the diagonal stays zero).
+
+    A deck of 52 cards holds at most 53 - k distinct windows, so at k = 8 most of
+    the 65,280 matchups have at least one sequence that never appears. Those are
+    settled in bulk: a game where neither sequence appears is a 0-0 draw, and one
+    where only p1's appears is p1 playing alone - so, with A[d, s] = 1 when s is
+    absent from deck d and T[d, s] the solo trick count, p1_tricks gains T^T A,
+    p2_tricks gains A^T T and both draw counts gain A^T A (one matrix product per
+    batch). Only pairs that both appear in a deck are played out, all at once.
+    """
+    _check_seq_len(k)
+    size = 1 << k
+    if totals is None:
+        totals = np.zeros((size, size, len(STAT_NAMES)), dtype=np.int64)
+    decks = np.asarray(decks, dtype=np.uint64)
+    if len(decks) == 0:
+        return totals
+
+    table = next_occurrence(window_codes(decks, k), k)
+    present = table[:, :, 0] < DECK_SIZE_BITS
+
+    # each sequence that appears, played alone
+    deck, seq = np.nonzero(present)
+    solo_tricks, _, solo_cards, _ = play_games(table, deck, seq, k=k)
+    tricks = np.zeros(present.shape)
+    cards = np.zeros(present.shape)
+    tricks[deck, seq] = solo_tricks
+    cards[deck, seq] = solo_cards
+
+    # float matrix products (BLAS) are exact here: every entry is below 2^53
+    absent = (~present).astype(np.float64)
+    both_absent = np.rint(absent.T @ absent).astype(np.int64)
+    totals[:, :, DRAWS_TRICKS] += both_absent
+    totals[:, :, DRAWS_CARDS] += both_absent
+    totals[:, :, P1_TRICKS] += np.rint(tricks.T @ absent).astype(np.int64)
+    totals[:, :, P1_CARDS] += np.rint(cards.T @ absent).astype(np.int64)
+    totals[:, :, P2_TRICKS] += np.rint(absent.T @ tricks).astype(np.int64)
+    totals[:, :, P2_CARDS] += np.rint(absent.T @ cards).astype(np.int64)
+
+    # pairs that both appear, played out
+    deck, p1, p2 = _present_pairs(present)
+    t1, t2, c1, c2 = play_games(table, deck, p1, p2, k)
+    cell = p1 * size + p2
+    for stat, values in ((P1_TRICKS, t1), (P2_TRICKS, t2), (DRAWS_TRICKS, t1 == t2),
+                         (P1_CARDS, c1), (P2_CARDS, c2), (DRAWS_CARDS, c1 == c2)):
+        totals[:, :, stat] += np.bincount(cell, weights=values, minlength=size * size).astype(np.int64).reshape(size, size)
+
+    totals[:, :, RUNS] += len(decks)
+    np.einsum("iis->is", totals)[:] = 0
+    return totals
+
+
+def pairs_to_results(totals, results=None):
+    # totals array -> results dict keyed by (p1_seq, p2_seq), added into results if given
+    results = {} if results is None else results
+    sequences = make_sequences(totals.shape[0].bit_length() - 1)
+    for i, p1_seq in enumerate(sequences):
+        for j, p2_seq in enumerate(sequences):
+            if i == j or not totals[i, j, RUNS]:
+                continue
+            key = (p1_seq, p2_seq)
+            if key not in results:
+                results[key] = dict.fromkeys(STAT_NAMES, 0)
+            for name, value in zip(STAT_NAMES, totals[i, j].tolist()):
+                results[key][name] += value
+    return results
+
+
+def score_file(deck_file, k=SEQ_LEN, batch_size=PAIRS_BATCH, totals=None):
+    # all-pairs totals for one deck file, scored batch_size decks at a time
+    decks = read_decks_array(deck_file)
+    for start in range(0, len(decks), batch_size):
+        totals = score_all_pairs(decks[start:start + batch_size], k, totals)
+    return totals
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Play every deck against every pair of k-card sequences.")
+    parser.add_argument("--k", type=int, default=SEQ_LEN, help=f"Sequence length (1-{MAX_SEQ_LEN})")
+    parser.add_argument("--files", type=int, default=1, help="Number of deck files to score")
+    parser.add_argument("--batch-size", type=int, default=PAIRS_BATCH, help="Decks per batch")
+    parser.add_argument("--out", help=f"Results CSV (default {PAIRS_RESULTS_FILE.format(k='K')})")
+    args = parser.parse_args()
+    _check_seq_len(args.k)
+
+    start_time = time.perf_counter()
+    totals = None
+    deck_files = list_deck_files(DECKS_DIR)[:args.files]
+    for deck_file in deck_files:
+        totals = score_file(deck_file, args.k, args.batch_size, totals)
+        print(f"Scored {deck_file}")
+    if totals is None:
+        print(f"No deck files in {DECKS_DIR}")
+    else:
+        out = args.out or PAIRS_RESULTS_FILE.format(k=args.k)
+        save_results(pairs_to_results(totals), out)
+        elapsed = time.perf_counter() - start_time
+        num_decks = int(totals[0, 1, RUNS])
+        print(f"{num_decks:,} decks x {(1 << args.k) * ((1 << args.k) - 1):,} matchups in {elapsed:.2f} seconds "
+              f"({num_decks / elapsed:,.0f} decks/sec) | results saved to {out}")
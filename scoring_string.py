@@ -1,10 +1,11 @@
 import csv
 import json
-import os
 import time
 import tracemalloc
 from pathlib import Path
 
+from chunk_files import deck_count, list_deck_files
+
 # folder with deck files
 DECKS_DIR = "decks_chunks"
 # where results are saved
@@ -17,35 +18,61 @@ DECK_SIZE_BITS = 52
 # number of bytes needed to hold one deck
 BYTES_PER_DECK = (DECK_SIZE_BITS + 7) // 8
 
-# possible 3-bit sequences
-SEQUENCES = [
-    "000", "001", "010", "011",
-    "100", "101", "110", "111",
-]
+# length of each sequence
+SEQ_LEN = 3
+
+# possible sequences of SEQ_LEN bits
+SEQUENCES = [format(i, f"0{SEQ_LEN}b") for i in range(1 << SEQ_LEN)]
 
 # all possible matchups (exclude identical)
 MATCHUPS = [(p1, p2) for i, p1 in enumerate(SEQUENCES) for j, p2 in enumerate(SEQUENCES) if i != j]
 
 
-def load_progress():
-    # load progress if file exists, else start fresh
-    if Path(PROGRESS_FILE).exists():
-        with open(PROGRESS_FILE, "r") as f:
-            return json.load(f)
-    return {"matchup_index": 0, "file_index": 0}
+def get_matchups(k=SEQ_LEN):
+    # all matchups of k-card sequences (MATCHUPS for the default length)
+    if k == SEQ_LEN:
+        return MATCHUPS
+    if k < 1:
+        raise ValueError(f"sequence length must be at least 1, got {k}")
+    sequences = [format(i, f"0{k}b") for i in range(1 << k)]
+    return [(p1, p2) for i, p1 in enumerate(sequences) for j, p2 in enumerate(sequences) if i != j]
+
+
+def state_files(k=SEQ_LEN):
+    # progress and results files - other sequence lengths get their own
+    if k == SEQ_LEN:
+        return PROGRESS_FILE, RESULTS_FILE
+    return f"progress_k{k}.json", f"results_k{k}.csv"
 
 
-def save_progress(progress):
+def load_progress(path=None, all_matchups=False):
+    # load progress if file exists, else start fresh
+    path = path or PROGRESS_FILE
+    progress = {"matchup_index": 0, "file_index": 0}
+    if Path(path).exists():
+        with open(path, "r") as f:
+            progress = json.load(f)
+    # this engine only plays round-robin, so it can't continue all-matchups totals
+    saved_mode = progress.get("all_matchups", all_matchups)
+    if progress["file_index"] and saved_mode != all_matchups:
+        raise ValueError(f"{path} holds {'all-matchups' if saved_mode else 'round-robin'} results; "
+                         f"can't add {'all-matchups' if all_matchups else 'round-robin'} ones")
+    progress["all_matchups"] = all_matchups
+    return progress
+
+
+def save_progress(progress, path=None):
     # save progress to file
-    with open(PROGRESS_FILE, "w") as f:
+    with open(path or PROGRESS_FILE, "w") as f:
         json.dump(progress, f)
 
 
-def load_results():
+def load_results(path=None):
     # load results into dictionary
+    path = path or RESULTS_FILE
     results = {}
-    if Path(RESULTS_FILE).exists():
-        with open(RESULTS_FILE, newline="") as f:
+    if Path(path).exists():
+        with open(path, newline="") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 key = (row["p1_seq"], row["p2_seq"])
@@ -61,7 +88,7 @@ def load_results():
     return results
 
 
-def save_results(results):
+def save_results(results, path=None):
     # write results back to CSV
     fieldnames = [
         "p1_seq", "p2_seq",
@@ -69,7 +96,7 @@ def save_results(results):
         "p1_cards", "p2_cards", "draws_cards",
         "runs",
     ]
-    with open(RESULTS_FILE, "w", newline="") as f:
+    with open(path or RESULTS_FILE, "w", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         for (p1_seq, p2_seq), vals in results.items():
@@ -82,6 +109,7 @@ def save_results(results):
 
 def read_decks_from_file(filename):
     # read decks as binary, convert to 52-bit strings
+    deck_count(filename)  # refuse a cut-short file
     decks = []
     with open(filename, "rb") as f:
         while (chunk := f.read(BYTES_PER_DECK)):
@@ -95,23 +123,24 @@ def play_deck(deck_bits, p1_seq, p2_seq):
     # simulate one game with given deck
     i = 0
     n = len(deck_bits)
+    k = len(p1_seq)  # sequence length
     p1_tricks = p2_tricks = 0
     p1_cards = p2_cards = 0
 
     # scan through deck
-    while i <= n - 3:
-        window = deck_bits[i:i+3]
+    while i <= n - k:
+        window = deck_bits[i:i+k]
         if window == p1_seq:
             p1_tricks += 1
-            p1_cards += (i + 3)   # count cards used
-            deck_bits = deck_bits[i+3:]  # shorten deck
+            p1_cards += (i + k)   # count cards used
+            deck_bits = deck_bits[i+k:]  # shorten deck
             n = len(deck_bits)
             i = 0
             continue
         elif window == p2_seq:
             p2_tricks += 1
-            p2_cards += (i + 3)
-            deck_bits = deck_bits[i+3:]
+            p2_cards += (i + k)
+            deck_bits = deck_bits[i+k:]
             n = len(deck_bits)
             i = 0
             continue
@@ -124,17 +153,22 @@ def play_deck(deck_bits, p1_seq, p2_seq):
     return p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards
 
 
-def main():
+def main(k=SEQ_LEN):
+    # k-card sequences keep their own progress and results
+    matchups = get_matchups(k)
+    progress_file, results_file = state_files(k)
+
     # load progress state
-    progress = load_progress()
+    progress = load_progress(progress_file)
     matchup_index = progress["matchup_index"]
     file_index = progress["file_index"]
 
-    # locate deck file
-    deck_file = os.path.join(DECKS_DIR, f"decks_seed{file_index+1:03d}.bin")
-    if not Path(deck_file).exists():
+    # locate deck file (v1 and versioned chunk names, ordered by seed)
+    deck_files = list_deck_files(DECKS_DIR)
+    if file_index >= len(deck_files):
         print(f"No more deck files to process at index {file_index}. Done!")
         return
+    deck_file = deck_files[file_index]
 
     # start runtime + memory tracking
     start_time = time.perf_counter()
@@ -145,11 +179,11 @@ def main():
     print(f"Processing file: {deck_file} with {len(decks)} decks...")
 
     # load past results
-    results = load_results()
+    results = load_results(results_file)
 
     # loop through all decks
     for deck_bits in decks:
-        p1_seq, p2_seq = MATCHUPS[matchup_index]
+        p1_seq, p2_seq = matchups[matchup_index]
 
         # play game
         p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = play_deck(deck_bits, p1_seq, p2_seq)
@@ -177,15 +211,15 @@ def main():
         results[key]["runs"] += 1
 
         # advance matchup
-        matchup_index = (matchup_index + 1) % len(MATCHUPS)
+        matchup_index = (matchup_index + 1) % len(matchups)
 
     # save results after file
-    save_results(results)
+    save_results(results, results_file)
 
     # update progress for next run
     progress["matchup_index"] = matchup_index
     progress["file_index"] = file_index + 1
-    save_progress(progress)
+    save_progress(progress, progress_file)
 
     # stop timer + memory
     elapsed = time.perf_counter() - start_time
@@ -197,4 +231,11 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score the next deck file with the string engine.")
+    parser.add_argument("--k", type=int, default=SEQ_LEN,
+                        help=f"Sequence length (default {SEQ_LEN}; other lengths get their own progress and results files)")
+    args = parser.parse_args()
+
+    main(args.k)
@@ -0,0 +1,111 @@
+import numpy as np
+
+from aggregate import Aggregate
+from deck_io import read_decks_array
+from scoring_bit import DECK_SIZE_BITS, MATCHUPS, SEQ_LEN
+from scoring_numpy import accumulate, play_decks
+
+# its own progress and results: matchup_index cycles over CANONICAL, not MATCHUPS, and
+# the d / ~d games are correlated, so they never go into results_2.csv
+RESULTS_FILE = "results_symmetric.csv"
+PROGRESS_FILE = "progress_symmetric.json"
+
+FULL_MASK = np.uint64((1 << DECK_SIZE_BITS) - 1)
+
+
+# symmetries
+def complement_seq(seq):
+    # the same sequence with every card color flipped
+    return seq.translate(str.maketrans("01", "10"))
+
+
+def complement_decks(decks):
+    # every card color flipped; a 26/26 deck stays 26/26
+    return ~np.asarray(decks, dtype=np.uint64) & FULL_MASK
+
+
+def swap_stats(stats):
+    # the same games with p1 and p2 exchanged
+    p1_tricks, p2_tricks, draws_tricks, p1_cards, p2_cards, draws_cards = stats
+    return p2_tricks, p1_tricks, draws_tricks, p2_cards, p1_cards, draws_cards
+
+
+def _orbits():
+    """
+    Group MATCHUPS under the two symmetries:
+      complement: (a, b) on deck d plays exactly like (~a, ~b) on deck ~d
+      swap:       (b, a) on deck d is (a, b) on d with p1/p2 stats exchanged
+    Each orbit is named by its first matchup (the canonical representative) and
+    lists its images as [identity, swap, complement, complement + swap]; when
+    b == ~a the last two repeat the first two and are left out.
+    """
+    index = {key: m for m, key in enumerate(MATCHUPS)}
+    canonical, images, seen = [], [], set()
+    for a, b in MATCHUPS:
+        if (a, b) in seen:
+            continue
+        ca, cb = complement_seq(a), complement_seq(b)
+        orbit = [(a, b), (b, a), (ca, cb), (cb, ca)]
+        if (ca, cb) == (b, a):
+            orbit = orbit[:2]
+        seen.update(orbit)
+        canonical.append((a, b))
+        images.append([index[key] for key in orbit])
+    return canonical, images
+
+
+CANONICAL, ORBITS = _orbits()   # 16 representatives: 12 orbits of 4 matchups, 4 of 2
+ROUND_ROBIN = CANONICAL         # score_decks cycles matchup_index over these
+CANONICAL_P1 = np.array([int(p1, 2) for p1, _ in CANONICAL], dtype=np.uint64)
+CANONICAL_P2 = np.array([int(p2, 2) for _, p2 in CANONICAL], dtype=np.uint64)
+# image slot -> (complemented deck, swapped players), matching the ORBITS order
+IMAGE_TRANSFORMS = [(False, False), (False, True), (True, False), (True, True)]
+# [representative, slot] -> matchup index, -1 where a 2-matchup orbit has no image
+IMAGE_IDS = np.array([images + [-1] * (len(IMAGE_TRANSFORMS) - len(images)) for images in ORBITS])
+
+
+def score_decks(decks, results, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    """
+    Score a deck batch using the symmetries: each deck d and its complement ~d
+    play the canonical representative of one orbit (round-robin over CANONICAL
+    from matchup_index; all of them with all_matchups), and the two games give
+    every matchup in the orbit one game on d and one on ~d. So every deck read
+    yields two games per matchup it covers, for two engine plays per orbit.
+    Returns the next index into CANONICAL. The orbits are only worked out
+    for k = SEQ_LEN; other k raise ValueError.
+    """
+    if k != SEQ_LEN:
+        raise ValueError(f"scoring_symmetric only supports k={SEQ_LEN}, got k={k}")
+    decks = np.asarray(decks, dtype=np.uint64)
+    num = len(decks)
+    if all_matchups:
+        rep_ids = np.repeat(np.arange(len(CANONICAL)), num)
+        decks = np.tile(decks, len(CANONICAL))
+        next_index = matchup_index
+    else:
+        rep_ids = (matchup_index + np.arange(num)) % len(CANONICAL)
+        next_index = (matchup_index + num) % len(CANONICAL)
+
+    # one engine pass over d and ~d: the first half is on d, the second on ~d
+    both_ids = np.concatenate([rep_ids, rep_ids])
+    stats = play_decks(np.concatenate([decks, complement_decks(decks)]),
+                       CANONICAL_P1[both_ids], CANONICAL_P2[both_ids])
+    half = len(rep_ids)
+    # a complement image on d is the representative's game on ~d, and vice versa
+    complemented = tuple(np.concatenate([s[half:], s[:half]]) for s in stats)
+
+    for slot, (complement, swap) in enumerate(IMAGE_TRANSFORMS):
+        matchup_ids = IMAGE_IDS[both_ids, slot]
+        has_slot = matchup_ids >= 0
+        image_stats = complemented if complement else stats
+        if swap:
+            image_stats = swap_stats(image_stats)
+        accumulate(results, matchup_ids[has_slot], [s[has_slot] for s in image_stats])
+    return next_index
+
+
+def score_file(deck_file, matchup_index=0, all_matchups=False, k=SEQ_LEN):
+    # partial Aggregate for one file, same contract as scoring_numpy.score_file
+    results = Aggregate()
+    score_decks(read_decks_array(deck_file), results, matchup_index, all_matchups, k)
+    return results